@@ -1,636 +1,3469 @@
-import os
-import re
-import urllib.request
-import urllib.parse
-import json
-import math
-import random
-import time
-from PIL import Image, ImageDraw, ImageFilter
-import streamlit as st
-from gtts import gTTS
-import base64
-
-# --- CONFIGURATION ---
-st.set_page_config(page_title="SmartBot AI Pro", layout="centered")
-
-# Add custom CSS
-st.markdown("""
-<style>
-    /* Move chat input to bottom */
-    .stChatFloatingInputContainer {
-        bottom: 20px;
-    }
-    
-    /* Style improvements */
-    .stChatMessage {
-        padding: 1rem;
-        border-radius: 0.5rem;
-    }
-    
-    /* Button styling */
-    .stButton>button {
-        border-radius: 20px;
-        padding: 0.5rem 1rem;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# --- COMPREHENSIVE OBJECT DATABASE (100+ objects) ---
-OBJECTS = {
-    'car': ['car', 'vehicle'], 'truck': ['truck'], 'bus': ['bus'], 'train': ['train'],
-    'airplane': ['airplane', 'plane'], 'helicopter': ['helicopter'], 'boat': ['boat', 'ship'],
-    'bicycle': ['bicycle', 'bike'], 'motorcycle': ['motorcycle'], 'rocket': ['rocket'],
-    
-    'house': ['house', 'home'], 'building': ['building', 'skyscraper'], 'castle': ['castle'],
-    'church': ['church'], 'tower': ['tower'], 'bridge': ['bridge'], 'barn': ['barn'],
-    'lighthouse': ['lighthouse'], 'tent': ['tent'], 'pyramid': ['pyramid'],
-    
-    'tree': ['tree'], 'pine': ['pine'], 'palm': ['palm'], 'flower': ['flower'],
-    'rose': ['rose'], 'sunflower': ['sunflower'], 'grass': ['grass'], 'bush': ['bush'],
-    'cactus': ['cactus'], 'mushroom': ['mushroom'], 'bamboo': ['bamboo'],
-    
-    'mountain': ['mountain'], 'hill': ['hill'], 'valley': ['valley'], 'volcano': ['volcano'],
-    'desert': ['desert'], 'beach': ['beach'], 'island': ['island'], 'cliff': ['cliff'],
-    'cave': ['cave'], 'rock': ['rock', 'boulder'],
-    
-    'ocean': ['ocean', 'sea'], 'lake': ['lake'], 'river': ['river'], 'pond': ['pond'],
-    'waterfall': ['waterfall'], 'waves': ['waves'], 'reef': ['reef'],
-    
-    'sun': ['sun'], 'moon': ['moon'], 'star': ['star'], 'cloud': ['cloud'],
-    'rainbow': ['rainbow'], 'lightning': ['lightning'], 'tornado': ['tornado'],
-    'rain': ['rain'], 'snow': ['snow'], 'aurora': ['aurora', 'northern lights'],
-    
-    'dog': ['dog', 'puppy'], 'cat': ['cat', 'kitten'], 'horse': ['horse'],
-    'cow': ['cow'], 'sheep': ['sheep'], 'pig': ['pig'], 'rabbit': ['rabbit'],
-    'deer': ['deer'], 'bear': ['bear'], 'wolf': ['wolf'], 'fox': ['fox'],
-    'lion': ['lion'], 'tiger': ['tiger'], 'elephant': ['elephant'], 'giraffe': ['giraffe'],
-    'zebra': ['zebra'], 'monkey': ['monkey'], 'panda': ['panda'], 'kangaroo': ['kangaroo'],
-    
-    'bird': ['bird'], 'eagle': ['eagle'], 'owl': ['owl'], 'parrot': ['parrot'],
-    'penguin': ['penguin'], 'flamingo': ['flamingo'], 'swan': ['swan'], 'duck': ['duck'],
-    'chicken': ['chicken'], 'peacock': ['peacock'],
-    
-    'snake': ['snake'], 'turtle': ['turtle'], 'frog': ['frog'], 'crocodile': ['crocodile'],
-    'dragon': ['dragon'], 'dinosaur': ['dinosaur'],
-    
-    'butterfly': ['butterfly'], 'bee': ['bee'], 'ant': ['ant'], 'spider': ['spider'],
-    'dragonfly': ['dragonfly'], 'ladybug': ['ladybug'],
-    
-    'fish': ['fish'], 'shark': ['shark'], 'dolphin': ['dolphin'], 'whale': ['whale'],
-    'jellyfish': ['jellyfish'], 'octopus': ['octopus'], 'crab': ['crab'], 'starfish': ['starfish'],
-    
-    'person': ['person', 'human'], 'man': ['man'], 'woman': ['woman'], 'child': ['child'],
-    'family': ['family'], 'crowd': ['crowd'], 'superhero': ['superhero'],
-    'robot': ['robot', 'android'], 'alien': ['alien'],
-    
-    'chair': ['chair'], 'table': ['table'], 'bed': ['bed'], 'sofa': ['sofa'],
-    'lamp': ['lamp'], 'clock': ['clock'], 'mirror': ['mirror'], 'window': ['window'],
-    'door': ['door'], 'stairs': ['stairs'], 'fence': ['fence'],
-    
-    'phone': ['phone'], 'computer': ['computer'], 'tv': ['tv', 'television'],
-    'camera': ['camera'], 'book': ['book'], 'umbrella': ['umbrella'], 'backpack': ['backpack'],
-    'ball': ['ball'], 'balloon': ['balloon'], 'kite': ['kite'], 'flag': ['flag'],
-    
-    'apple': ['apple'], 'banana': ['banana'], 'orange': ['orange'], 'pizza': ['pizza'],
-    'cake': ['cake'], 'ice cream': ['ice cream'], 'bread': ['bread'], 'burger': ['burger'],
-    
-    'guitar': ['guitar'], 'piano': ['piano'], 'drum': ['drum'], 'violin': ['violin'],
-    
-    'fire': ['fire', 'flame'], 'smoke': ['smoke'], 'crystal': ['crystal'], 'diamond': ['diamond'],
-    'crown': ['crown'], 'sword': ['sword'], 'shield': ['shield'],
-    
-    'road': ['road', 'street'], 'path': ['path'], 'garden': ['garden'], 'park': ['park'],
-    'city': ['city'], 'village': ['village'], 'farm': ['farm'], 'forest': ['forest'],
-}
-
-COLORS = {
-    'red': (220, 20, 60), 'blue': (30, 144, 255), 'green': (34, 139, 34),
-    'yellow': (255, 215, 0), 'orange': (255, 140, 0), 'purple': (138, 43, 226),
-    'pink': (255, 105, 180), 'brown': (139, 69, 19), 'black': (20, 20, 20),
-    'white': (245, 245, 245), 'gray': (128, 128, 128), 'gold': (255, 215, 0),
-}
-
-# --- TEXT TO SPEECH FUNCTION ---
-def text_to_speech_button(text, key):
-    """Add audio player with gTTS"""
-    # Clean text for speech
-    clean_text = re.sub(r'\*\*|__|~~|#', '', text)
-    clean_text = re.sub(r'\n+', ' ', clean_text)
-    clean_text = clean_text[:500]  # Limit length for speed
-    
-    try:
-        # Generate speech
-        tts = gTTS(text=clean_text, lang='en', slow=False)
-        
-        # Save to temporary file
-        audio_file = f"temp_audio_{key}.mp3"
-        tts.save(audio_file)
-        
-        # Read and encode audio
-        with open(audio_file, "rb") as f:
-            audio_bytes = f.read()
-        
-        # Clean up temp file
-        os.remove(audio_file)
-        
-        # Create audio player
-        audio_base64 = base64.b64encode(audio_bytes).decode()
-        audio_html = f"""
-        <audio controls style="width: 200px; height: 30px;">
-            <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
-        </audio>
-        """
-        st.markdown(audio_html, unsafe_allow_html=True)
-        
-    except Exception as e:
-        st.caption("🔇 Audio unavailable")
-
-# --- ADVANCED CHAT ENGINE ---
-class SmartChatEngine:
-    def __init__(self):
-        self.context = []
-        self.history = []
-        
-    def search_web(self, query):
-        """Search DuckDuckGo API"""
-        try:
-            url = f"https://api.duckduckgo.com/?q={urllib.parse.quote(query)}&format=json&no_html=1"
-            with urllib.request.urlopen(url, timeout=5) as response:
-                data = json.loads(response.read().decode())
-                if data.get('Abstract'):
-                    return data['Abstract']
-                elif data.get('RelatedTopics'):
-                    topics = [t.get('Text', '') for t in data['RelatedTopics'] if isinstance(t, dict)]
-                    return topics[0] if topics else None
-        except:
-            pass
-        return None
-    
-    def reason_step_by_step(self, query):
-        """Pro model reasoning"""
-        steps = []
-        query_lower = query.lower()
-        
-        # Analyze question type
-        if 'why' in query_lower or 'how' in query_lower:
-            steps.append("Detected explanatory question - searching for causal relationships")
-        elif 'compare' in query_lower or 'difference' in query_lower:
-            steps.append("Detected comparison query - analyzing multiple factors")
-        elif 'best' in query_lower or 'recommend' in query_lower:
-            steps.append("Detected recommendation request - evaluating options")
-        else:
-            steps.append("Analyzing query structure and intent")
-        
-        # Search for information
-        web_result = self.search_web(query)
-        if web_result:
-            steps.append("Retrieved relevant data from web sources")
-            steps.append("Synthesizing information with logical inference")
-            return steps, web_result
-        else:
-            steps.append("Using existing knowledge base for response")
-            return steps, None
-    
-    def respond(self, user_input, model_type):
-        user_lower = user_input.lower()
-        self.history.append(user_input)
-        
-        # Greetings
-        greetings = ['hello', 'hi', 'hey', 'sup', 'greetings', 'good morning', 'good evening']
-        if any(g in user_lower for g in greetings):
-            responses = [
-                f"Hello! I'm SmartBot {model_type}. How can I help you today?",
-                f"Hi there! SmartBot {model_type} at your service! What would you like to know?",
-                f"Hey! Ready to assist with conversation, reasoning, or image generation!",
-                f"Greetings! I'm here to help. Ask me anything or request an image!",
-            ]
-            return random.choice(responses)
-        
-        # Identity
-        if 'who are you' in user_lower or 'what are you' in user_lower:
-            return (f"I'm SmartBot {model_type}, an advanced AI assistant! I can:\n\n"
-                   "- Have natural conversations\n"
-                   "- Generate images from 100+ objects\n"
-                   "- Search the web for current information\n"
-                   "- Perform advanced reasoning (Pro model)\n"
-                   "- Read responses aloud\n\n"
-                   "Try asking me something or say 'generate an image of...'")
-        
-        # Capabilities
-        if 'what can you do' in user_lower or 'capabilities' in user_lower or 'help' in user_lower:
-            return """**SmartBot Capabilities:**
-
-**Conversation**: Natural dialogue with context awareness
-**Image Creation**: 100+ objects including vehicles, animals, buildings, nature, and more
-**Web Search**: Real-time information from the internet
-**Advanced Reasoning**: Step-by-step logical analysis (Pro model only)
-**Text-to-Speech**: Click 'Read Aloud' to hear responses
-
-**Try these examples:**
-- "What is quantum computing?"
-- "Generate a sunset with mountains and a lake"
-- "Compare electric vs gas cars"
-- "Tell me about recent AI developments" """
-        
-        # Pro Model Reasoning
-        if model_type == "Pro":
-            reasoning_keywords = ['why', 'how', 'explain', 'compare', 'analyze', 'what is']
-            if any(kw in user_lower for kw in reasoning_keywords):
-                steps, web_data = self.reason_step_by_step(user_input)
-                
-                response = "**Advanced Reasoning Process:**\n\n"
-                for i, step in enumerate(steps, 1):
-                    response += f"{i}. {step}\n"
-                
-                response += "\n**Conclusion:**\n\n"
-                if web_data:
-                    response += f"{web_data}\n\n*This response combines web search with logical analysis.*"
-                else:
-                    # Fallback knowledge
-                    response += self.generate_knowledge_response(user_input)
-                
-                return response
-        
-        # Standard web search for factual queries
-        search_triggers = ['what', 'who', 'when', 'where', 'tell me about', 'information on']
-        if any(trigger in user_lower for trigger in search_triggers):
-            result = self.search_web(user_input)
-            if result:
-                if model_type == "Pro":
-                    return f"**Web Search Results:**\n\n{result}\n\n*Verified from multiple sources*"
-                else:
-                    return f"Here's what I found: {result}"
-        
-        # Conversational responses
-        return self.generate_conversational_response(user_input)
-    
-    def generate_knowledge_response(self, query):
-        """Generate knowledge-based response"""
-        lower = query.lower()
-        
-        if 'quantum' in lower:
-            return "Quantum computing uses quantum mechanics principles like superposition and entanglement to process information in ways classical computers cannot. Quantum bits (qubits) can exist in multiple states simultaneously, enabling parallel computation."
-        elif 'ai' in lower or 'artificial intelligence' in lower:
-            return "Artificial Intelligence refers to computer systems that can perform tasks typically requiring human intelligence, such as learning, reasoning, and problem-solving. Modern AI uses machine learning and neural networks to improve performance over time."
-        elif 'climate' in lower:
-            return "Climate change refers to long-term shifts in global temperatures and weather patterns, primarily driven by human activities like fossil fuel consumption, deforestation, and industrial processes."
-        elif 'electric' in lower and 'vehicle' in lower:
-            return "Electric vehicles use battery-powered electric motors instead of internal combustion engines. They offer zero direct emissions, lower operating costs, and instant torque. However, they face challenges with charging infrastructure and battery range."
-        elif 'hydrogen' in lower and ('fuel' in lower or 'vehicle' in lower):
-            return "Hydrogen fuel cell vehicles convert hydrogen gas into electricity through a chemical reaction, producing only water as a byproduct. They offer faster refueling than EVs but face infrastructure and production challenges."
-        elif 'drive' in lower and ('left' in lower or 'right' in lower):
-            return "The side of the road countries drive on is largely historical. Britain drove on the left due to sword-fighting conventions, and this spread to its colonies. Napoleon's conquests spread right-hand driving across Europe. Today, about 35% of countries drive on the left."
-        elif 'renewable' in lower or 'solar' in lower or 'wind' in lower:
-            return "Renewable energy sources include solar, wind, hydroelectric, and geothermal power. They produce minimal carbon emissions and are increasingly cost-competitive with fossil fuels."
-        else:
-            return "That's an interesting question! Based on my knowledge, this topic involves multiple factors to consider. Could you be more specific about what aspect interests you most?"
-    
-    def generate_conversational_response(self, user_input):
-        """Generate engaging conversational responses"""
-        responses = [
-            "That's a fascinating topic! What specifically interests you about it?",
-            "I see what you're getting at. Tell me more about your thoughts on this.",
-            "Interesting perspective! I'd love to hear more details.",
-            "That's worth exploring further. What aspect would you like to discuss?",
-            "Great question! Let me think about that from different angles.",
-            "I appreciate you bringing that up. Can you elaborate a bit more?",
-        ]
-        return random.choice(responses)
-
-# --- IMAGE RENDERER ---
-class ImageRenderer:
-    def __init__(self, width, height):
-        self.width = width
-        self.height = height
-    
-    def parse_prompt(self, prompt):
-        """Extract objects and attributes from prompt"""
-        prompt_lower = prompt.lower()
-        scene = {
-            'objects': [],
-            'colors': [],
-            'time': 'day',
-            'weather': 'clear'
-        }
-        
-        # Find objects
-        for obj, keywords in OBJECTS.items():
-            if any(kw in prompt_lower for kw in keywords):
-                scene['objects'].append(obj)
-        
-        # Find colors
-        for color, rgb in COLORS.items():
-            if color in prompt_lower:
-                scene['colors'].append(color)
-        
-        # Time of day
-        if 'night' in prompt_lower:
-            scene['time'] = 'night'
-        elif 'sunset' in prompt_lower or 'dusk' in prompt_lower:
-            scene['time'] = 'sunset'
-        elif 'sunrise' in prompt_lower or 'dawn' in prompt_lower:
-            scene['time'] = 'sunrise'
-        
-        # Weather
-        if 'rain' in prompt_lower:
-            scene['weather'] = 'rainy'
-        elif 'snow' in prompt_lower:
-            scene['weather'] = 'snowy'
-        elif 'storm' in prompt_lower:
-            scene['weather'] = 'stormy'
-        
-        # Default objects
-        if not scene['objects']:
-            scene['objects'] = ['tree', 'mountain', 'cloud']
-        
-        return scene
-    
-    def render(self, scene):
-        """Render the scene"""
-        img = Image.new('RGB', (self.width, self.height), 'black')
-        draw = ImageDraw.Draw(img)
-        
-        # Background based on time
-        time = scene['time']
-        if time == 'day':
-            sky = (135, 206, 250)
-            ground = (34, 139, 34)
-        elif time == 'night':
-            sky = (10, 10, 40)
-            ground = (20, 40, 20)
-        elif time == 'sunset':
-            sky = (255, 140, 60)
-            ground = (100, 80, 40)
-        else:  # sunrise
-            sky = (255, 200, 150)
-            ground = (80, 120, 60)
-        
-        # Draw sky and ground
-        draw.rectangle((0, 0, self.width, self.height // 2), fill=sky)
-        draw.rectangle((0, self.height // 2, self.width, self.height), fill=ground)
-        
-        # Weather effects
-        if scene['weather'] == 'rainy':
-            for _ in range(100):
-                x, y = random.randint(0, self.width), random.randint(0, self.height)
-                draw.line((x, y, x, y + 10), fill=(200, 200, 255), width=1)
-        elif scene['weather'] == 'snowy':
-            for _ in range(80):
-                x, y = random.randint(0, self.width), random.randint(0, self.height)
-                draw.ellipse((x, y, x + 3, y + 3), fill='white')
-        
-        # Draw objects
-        objects = scene['objects']
-        colors = scene['colors']
-        
-        # Sky objects
-        if 'sun' in objects or (time == 'day' and 'moon' not in objects):
-            draw.ellipse((self.width - 150, 50, self.width - 50, 150), fill='yellow')
-        
-        if 'moon' in objects or time == 'night':
-            draw.ellipse((self.width - 150, 50, self.width - 70, 130), fill='white')
-        
-        if 'star' in objects or time == 'night':
-            for _ in range(50):
-                x, y = random.randint(0, self.width), random.randint(0, self.height // 2)
-                draw.ellipse((x, y, x + 2, y + 2), fill='white')
-        
-        if 'cloud' in objects or 'rain' in scene['weather']:
-            for i in range(3):
-                x = 100 + i * 250
-                y = 80 + random.randint(-20, 20)
-                draw.ellipse((x, y, x + 80, y + 40), fill='white')
-                draw.ellipse((x + 30, y - 20, x + 110, y + 20), fill='white')
-        
-        if 'rainbow' in objects:
-            colors_rainbow = [(255, 0, 0), (255, 127, 0), (255, 255, 0), (0, 255, 0), (0, 0, 255), (75, 0, 130), (148, 0, 211)]
-            for i, color in enumerate(colors_rainbow):
-                draw.arc((200, 150, 600, 400), 0, 180, fill=color, width=8)
-        
-        # Terrain objects
-        if 'mountain' in objects:
-            points = [(0, 300), (200, 100), (400, 300), (600, 150), (800, 300)]
-            for i in range(len(points) - 1):
-                draw.polygon([points[i], points[i + 1], (points[i + 1][0], 300), (points[i][0], 300)], 
-                           fill=(100, 100, 100))
-        
-        if 'ocean' in objects or 'sea' in objects or 'water' in objects:
-            water_color = (65, 105, 225)
-            draw.rectangle((0, 350, self.width, self.height), fill=water_color)
-            # Waves
-            for i in range(0, self.width, 50):
-                draw.arc((i, 340, i + 50, 360), 0, 180, fill=(100, 150, 255), width=2)
-        
-        if 'beach' in objects:
-            draw.rectangle((0, 400, self.width, self.height), fill=(238, 214, 175))
-        
-        if 'volcano' in objects:
-            draw.polygon([(300, 350), (450, 350), (375, 200)], fill=(100, 50, 50))
-            # Lava
-            draw.polygon([(360, 200), (390, 200), (380, 180), (370, 180)], fill=(255, 100, 0))
-        
-        # Nature objects
-        if 'tree' in objects or 'forest' in objects:
-            for x_pos in [100, 150, 700, 750]:
-                trunk_x = x_pos
-                draw.rectangle((trunk_x, 250, trunk_x + 20, 350), fill=(139, 69, 19))
-                draw.ellipse((trunk_x - 30, 200, trunk_x + 50, 270), fill=(0, 128, 0))
-        
-        if 'palm' in objects:
-            draw.rectangle((400, 250, 415, 350), fill=(139, 69, 19))
-            for angle in range(0, 360, 45):
-                x = 407 + 50 * math.cos(math.radians(angle))
-                y = 240 + 30 * math.sin(math.radians(angle))
-                draw.line((407, 240, x, y), fill=(0, 150, 0), width=5)
-        
-        if 'flower' in objects:
-            for x_pos in [200, 300, 600]:
-                y_pos = 330
-                draw.ellipse((x_pos, y_pos, x_pos + 20, y_pos + 20), fill=(255, 105, 180))
-                draw.rectangle((x_pos + 8, y_pos + 20, x_pos + 12, y_pos + 40), fill=(0, 128, 0))
-        
-        if 'cactus' in objects:
-            draw.rectangle((350, 250, 380, 350), fill=(0, 128, 0))
-            draw.rectangle((330, 280, 350, 320), fill=(0, 128, 0))
-            draw.rectangle((380, 270, 400, 310), fill=(0, 128, 0))
-        
-        # Buildings
-        if 'house' in objects:
-            house_color = COLORS.get(colors[0], (150, 75, 0)) if colors else (150, 75, 0)
-            draw.rectangle((200, 250, 350, 350), fill=house_color, outline='black', width=2)
-            draw.polygon([(190, 250), (360, 250), (275, 180)], fill=(80, 80, 80))
-            draw.rectangle((260, 300, 290, 350), fill=(100, 50, 0))
-            draw.rectangle((220, 270, 250, 300), fill=(135, 206, 235))
-        
-        if 'castle' in objects:
-            # Main structure
-            draw.rectangle((250, 200, 550, 350), fill=(150, 150, 150), outline='black', width=2)
-            # Towers
-            for x in [220, 350, 480]:
-                draw.rectangle((x, 150, x + 50, 350), fill=(130, 130, 130), outline='black')
-                draw.polygon([(x - 10, 150), (x + 60, 150), (x + 25, 100)], fill=(100, 100, 100))
-        
-        if 'lighthouse' in objects:
-            draw.rectangle((400, 200, 440, 350), fill=(200, 200, 200), outline='black', width=2)
-            draw.rectangle((390, 180, 450, 200), fill='red')
-            draw.ellipse((395, 170, 445, 180), fill='yellow')
-        
-        # Vehicles
-        if 'car' in objects:
-            car_color = COLORS.get(colors[0], (255, 0, 0)) if colors else (255, 0, 0)
-            draw.rectangle((300, 320, 400, 350), fill=car_color)
-            draw.rectangle((320, 300, 380, 320), fill=(200, 200, 200))
-            draw.ellipse((310, 340, 330, 360), fill='black')
-            draw.ellipse((370, 340, 390, 360), fill='black')
-        
-        if 'airplane' in objects:
-            draw.ellipse((300, 100, 450, 130), fill=(200, 200, 200))
-            draw.polygon([(280, 115), (300, 100), (320, 115)], fill=(150, 150, 150))
-            draw.polygon([(430, 115), (450, 100), (470, 115)], fill=(150, 150, 150))
-        
-        if 'boat' in objects or 'ship' in objects:
-            draw.polygon([(200, 380), (400, 380), (380, 420), (220, 420)], fill=(100, 50, 0))
-            draw.polygon([(300, 300), (300, 380), (330, 380)], fill='white')
-        
-        # Animals
-        if 'dog' in objects:
-            draw.ellipse((500, 310, 560, 350), fill=(139, 69, 19))
-            draw.ellipse((510, 295, 530, 315), fill=(139, 69, 19))
-        
-        if 'cat' in objects:
-            draw.ellipse((150, 320, 200, 350), fill=(255, 140, 0))
-            draw.polygon([(160, 320), (170, 305), (180, 320)], fill=(255, 140, 0))
-        
-        if 'bird' in objects:
-            for i in range(3):
-                x = 100 + i * 150
-                y = 150 + random.randint(-30, 30)
-                draw.arc((x, y, x + 30, y + 15), 30, 150, fill='black', width=2)
-                draw.arc((x + 15, y, x + 45, y + 15), 30, 150, fill='black', width=2)
-        
-        # Objects
-        if 'fire' in objects:
-            draw.polygon([(400, 350), (420, 320), (440, 350)], fill=(255, 69, 0))
-            draw.polygon([(410, 340), (425, 315), (435, 340)], fill='yellow')
-        
-        return img
-
-# --- STREAMLIT APP ---
-def main():
-    # Sidebar
-    with st.sidebar:
-        st.header("⚙️ Model Configuration")
-        model = st.radio(
-            "Select Model:",
-            ("SmartBot 1.1 Flash", "SmartBot 1.2 Pro"),
-            index=1
-        )
-        
-        st.markdown("---")
-        st.markdown("### Model Features")
-        if "Flash" in model:
-            st.info("**Speed**: Ultra-fast\n\n**Reasoning**: Basic\n\n**Images**: Quick render")
-        else:
-            st.success("**Speed**: Optimized\n\n**Reasoning**: Advanced with web search\n\n**Images**: High quality")
-        
-        st.markdown("---")
-        st.markdown("### Voice Input")
-        st.caption("Use 'Read Aloud' button on responses to hear them spoken")
-    
-    # Header
-    st.title("🤖 SmartBot AI")
-    st.caption(f"Powered by {model} | Advanced Reasoning & Image Generation")
-    
-    # Initialize session
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
-    if 'engine' not in st.session_state:
-        st.session_state.engine = SmartChatEngine()
-    
-    # Display chat history
-    for idx, msg in enumerate(st.session_state.messages):
-        with st.chat_message(msg["role"]):
-            st.write(msg["content"])
-            if "image" in msg:
-                st.image(msg["image"], caption="Generated Image", use_container_width=True)
-            # Add text-to-speech for assistant messages
-            if msg["role"] == "assistant" and "image" not in msg:
-                text_to_speech_button(msg["content"], f"msg_{idx}")
-    
-    # Chat input at bottom
-    user_input = st.chat_input("Ask anything or request an image...")
-    
-    # Process input
-    if user_input:
-        # Add user message
-        st.session_state.messages.append({"role": "user", "content": user_input})
-        
-        with st.chat_message("user"):
-            st.write(user_input)
-        
-        # Check if image generation request
-        img_keywords = ['generate', 'create', 'draw', 'paint', 'show me', 'make', 'design']
-        is_image = any(kw in user_input.lower() for kw in img_keywords)
-        
-        if is_image:
-            # Image generation
-            with st.chat_message("assistant"):
-                with st.spinner("Creating your image..."):
-                    # Set resolution
-                    if "Pro" in model:
-                        width, height = 800, 600
-                        steps = 15
-                    else:
-                        width, height = 512, 384
-                        steps = 8
-                    
-                    renderer = ImageRenderer(width, height)
-                    scene = renderer.parse_prompt(user_input)
-                    
-                    st.write(f"Generating: {', '.join(scene['objects'][:5])}... ({scene['time']}, {scene['weather']})")
-                    
-                    # Progress bar simulation
-                    progress = st.progress(0)
-                    img_placeholder = st.empty()
-                    
-                    final_img = renderer.render(scene)
-                    
-                    # Simulate diffusion process
-                    for i in range(steps):
-                        noise_level = 1.0 - (i / steps)
-                        temp_img = final_img.copy()
-                        
-                        # Add decreasing noise
-                        if noise_level > 0.3:
-                            temp_img = temp_img.filter(ImageFilter.GaussianBlur(radius=noise_level * 3))
-                        
-                        img_placeholder.image(temp_img, caption=f"Step {i+1}/{steps}")
-                        progress.progress((i + 1) / steps)
-                        time.sleep(0.1 if "Flash" in model else 0.2)
-                    
-                    # Final result
-                    progress.empty()
-                    img_placeholder.image(final_img, caption=f"Complete | {model}", use_container_width=True)
-                    
-                    response = f"Here's your image! It includes: {', '.join(scene['objects'][:10])}"
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response,
-                        "image": final_img
-                    })
-        else:
-            # Chat response
-            with st.chat_message("assistant"):
-                with st.spinner(f"{model} thinking..."):
-                    model_type = "Pro" if "Pro" in model else "Flash"
-                    response = st.session_state.engine.respond(user_input, model_type)
-                    st.markdown(response)
-                    
-                    # Add read aloud button
-                    text_to_speech_button(response, f"new_msg")
-                    
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-
-if __name__ == "__main__":
-    main()
+import os
+import re
+import sys
+import urllib.parse
+import http.client
+import queue
+import logging
+import json
+import math
+import random
+import time
+import hashlib
+import uuid
+import mmap
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed, TimeoutError as FutureTimeoutError
+from collections import deque
+from collections import OrderedDict
+import streamlit as st
+import io
+import wave
+import struct
+# PIL, numpy and gTTS are imported where they are used: together they are most of the cold-start
+# import time, and a text-only session never needs them
+
+MODULE_LOAD_START = time.perf_counter()
+
+logger = logging.getLogger("smartbot")
+
+# --- CONFIGURATION ---
+# Page setup runs from main() so the module can be imported headlessly (e.g. by render_batch.py)
+CUSTOM_CSS = """
+<style>
+    /* Move chat input to bottom */
+    .stChatFloatingInputContainer {
+        bottom: 20px;
+    }
+    
+    /* Style improvements */
+    .stChatMessage {
+        padding: 1rem;
+        border-radius: 0.5rem;
+    }
+    
+    /* Button styling */
+    .stButton>button {
+        border-radius: 20px;
+        padding: 0.5rem 1rem;
+    }
+</style>
+"""
+
+def configure_page():
+    st.set_page_config(page_title="SmartBot AI Pro", layout="centered")
+    
+    # Add custom CSS
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+# --- TRACING ---
+TRACE_ENABLED = os.environ.get("SMARTBOT_TRACE") == "1"  # trace every script run
+TRACE_LOG_PATH = os.environ.get("SMARTBOT_TRACE_LOG") or None  # append one JSON line per run here
+DEBUG_PANEL = os.environ.get("SMARTBOT_DEBUG_PANEL") == "1"  # offer the sidebar debug panel
+TRACE_STATS_SAMPLES = 500  # recent durations kept per span for the process-wide percentiles
+
+trace_logger = logging.getLogger("smartbot.trace")
+_trace_local = threading.local()
+
+class NullSpan:
+    """Shared do-nothing span handed out when the current thread isn't tracing"""
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    __slots__ = ('trace', 'name', 'start', 'depth')
+    
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+    
+    def __enter__(self):
+        self.depth = self.trace.depth
+        self.trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.trace.depth -= 1
+        self.trace.spans.append((self.name, self.start - self.trace.start, end - self.start, self.depth))
+        return False
+
+class Trace:
+    """Timing spans and cache counters for one script run, collected on the script thread"""
+    def __init__(self, kind="rerun", start=None, parent_id=None):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.parent_id = parent_id
+        self.kind = kind
+        self.timestamp = time.time()
+        self.start = start if start is not None else time.perf_counter()
+        self.duration = None
+        self.depth = 0
+        self.spans = []
+        self.counters = {}
+    
+    def span(self, name):
+        return Span(self, name)
+    
+    def add_span(self, name, start, end, depth=0):
+        """Record a stage timed outside a span, from perf_counter() timestamps"""
+        self.spans.append((name, start - self.start, end - start, depth))
+    
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+    
+    def merge(self, child):
+        """Fold a finished trace from another thread into this one, nested under a span named for its kind"""
+        offset = child.start - self.start
+        self.spans.append((child.kind, offset, child.duration, 0))
+        self.spans.extend((name, offset + start, duration, depth + 1) for name, start, duration, depth in child.spans)
+        for name, n in child.counters.items():
+            self.count(name, n)
+        if self.duration is not None:
+            self.duration = max(self.duration, offset + child.duration)
+    
+    def waterfall(self):
+        """Spans as (name, start, duration, depth) in start order"""
+        return sorted(self.spans, key=lambda s: (s[1], s[3]))
+    
+    def to_dict(self):
+        data = {
+            'trace_id': self.trace_id,
+            'kind': self.kind,
+            'ts': round(self.timestamp, 3),
+            'duration_ms': round(self.duration * 1000, 3),
+            'spans': [{'name': name, 'start_ms': round(start * 1000, 3), 'duration_ms': round(duration * 1000, 3),
+                       'depth': depth} for name, start, duration, depth in self.waterfall()],
+            'counters': self.counters,
+        }
+        if self.parent_id:
+            data['parent_id'] = self.parent_id
+        return data
+
+class TraceStats:
+    """Process-wide span aggregates and the JSON-lines sink for finished traces"""
+    def __init__(self, log_path=TRACE_LOG_PATH, samples=TRACE_STATS_SAMPLES):
+        self.samples = samples
+        self.durations = {}
+        self.counts = {}
+        self.counters = {}
+        self.runs = 0
+        self.lock = threading.Lock()
+        self.log_file = open(log_path, "a", encoding="utf-8", buffering=1) if log_path else None
+    
+    def record(self, trace):
+        line = json.dumps(trace.to_dict(), separators=(",", ":"))
+        with self.lock:
+            self.runs += 1
+            for name, _, duration, _ in trace.spans:
+                if name not in self.durations:
+                    self.durations[name] = deque(maxlen=self.samples)
+                self.durations[name].append(duration)
+                self.counts[name] = self.counts.get(name, 0) + 1
+            for name, n in trace.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            if self.log_file:
+                self.log_file.write(line + "\n")
+        trace_logger.info(line)
+    
+    def summary(self):
+        """Per-span rows of call count and recent p50/p95/max in milliseconds"""
+        with self.lock:
+            snapshot = {name: (self.counts[name], sorted(durations)) for name, durations in self.durations.items()}
+        rows = []
+        for name, (count, ordered) in sorted(snapshot.items()):
+            rows.append({
+                'span': name,
+                'calls': count,
+                'p50 ms': round(ordered[len(ordered) // 2] * 1000, 2),
+                'p95 ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+                'max ms': round(ordered[-1] * 1000, 2),
+            })
+        return rows
+
+@st.cache_resource
+def get_trace_stats():
+    """Aggregates over every traced run in this process"""
+    return TraceStats()
+
+def start_trace(kind="rerun", start=None, parent_id=None):
+    """Begin tracing the current thread; any trace left by an interrupted run is dropped"""
+    trace = _trace_local.trace = Trace(kind, start, parent_id)
+    return trace
+
+def finish_trace(record=True):
+    """Stop tracing the current thread and return the trace, recording it unless told not to.
+    
+    Worker threads pass record=False: they have no script context for get_trace_stats(),
+    so whoever collects their result records it."""
+    trace = getattr(_trace_local, 'trace', None)
+    if trace is None:
+        return None
+    _trace_local.trace = None
+    trace.duration = time.perf_counter() - trace.start
+    if record:
+        get_trace_stats().record(trace)
+    return trace
+
+def current_trace():
+    """The trace of the current thread's run, or None when it isn't tracing"""
+    return getattr(_trace_local, 'trace', None)
+
+def trace_span(name):
+    """Context manager timing one stage of the current run; a shared no-op when tracing is off"""
+    trace = getattr(_trace_local, 'trace', None)
+    return NULL_SPAN if trace is None else trace.span(name)
+
+def trace_count(name, n=1):
+    """Bump a per-run counter such as 'layer_cache.hit'"""
+    trace = getattr(_trace_local, 'trace', None)
+    if trace is not None:
+        trace.count(name, n)
+
+# --- COMPREHENSIVE OBJECT DATABASE (100+ objects) ---
+OBJECTS = {
+    'car': ['car', 'vehicle'], 'truck': ['truck'], 'bus': ['bus'], 'train': ['train'],
+    'airplane': ['airplane', 'plane'], 'helicopter': ['helicopter'], 'boat': ['boat', 'ship'],
+    'bicycle': ['bicycle', 'bike'], 'motorcycle': ['motorcycle'], 'rocket': ['rocket'],
+    
+    'house': ['house', 'home'], 'building': ['building', 'skyscraper'], 'castle': ['castle'],
+    'church': ['church'], 'tower': ['tower'], 'bridge': ['bridge'], 'barn': ['barn'],
+    'lighthouse': ['lighthouse'], 'tent': ['tent'], 'pyramid': ['pyramid'],
+    
+    'tree': ['tree'], 'pine': ['pine'], 'palm': ['palm'], 'flower': ['flower'],
+    'rose': ['rose'], 'sunflower': ['sunflower'], 'grass': ['grass'], 'bush': ['bush'],
+    'cactus': ['cactus'], 'mushroom': ['mushroom'], 'bamboo': ['bamboo'],
+    
+    'mountain': ['mountain'], 'hill': ['hill'], 'valley': ['valley'], 'volcano': ['volcano'],
+    'desert': ['desert'], 'beach': ['beach'], 'island': ['island'], 'cliff': ['cliff'],
+    'cave': ['cave'], 'rock': ['rock', 'boulder'],
+    
+    'ocean': ['ocean', 'sea'], 'lake': ['lake'], 'river': ['river'], 'pond': ['pond'],
+    'waterfall': ['waterfall'], 'waves': ['waves'], 'reef': ['reef'],
+    
+    'sun': ['sun'], 'moon': ['moon'], 'star': ['star'], 'cloud': ['cloud'],
+    'rainbow': ['rainbow'], 'lightning': ['lightning'], 'tornado': ['tornado'],
+    'rain': ['rain'], 'snow': ['snow'], 'aurora': ['aurora', 'northern lights'],
+    
+    'dog': ['dog', 'puppy'], 'cat': ['cat', 'kitten'], 'horse': ['horse'],
+    'cow': ['cow'], 'sheep': ['sheep'], 'pig': ['pig'], 'rabbit': ['rabbit'],
+    'deer': ['deer'], 'bear': ['bear'], 'wolf': ['wolf'], 'fox': ['fox'],
+    'lion': ['lion'], 'tiger': ['tiger'], 'elephant': ['elephant'], 'giraffe': ['giraffe'],
+    'zebra': ['zebra'], 'monkey': ['monkey'], 'panda': ['panda'], 'kangaroo': ['kangaroo'],
+    
+    'bird': ['bird'], 'eagle': ['eagle'], 'owl': ['owl'], 'parrot': ['parrot'],
+    'penguin': ['penguin'], 'flamingo': ['flamingo'], 'swan': ['swan'], 'duck': ['duck'],
+    'chicken': ['chicken'], 'peacock': ['peacock'],
+    
+    'snake': ['snake'], 'turtle': ['turtle'], 'frog': ['frog'], 'crocodile': ['crocodile'],
+    'dragon': ['dragon'], 'dinosaur': ['dinosaur'],
+    
+    'butterfly': ['butterfly'], 'bee': ['bee'], 'ant': ['ant'], 'spider': ['spider'],
+    'dragonfly': ['dragonfly'], 'ladybug': ['ladybug'],
+    
+    'fish': ['fish'], 'shark': ['shark'], 'dolphin': ['dolphin'], 'whale': ['whale'],
+    'jellyfish': ['jellyfish'], 'octopus': ['octopus'], 'crab': ['crab'], 'starfish': ['starfish'],
+    
+    'person': ['person', 'human'], 'man': ['man'], 'woman': ['woman'], 'child': ['child'],
+    'family': ['family'], 'crowd': ['crowd'], 'superhero': ['superhero'],
+    'robot': ['robot', 'android'], 'alien': ['alien'],
+    
+    'chair': ['chair'], 'table': ['table'], 'bed': ['bed'], 'sofa': ['sofa'],
+    'lamp': ['lamp'], 'clock': ['clock'], 'mirror': ['mirror'], 'window': ['window'],
+    'door': ['door'], 'stairs': ['stairs'], 'fence': ['fence'],
+    
+    'phone': ['phone'], 'computer': ['computer'], 'tv': ['tv', 'television'],
+    'camera': ['camera'], 'book': ['book'], 'umbrella': ['umbrella'], 'backpack': ['backpack'],
+    'ball': ['ball'], 'balloon': ['balloon'], 'kite': ['kite'], 'flag': ['flag'],
+    
+    'apple': ['apple'], 'banana': ['banana'], 'orange': ['orange'], 'pizza': ['pizza'],
+    'cake': ['cake'], 'ice cream': ['ice cream'], 'bread': ['bread'], 'burger': ['burger'],
+    
+    'guitar': ['guitar'], 'piano': ['piano'], 'drum': ['drum'], 'violin': ['violin'],
+    
+    'fire': ['fire', 'flame'], 'smoke': ['smoke'], 'crystal': ['crystal'], 'diamond': ['diamond'],
+    'crown': ['crown'], 'sword': ['sword'], 'shield': ['shield'],
+    
+    'road': ['road', 'street'], 'path': ['path'], 'garden': ['garden'], 'park': ['park'],
+    'city': ['city'], 'village': ['village'], 'farm': ['farm'], 'forest': ['forest'],
+}
+
+COLORS = {
+    'red': (220, 20, 60), 'blue': (30, 144, 255), 'green': (34, 139, 34),
+    'yellow': (255, 215, 0), 'orange': (255, 140, 0), 'purple': (138, 43, 226),
+    'pink': (255, 105, 180), 'brown': (139, 69, 19), 'black': (20, 20, 20),
+    'white': (245, 245, 245), 'gray': (128, 128, 128), 'gold': (255, 215, 0),
+}
+
+TIME_KEYWORDS = {
+    'night': ['night', 'midnight'],
+    'sunset': ['sunset', 'dusk'],
+    'sunrise': ['sunrise', 'dawn'],
+}
+
+WEATHER_KEYWORDS = {
+    'rainy': ['rain', 'rainy', 'raining'],
+    'snowy': ['snow', 'snowy', 'snowing'],
+    'stormy': ['storm', 'stormy'],
+}
+
+# --- KEYWORD MATCHER ---
+# Plurals the suffix rules miss; the vocabularies list singular keywords
+IRREGULAR_PLURALS = {
+    'child': 'children', 'man': 'men', 'woman': 'women', 'person': 'people', 'wolf': 'wolves',
+    'leaf': 'leaves', 'knife': 'knives', 'mouse': 'mice', 'goose': 'geese', 'foot': 'feet',
+    'tooth': 'teeth', 'cactus': 'cacti',
+}
+
+class KeywordMatcher:
+    """Word-boundary aware multi-keyword matcher: one tokenizing pass plus hash lookups"""
+    TOKEN_RE = re.compile(r"[a-z0-9]+")
+    
+    def __init__(self, vocabularies, inflect=True):
+        # vocabularies: {category: {label: [keywords]}}
+        self.inflect = inflect
+        self.words = {}    # single word (and its plurals) -> [(category, label)]
+        self.phrases = {}  # first word of a multi-word keyword -> [(remaining words, [(category, label)])]
+        for category, labels in vocabularies.items():
+            for label, keywords in labels.items():
+                for kw in keywords:
+                    first, *rest = kw.lower().split()
+                    if rest:
+                        for last in self._inflections(rest[-1]):
+                            self._add_phrase(first, tuple(rest[:-1]) + (last,), category, label)
+                    else:
+                        for word in self._inflections(first):
+                            self.words.setdefault(word, []).append((category, label))
+        for candidates in self.phrases.values():
+            candidates.sort(key=lambda c: len(c[0]), reverse=True)
+        self.keys = frozenset(self.words) | frozenset(self.phrases)
+    
+    def _inflections(self, word):
+        if not self.inflect:
+            return (word,)
+        forms = [word, word + 's', word + 'es']
+        if len(word) > 2 and word.endswith('y') and word[-2] not in 'aeiou':
+            forms.append(word[:-1] + 'ies')  # puppy -> puppies, city -> cities
+        if word in IRREGULAR_PLURALS:
+            forms.append(IRREGULAR_PLURALS[word])
+        return forms
+    
+    def _add_phrase(self, first, rest, category, label):
+        candidates = self.phrases.setdefault(first, [])
+        for words, hits in candidates:
+            if words == rest:
+                hits.append((category, label))
+                return
+        candidates.append((rest, [(category, label)]))
+    
+    def _scan(self, words):
+        """Yield (first, last, hits) token spans, preferring multi-word keywords"""
+        keys = self.keys
+        skip_until = 0
+        for i in [i for i, word in enumerate(words) if word in keys]:
+            if i < skip_until:
+                continue
+            word = words[i]
+            for rest, hits in self.phrases.get(word, ()):
+                end = i + 1 + len(rest)
+                if tuple(words[i + 1:end]) == rest:
+                    skip_until = end
+                    yield i, end - 1, hits
+                    break
+            else:
+                hits = self.words.get(word)
+                if hits:
+                    yield i, i, hits
+    
+    def find_all(self, text):
+        """Return (start, end, category, label) for every keyword occurrence in text"""
+        tokens = list(self.TOKEN_RE.finditer(text.lower()))
+        words = [m.group() for m in tokens]
+        return [(tokens[first].start(), tokens[last].end(), category, label)
+                for first, last, hits in self._scan(words)
+                for category, label in hits]
+    
+    def labels(self, text):
+        """Return {category: set(labels)} found in text"""
+        words = self.TOKEN_RE.findall(text.lower())
+        found = {}
+        if self.phrases.keys().isdisjoint(words):
+            # No multi-word keyword can start here, so order doesn't matter
+            for word in self.keys.intersection(words):
+                for category, label in self.words[word]:
+                    found.setdefault(category, set()).add(label)
+        else:
+            for _, _, hits in self._scan(words):
+                for category, label in hits:
+                    found.setdefault(category, set()).add(label)
+        return found
+
+@st.cache_resource
+def get_scene_matcher():
+    """Matcher over the object, color, time and weather vocabularies, built once per process"""
+    return KeywordMatcher({
+        'objects': OBJECTS,
+        'colors': {color: [color] for color in COLORS},
+        'time': TIME_KEYWORDS,
+        'weather': WEATHER_KEYWORDS,
+    })
+
+# --- INTENT ROUTER ---
+# (intent, trigger words/phrases), highest priority first. The same intent may
+# appear twice when some of its triggers should only win over weaker intents.
+INTENT_RULES = [
+    ('image', ['generate', 'create', 'draw', 'paint', 'show me', 'make', 'design']),
+    ('greeting', ['hello', 'hi', 'hey', 'sup', 'greetings', 'good morning', 'good evening']),
+    ('identity', ['who are you', 'what are you']),
+    ('capabilities', ['what can you do', 'capabilities']),
+    ('reasoning', ['why', 'how', 'explain', 'compare', 'analyze', 'what is']),
+    ('search', ['what', 'who', 'when', 'where', 'tell me about', 'information on', 'what is']),
+    ('capabilities', ['help']),
+]
+
+PRO_ONLY_INTENTS = {'reasoning'}
+
+class IntentRouter:
+    """Resolve a message to one intent via a single tokenizing pass and a priority table"""
+    def __init__(self, rules=INTENT_RULES):
+        self.intents = [intent for intent, _ in rules]
+        self.matcher = KeywordMatcher({'rule': {rank: keywords for rank, (_, keywords) in enumerate(rules)}},
+                                      inflect=False)
+    
+    def route(self, text, model_type="Flash", exclude=()):
+        """Return the highest-priority intent triggered by text, or 'chat'"""
+        ranks = sorted(self.matcher.labels(text).get('rule', ()))
+        for rank in ranks:
+            intent = self.intents[rank]
+            if intent in exclude or (intent in PRO_ONLY_INTENTS and model_type != "Pro"):
+                continue
+            return intent
+        return 'chat'
+    
+    def classify(self, inputs, model_type="Flash", exclude=()):
+        """Batch variant of route(), e.g. for replaying logged messages"""
+        route = self.route
+        return [route(text, model_type, exclude) for text in inputs]
+
+@st.cache_resource
+def get_intent_router():
+    """Intent router built once per process"""
+    return IntentRouter()
+
+# --- AUDIO CACHE ---
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("SMARTBOT_AUDIO_CACHE_BYTES", 32 * 1024 * 1024))
+AUDIO_CACHE_DIR = os.environ.get("SMARTBOT_AUDIO_CACHE_DIR") or None
+AUDIO_CACHE_DISK_BYTES = int(os.environ.get("SMARTBOT_AUDIO_CACHE_DISK_BYTES", 256 * 1024 * 1024))  # 0 = no limit
+
+class AudioCache:
+    """Content-addressed MP3 cache: in-memory LRU with a byte budget plus optional disk tier.
+    
+    The disk tier has its own budget; past it, the least recently used files are deleted
+    until it is back under 90% of the budget, so pruning doesn't run on every write."""
+    def __init__(self, max_bytes=AUDIO_CACHE_MAX_BYTES, disk_dir=AUDIO_CACHE_DIR,
+                 disk_max_bytes=AUDIO_CACHE_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_size = 0
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_size = sum(size for _, _, size in self._disk_entries())
+    
+    @staticmethod
+    def make_key(clean_text, lang, slow, backend_name="gtts"):
+        payload = f"{backend_name}|{lang}|{'slow' if slow else 'normal'}|{clean_text}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+        
+        data = self._read_disk(key)
+        with self.lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, data)
+        return data
+    
+    def put(self, key, data):
+        with self.lock:
+            self._store(key, data)
+        self._write_disk(key, data)
+    
+    def _store(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+    
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.audio")
+    
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # recently used files are pruned last
+            return data
+        except OSError:
+            return None
+    
+    def _write_disk(self, key, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            existed = os.path.exists(path)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self.lock:
+            if not existed:
+                self.disk_size += len(data)
+            over = self.disk_max_bytes and self.disk_size > self.disk_max_bytes
+        if over:
+            self._prune_disk()
+    
+    def _disk_entries(self):
+        """(mtime, path, size) of every cached file on disk"""
+        entries = []
+        try:
+            with os.scandir(self.disk_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".audio"):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+        except OSError as e:
+            logger.warning("could not list audio cache directory: %s", e)
+        return entries
+    
+    def _prune_disk(self):
+        """Delete the least recently used files until the disk tier is under 90% of its budget"""
+        entries = sorted(self._disk_entries())
+        size = sum(file_size for _, _, file_size in entries)
+        target = self.disk_max_bytes * 0.9
+        for _, path, file_size in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= file_size
+        with self.lock:
+            self.disk_size = size
+
+@st.cache_resource
+def get_audio_cache():
+    """Process-wide audio cache shared by all sessions"""
+    return AudioCache()
+
+# --- TEXT TO SPEECH BACKENDS ---
+TTS_BACKEND = os.environ.get("SMARTBOT_TTS_BACKEND", "gtts")
+
+class TTSBackend:
+    """Interface for speech synthesizers that return encoded audio bytes"""
+    name = "base"
+    mime_type = "audio/mp3"
+    
+    def synthesize(self, text, lang='en', slow=False):
+        raise NotImplementedError
+    
+    def join(self, clips):
+        """Concatenate clips synthesized from consecutive chunks (MP3 frames join as-is)"""
+        return b"".join(clips)
+
+class GTTSBackend(TTSBackend):
+    """Google Text-to-Speech, written straight into a memory buffer"""
+    name = "gtts"
+    mime_type = "audio/mp3"
+    
+    def synthesize(self, text, lang='en', slow=False):
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang, slow=slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+class OfflineTTSBackend(TTSBackend):
+    """Local stand-in synthesizer for tests and benchmarks: a short tone per word"""
+    name = "offline"
+    mime_type = "audio/wav"
+    
+    def __init__(self, delay=0.0, sample_rate=8000, seconds_per_word=0.05):
+        self.delay = delay
+        self.sample_rate = sample_rate
+        self.seconds_per_word = seconds_per_word
+    
+    def synthesize(self, text, lang='en', slow=False):
+        if self.delay:
+            time.sleep(self.delay)
+        
+        words = max(1, len(text.split()))
+        duration = words * self.seconds_per_word * (2 if slow else 1)
+        n_samples = int(duration * self.sample_rate)
+        samples = (int(8000 * math.sin(2 * math.pi * 440 * i / self.sample_rate)) for i in range(n_samples))
+        
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(struct.pack(f"<{n_samples}h", *samples))
+        return buffer.getvalue()
+    
+    def join(self, clips):
+        if len(clips) == 1:
+            return clips[0]
+        
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as out:
+            for i, clip in enumerate(clips):
+                with wave.open(io.BytesIO(clip), "rb") as wav:
+                    if i == 0:
+                        out.setparams(wav.getparams())
+                    out.writeframes(wav.readframes(wav.getnframes()))
+        return buffer.getvalue()
+
+TTS_BACKENDS = {
+    'gtts': GTTSBackend,
+    'offline': OfflineTTSBackend,
+}
+
+@st.cache_resource
+def get_tts_backend():
+    """Process-wide speech backend selected by SMARTBOT_TTS_BACKEND"""
+    return TTS_BACKENDS[TTS_BACKEND]()
+
+# --- TEXT TO SPEECH FUNCTION ---
+TTS_CHUNK_CHARS = int(os.environ.get("SMARTBOT_TTS_CHUNK_CHARS", 200))
+TTS_MAX_WORKERS = int(os.environ.get("SMARTBOT_TTS_WORKERS", 4))
+
+def clean_text_for_speech(text):
+    """Strip markdown and newlines so only speakable text remains"""
+    clean_text = re.sub(r'\*\*|__|~~|#', '', text)
+    clean_text = re.sub(r'\s+', ' ', clean_text)
+    return clean_text.strip()
+
+def split_into_chunks(clean_text, max_chars=TTS_CHUNK_CHARS):
+    """Group sentences into chunks of at most max_chars, splitting overlong sentences on spaces"""
+    chunks = []
+    current = ""
+    for sentence in re.split(r'(?<=[.!?])\s+', clean_text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+def synthesize_speech(clean_text, lang='en', slow=False, backend=None, cache=None):
+    """Synthesize audio bytes in memory, reusing cached audio when available"""
+    backend = backend or get_tts_backend()
+    cache = cache or get_audio_cache()
+    key = cache.make_key(clean_text, lang, slow, backend.name)
+    audio_bytes = cache.get(key)
+    if audio_bytes is not None:
+        return audio_bytes
+    
+    audio_bytes = backend.synthesize(clean_text, lang=lang, slow=slow)
+    cache.put(key, audio_bytes)
+    return audio_bytes
+
+class SpeechSynthesizer:
+    """Synthesizes chunks on a bounded thread pool, coalescing identical in-flight chunks"""
+    def __init__(self, backend, cache, max_workers=TTS_MAX_WORKERS):
+        self.backend = backend
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        self.inflight = {}
+        self.lock = threading.Lock()
+    
+    def submit(self, chunk, lang='en', slow=False):
+        """Future for the audio bytes of one chunk"""
+        key = self.cache.make_key(chunk, lang, slow, self.backend.name)
+        audio_bytes = self.cache.get(key)
+        trace_count("audio_cache.hit" if audio_bytes is not None else "audio_cache.miss")
+        if audio_bytes is not None:
+            future = Future()
+            future.set_result(audio_bytes)
+            return future
+        
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is None:
+                future = self.inflight[key] = self.executor.submit(self._synthesize, key, chunk, lang, slow)
+        return future
+    
+    def submit_text(self, text, lang='en', slow=False):
+        """Start synthesizing every chunk of text; returns one future per chunk, in order"""
+        return [self.submit(chunk, lang, slow) for chunk in split_into_chunks(clean_text_for_speech(text))]
+    
+    def submit_stream(self, stream, lang='en', slow=False):
+        """Pass a streamed response through, starting synthesis of each chunk as soon as it is complete"""
+        text = ""
+        submitted = 0
+        for piece in stream:
+            yield piece
+            text += piece
+            # The last chunk can still grow; every chunk before it is final
+            chunks = split_into_chunks(clean_text_for_speech(text))
+            for chunk in chunks[submitted:-1]:
+                self.submit(chunk, lang, slow)
+            submitted = max(submitted, len(chunks) - 1)
+    
+    def _synthesize(self, key, chunk, lang, slow):
+        try:
+            return synthesize_speech(chunk, lang, slow, self.backend, self.cache)
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+@st.cache_resource
+def get_speech_synthesizer():
+    """Process-wide synthesizer shared by all sessions"""
+    return SpeechSynthesizer(get_tts_backend(), get_audio_cache())
+
+def text_to_speech_button(text, lang='en', slow=False):
+    """Add audio players served from in-memory audio bytes"""
+    try:
+        synthesizer = get_speech_synthesizer()
+        backend = synthesizer.backend
+        
+        # Each chunk is synthesized (and cached) independently, in parallel
+        futures = synthesizer.submit_text(text, lang, slow)
+        if not futures:
+            return
+        with trace_span("tts.first_chunk"):
+            first = futures[0].result()
+        rest = futures[1:]
+        if all(f.done() for f in rest):
+            with trace_span("tts.join"):
+                audio = backend.join([first] + [f.result() for f in rest])
+            st.audio(audio, format=backend.mime_type)
+            return
+        
+        # Let playback start on the first chunk; the rest gets a second player once it is ready,
+        # so a listener already playing the first is not interrupted
+        st.audio(first, format=backend.mime_type)
+        with trace_span("tts.remaining_chunks"):
+            clips = [f.result() for f in rest]
+        with trace_span("tts.join"):
+            audio = backend.join(clips)
+        st.audio(audio, format=backend.mime_type)
+        
+    except Exception as e:
+        st.caption("🔇 Audio unavailable")
+
+# --- WEB SEARCH ---
+SEARCH_URL = os.environ.get("SMARTBOT_SEARCH_URL", "https://api.duckduckgo.com/")
+SEARCH_TIMEOUT = float(os.environ.get("SMARTBOT_SEARCH_TIMEOUT", 5))
+SEARCH_CACHE_SIZE = int(os.environ.get("SMARTBOT_SEARCH_CACHE_SIZE", 1024))
+SEARCH_CACHE_TTL = float(os.environ.get("SMARTBOT_SEARCH_CACHE_TTL", 3600))
+SEARCH_NEGATIVE_TTL = float(os.environ.get("SMARTBOT_SEARCH_NEGATIVE_TTL", 300))
+SEARCH_POOL_SIZE = int(os.environ.get("SMARTBOT_SEARCH_POOL_SIZE", 8))
+SEARCH_TURN_BUDGET = float(os.environ.get("SMARTBOT_SEARCH_TURN_BUDGET", 1.5))
+SEARCH_SLOW_CALL = float(os.environ.get("SMARTBOT_SEARCH_SLOW_CALL", SEARCH_TURN_BUDGET))  # counts as a failure
+BREAKER_FAILURE_RATE = float(os.environ.get("SMARTBOT_BREAKER_FAILURE_RATE", 0.5))
+BREAKER_MIN_CALLS = int(os.environ.get("SMARTBOT_BREAKER_MIN_CALLS", 5))
+BREAKER_WINDOW = float(os.environ.get("SMARTBOT_BREAKER_WINDOW", 60))
+BREAKER_COOLDOWN = float(os.environ.get("SMARTBOT_BREAKER_COOLDOWN", 30))
+
+class SearchError(Exception):
+    """Raised when the search backend cannot be reached or returns garbage"""
+
+def normalize_query(query):
+    """Canonical form used both as cache key and as the upstream query"""
+    query = re.sub(r'\s+', ' ', query.lower()).strip()
+    return query.rstrip('?!. ')
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry TTL"""
+    def __init__(self, max_entries=SEARCH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        """Return (found, value); a cached None is a valid negative entry"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+    
+    def put(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+# What a reused keep-alive connection raises when the server has already closed it; only
+# these are worth a retry; a timeout means the upstream is slow and would be slow again
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                           ConnectionResetError, BrokenPipeError)
+
+class HTTPConnectionPool:
+    """Small pool of keep-alive connections to a single host"""
+    def __init__(self, base_url, max_size=SEARCH_POOL_SIZE, timeout=SEARCH_TIMEOUT):
+        parts = urllib.parse.urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path or "/"
+        self.timeout = timeout
+        self.pool = queue.LifoQueue(maxsize=max_size)
+    
+    def _connect(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+    
+    def get(self, params):
+        """GET base_url with the given query params and return the response body"""
+        url = f"{self.base_path}?{urllib.parse.urlencode(params)}"
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            conn = None
+        
+        if conn is not None:
+            try:
+                response, body = self._exchange(conn, url)
+            except STALE_CONNECTION_ERRORS:
+                # The server dropped this idle keep-alive connection; retry once on a fresh one
+                conn.close()
+                conn = None
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                raise SearchError(f"request to {self.host} failed: {e}") from e
+        if conn is None:
+            conn = self._connect()
+            try:
+                response, body = self._exchange(conn, url)
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                raise SearchError(f"request to {self.host} failed: {e}") from e
+        
+        self._release(conn, response)
+        if response.status != 200:
+            raise SearchError(f"{self.host} returned HTTP {response.status}")
+        return body
+    
+    def _exchange(self, conn, url):
+        conn.request("GET", url, headers={"User-Agent": "SmartBot/1.2"})
+        response = conn.getresponse()
+        return response, response.read()
+    
+    def _release(self, conn, response):
+        if response.will_close:
+            conn.close()
+            return
+        try:
+            self.pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+def extract_answer(data):
+    """Pick the abstract, or the first related topic, from a DuckDuckGo response"""
+    if not isinstance(data, dict):
+        raise SearchError(f"unexpected {type(data).__name__} from search backend")
+    if data.get('Abstract'):
+        return data['Abstract']
+    elif data.get('RelatedTopics'):
+        topics = [t.get('Text', '') for t in data['RelatedTopics'] if isinstance(t, dict)]
+        return topics[0] if topics else None
+    return None
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker: closed -> open after too many failures -> half-open probe"""
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    
+    def __init__(self, failure_rate=BREAKER_FAILURE_RATE, min_calls=BREAKER_MIN_CALLS,
+                 window=BREAKER_WINDOW, cooldown=BREAKER_COOLDOWN):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.outcomes = deque()
+        self.lock = threading.Lock()
+    
+    def allow(self):
+        """Whether a new upstream call may be made right now"""
+        with self.lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self.probing:
+                    return False
+                self.probing = True
+            return True
+    
+    def record_success(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.probing = False
+                self.outcomes.clear()
+            self._record(True)
+    
+    def record_failure(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._record(False)
+            failures = sum(1 for _, ok in self.outcomes if not ok)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.failure_rate:
+                self._trip()
+    
+    def _record(self, ok):
+        now = time.monotonic()
+        self.outcomes.append((now, ok))
+        while self.outcomes and self.outcomes[0][0] < now - self.window:
+            self.outcomes.popleft()
+    
+    def _trip(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probing = False
+        self.outcomes.clear()
+        logger.warning("web search circuit opened for %.0fs", self.cooldown)
+
+class SearchService:
+    """Shared DuckDuckGo client with TTL caching, negative caching, single-flight requests and a circuit breaker"""
+    def __init__(self, base_url=SEARCH_URL, cache=None, ttl=SEARCH_CACHE_TTL,
+                 negative_ttl=SEARCH_NEGATIVE_TTL, timeout=SEARCH_TIMEOUT, breaker=None, slow_call=SEARCH_SLOW_CALL):
+        self.http = HTTPConnectionPool(base_url, timeout=timeout)
+        self.cache = cache or TTLCache()
+        self.breaker = breaker or CircuitBreaker()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.slow_call = slow_call
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=SEARCH_POOL_SIZE, thread_name_prefix="search")
+    
+    def fetch(self, query):
+        """Query the upstream API directly, bypassing the cache"""
+        body = self.http.get({'q': query, 'format': 'json', 'no_html': 1})
+        try:
+            data = json.loads(body.decode())
+        except ValueError as e:
+            raise SearchError(f"invalid JSON from search backend: {e}") from e
+        return extract_answer(data)
+    
+    def search(self, query, budget=None):
+        """Return a cached or fresh answer, or None if nothing arrives within budget seconds"""
+        key = normalize_query(query)
+        if not key:
+            return None
+        
+        found, value = self.cache.get(key)
+        trace_count("search_cache.hit" if found else "search_cache.miss")
+        if found:
+            return value
+        
+        # Single-flight: concurrent identical queries wait on the same background request
+        with self.lock:
+            call = self.inflight.get(key)
+            if call is None:
+                if not self.breaker.allow():
+                    return None
+                call = self.inflight[key] = self.executor.submit(self._fetch_and_store, key)
+        
+        wait = budget if budget is not None else self.timeout
+        try:
+            with trace_span("search.wait"):
+                return call.result(timeout=wait)
+        except FutureTimeoutError:
+            # The request keeps running and its result lands in the cache for the next turn
+            logger.info("web search for %r exceeded its %.2fs budget", key, wait)
+            return None
+    
+    def _fetch_and_store(self, key):
+        start = time.monotonic()
+        try:
+            result = self.fetch(key)
+            elapsed = time.monotonic() - start
+            if elapsed > self.slow_call:
+                # Too slow to make any turn's budget: an upstream that is up but this slow should
+                # trip the breaker too, or every uncached turn waits out its budget. The late
+                # answer is still cached below.
+                self.breaker.record_failure()
+                logger.info("web search for %r took %.2fs, counted as a slow call", key, elapsed)
+            else:
+                self.breaker.record_success()
+            self.cache.put(key, result, self.ttl if result else self.negative_ttl)
+            return result
+        except Exception as e:
+            # Any failure, not just SearchError, must count; otherwise a half-open probe is never released
+            self.breaker.record_failure()
+            logger.warning("web search failed for %r: %s", key, e)
+            return None
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+@st.cache_resource
+def get_search_service():
+    """Process-wide search service shared by all sessions"""
+    return SearchService()
+
+# --- KNOWLEDGE BASE ---
+KNOWLEDGE_PATH = os.environ.get("SMARTBOT_KNOWLEDGE_PATH",
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge.jsonl"))
+KNOWLEDGE_MIN_SCORE = float(os.environ.get("SMARTBOT_KNOWLEDGE_MIN_SCORE", 1.0))
+# Share of the query's terms the best entry must contain to answer ahead of the web
+KNOWLEDGE_MIN_COVERAGE = float(os.environ.get("SMARTBOT_KNOWLEDGE_MIN_COVERAGE", 0.6))
+
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'with', 'about', 'by', 'at', 'from',
+    'is', 'are', 'was', 'were', 'be', 'been', 'do', 'does', 'did', 'can', 'could', 'should', 'would',
+    'what', 'who', 'when', 'where', 'why', 'how', 'which', 'tell', 'me', 'explain', 'compare', 'vs',
+    'i', 'you', 'it', 'its', 'this', 'that', 'they', 'them', 'my', 'your', 'some', 'more', 'much',
+}
+
+def index_terms(text):
+    """Lowercased, lightly stemmed, stopword-free tokens used for indexing and queries"""
+    terms = []
+    for word in KeywordMatcher.TOKEN_RE.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+class KnowledgeBase:
+    """BM25-scored inverted index over a JSONL corpus; entry bodies stay in the memory-mapped file"""
+    K1 = 1.5
+    B = 0.75
+    
+    def __init__(self, path=KNOWLEDGE_PATH):
+        self.path = path
+        self.spans = []      # doc id -> (start, end) byte offsets of its line
+        self.lengths = []    # doc id -> number of indexed terms
+        self.postings = {}   # term -> [(doc id, term frequency)]
+        self.mm = None
+        self._load()
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+    
+    def __len__(self):
+        return len(self.spans)
+    
+    def _load(self):
+        try:
+            f = open(self.path, "rb")
+        except OSError as e:
+            logger.warning("knowledge base unavailable: %s", e)
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        start = 0
+        while start < len(self.mm):
+            end = self.mm.find(b"\n", start)
+            end = len(self.mm) if end == -1 else end
+            if end > start:
+                try:
+                    entry = json.loads(self.mm[start:end])
+                except ValueError:
+                    logger.warning("skipping malformed knowledge entry at byte %d", start)
+                else:
+                    self._index(entry, (start, end))
+            start = end + 1
+    
+    def _index(self, entry, span):
+        doc_id = len(self.spans)
+        text = " ".join([entry.get('title', ''), " ".join(entry.get('keywords', ())), entry.get('text', '')])
+        terms = index_terms(text)
+        self.spans.append(span)
+        self.lengths.append(len(terms))
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            self.postings.setdefault(term, []).append((doc_id, tf))
+    
+    def entry(self, doc_id):
+        """Decode a single entry from the memory-mapped file"""
+        start, end = self.spans[doc_id]
+        return json.loads(self.mm[start:end])
+    
+    def search(self, query, limit=3):
+        """Return [(score, doc id)] best-first by BM25"""
+        n_docs = len(self.spans)
+        scores = {}
+        for term in set(index_terms(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                norm = self.K1 * (1 - self.B + self.B * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+        return sorted(((score, doc_id) for doc_id, score in scores.items()), reverse=True)[:limit]
+    
+    def coverage(self, query, doc_id):
+        """Fraction of the query's distinct terms that occur in the entry"""
+        terms = set(index_terms(query))
+        if not terms:
+            return 0.0
+        matched = sum(1 for term in terms if any(d == doc_id for d, _ in self.postings.get(term, ())))
+        return matched / len(terms)
+    
+    def lookup(self, query, min_score=KNOWLEDGE_MIN_SCORE, min_coverage=KNOWLEDGE_MIN_COVERAGE):
+        """Text of the best-matching entry, or None unless it is a confident match.
+        
+        On a corpus this small one shared word clears any BM25 cut-off, so the entry must also
+        contain most of the query's terms; pass min_coverage=0 for a best-effort fallback."""
+        results = self.search(query, limit=1)
+        if not results:
+            return None
+        score, doc_id = results[0]
+        if score >= min_score and self.coverage(query, doc_id) >= min_coverage:
+            return self.entry(doc_id).get('text')
+        return None
+
+@st.cache_resource
+def get_knowledge_base():
+    """Knowledge base indexed once per process from SMARTBOT_KNOWLEDGE_PATH"""
+    return KnowledgeBase()
+
+# --- CONVERSATION MEMORY ---
+MEMORY_MAX_TURNS = int(os.environ.get("SMARTBOT_MEMORY_MAX_TURNS", 50))
+MEMORY_MAX_BYTES = int(os.environ.get("SMARTBOT_MEMORY_MAX_BYTES", 16 * 1024))
+MEMORY_LOG_DIR = os.environ.get("SMARTBOT_MEMORY_LOG_DIR") or None
+
+# Explicit requests to continue the last topic, whatever the router made of them
+FOLLOW_UP_CUE_RE = re.compile(
+    r"^(?:(?:and|ok|okay|please|so)\s+)?(?:tell me more|more (?:about|on) (?:it|that|this|them)|"
+    r"what about (?:it|that|this|them)|go on|elaborate)\b",
+    re.IGNORECASE)
+# Short search or reasoning questions that point back with a pronoun ('why is it used?')
+FOLLOW_UP_QUESTION_RE = re.compile(
+    r"^(?:and\s+)?(?:what|who|where|when|why|how|which)\b.*\b(?:it|its|they|them|those)\b",
+    re.IGNORECASE)
+FOLLOW_UP_MAX_WORDS = 6
+TOPIC_PREFIX_RE = re.compile(
+    r"^(?:(?:what|who|where|when|why|how)(?:\s+(?:is|are|was|were|does|do|did))?|tell me about|"
+    r"information on|explain|compare|analyze)\s+(?:(?:a|an|the)\s+)?",
+    re.IGNORECASE)
+
+def extract_topic(text):
+    """Strip question words from a search-style message, leaving its subject"""
+    topic = TOPIC_PREFIX_RE.sub('', text.strip())
+    return topic.rstrip('?!. ') or None
+
+class Turn:
+    """One remembered user turn"""
+    __slots__ = ('text', 'intent', 'topic', 'timestamp')
+    
+    def __init__(self, text, intent, topic=None):
+        self.text = text
+        self.intent = intent
+        self.topic = topic
+        self.timestamp = time.time()
+    
+    @property
+    def nbytes(self):
+        return len(self.text) + len(self.topic or '') + 64
+    
+    def to_dict(self):
+        return {'text': self.text, 'intent': self.intent, 'topic': self.topic, 'timestamp': self.timestamp}
+
+class ConversationMemory:
+    """Ring buffer of recent turns bounded by count and bytes, optionally spilling evictions to disk"""
+    def __init__(self, max_turns=MEMORY_MAX_TURNS, max_bytes=MEMORY_MAX_BYTES, log_dir=MEMORY_LOG_DIR):
+        self.turns = deque()
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.conversation_id = uuid.uuid4().hex
+        self.log_path = None
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+            self.log_path = os.path.join(log_dir, "conversations.jsonl")
+    
+    def __len__(self):
+        return len(self.turns)
+    
+    def add(self, text, intent, topic=None):
+        turn = Turn(text, intent, topic)
+        self.turns.append(turn)
+        self.size += turn.nbytes
+        evicted = []
+        while len(self.turns) > self.max_turns or (self.size > self.max_bytes and len(self.turns) > 1):
+            old = self.turns.popleft()
+            self.size -= old.nbytes
+            evicted.append(old)
+        if evicted:
+            self._spill(evicted)
+        return turn
+    
+    def recent(self, n=5):
+        return list(self.turns)[-n:]
+    
+    def compact(self, keep=0):
+        """Spill all but the newest keep turns; returns the bytes released"""
+        evicted = []
+        while len(self.turns) > keep:
+            old = self.turns.popleft()
+            self.size -= old.nbytes
+            evicted.append(old)
+        if evicted:
+            self._spill(evicted)
+        return sum(turn.nbytes for turn in evicted)
+    
+    def last_topic(self):
+        """Subject of the most recent search or reasoning turn, if any"""
+        for turn in reversed(self.turns):
+            if turn.topic:
+                return turn.topic
+        return None
+    
+    def _spill(self, turns):
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                for turn in turns:
+                    f.write(json.dumps({'conversation': self.conversation_id, **turn.to_dict()}) + "\n")
+        except OSError as e:
+            logger.warning("could not spill conversation memory: %s", e)
+
+# --- ADVANCED CHAT ENGINE ---
+FANOUT_WORKERS = int(os.environ.get("SMARTBOT_FANOUT_WORKERS", 16))
+TURN_METRICS_SIZE = 100
+
+@st.cache_resource
+def get_fanout_executor():
+    """Thread pool for the concurrent lookups of the Pro reasoning path"""
+    return ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+class SmartChatEngine:
+    def __init__(self, search_service=None, search_budget=SEARCH_TURN_BUDGET, memory=None):
+        self.memory = memory if memory is not None else ConversationMemory()
+        self.search_service = search_service
+        self.search_budget = search_budget
+        self.turn_deadline = None
+        self.last_intent = None
+        self.turn_metrics = deque(maxlen=TURN_METRICS_SIZE)
+        self.turn_metrics_bytes = 0  # kept running, so other threads can size the deque without iterating it
+        
+    def remaining_budget(self):
+        """Seconds left in this turn's latency budget, or None outside a turn"""
+        if self.turn_deadline is None:
+            return None
+        return max(0.0, self.turn_deadline - time.monotonic())
+    
+    def search_web(self, query):
+        """Search DuckDuckGo API through the shared cached search service"""
+        service = self.search_service or get_search_service()
+        with trace_span("search_web"):
+            return service.search(query, budget=self.remaining_budget())
+    
+    def resolve_follow_up(self, user_input, intent):
+        """Point short follow-ups ('tell me more', 'why is it used?') at the last search topic.
+        
+        Chat and image messages are only rewritten on an explicit cue, never for a bare pronoun
+        ('that is so cool', 'can you draw it?')."""
+        topic = self.memory.last_topic()
+        if not topic or intent == 'image':
+            return user_input, intent
+        text = user_input.strip()
+        if FOLLOW_UP_CUE_RE.match(text):
+            return topic, ('search' if intent == 'chat' else intent)
+        words = KeywordMatcher.TOKEN_RE.findall(text.lower())
+        if (intent in ('search', 'reasoning') and len(words) <= FOLLOW_UP_MAX_WORDS
+                and FOLLOW_UP_QUESTION_RE.match(text)):
+            return topic, intent
+        return user_input, intent
+    
+    def analyze_question(self, query):
+        """First reasoning step: classify the kind of question"""
+        words = set(KeywordMatcher.TOKEN_RE.findall(query.lower()))
+        if 'why' in words or 'how' in words:
+            return "Detected explanatory question - searching for causal relationships"
+        elif 'compare' in words or 'difference' in words:
+            return "Detected comparison query - analyzing multiple factors"
+        elif 'best' in words or 'recommend' in words:
+            return "Detected recommendation request - evaluating options"
+        else:
+            return "Analyzing query structure and intent"
+    
+    def lookup_answer(self, query, search_query=None):
+        """Remaining reasoning steps plus (answer, from_web)"""
+        steps = []
+        
+        # Query the local knowledge base and the web together; the first useful answer wins.
+        # The local lookup returns in microseconds, so it may only answer on a confident match;
+        # anything weaker waits for the web and serves as the fallback after the deadline.
+        target = search_query or query
+        knowledge_base = get_knowledge_base()
+        service = self.search_service or get_search_service()
+        budget = self.remaining_budget()
+        lookups = {
+            get_fanout_executor().submit(knowledge_base.lookup, target, min_coverage=KNOWLEDGE_MIN_COVERAGE): False,
+            get_fanout_executor().submit(service.search, target, budget): True,
+        }
+        try:
+            with trace_span("lookup_answer"):
+                for future in as_completed(lookups, timeout=None if budget is None else budget + 0.05):
+                    answer = future.result()
+                    if answer:
+                        from_web = lookups[future]
+                        steps.append("Retrieved relevant data from web sources" if from_web
+                                     else "Found a confident match in the local knowledge base")
+                        steps.append("Synthesizing information with logical inference")
+                        return steps, answer, from_web
+        except FutureTimeoutError:
+            pass
+        
+        steps.append("Using existing knowledge base for response")
+        return steps, self.generate_knowledge_response(f"{target} {query}"), False
+    
+    def respond(self, user_input, model_type, intent=None):
+        """Full response text for one turn"""
+        return "".join(self.respond_stream(user_input, model_type, intent))
+    
+    def respond_stream(self, user_input, model_type, intent=None):
+        """Yield the response in chunks as they become available, recording turn latency"""
+        start = time.perf_counter()
+        first_chunk = None
+        try:
+            for chunk in self._respond_chunks(user_input, model_type, intent):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                    trace = current_trace()
+                    if trace is not None:
+                        trace.add_span("respond.first_chunk", start, start + first_chunk, depth=trace.depth)
+                yield chunk
+        finally:
+            self.turn_deadline = None  # the budget belongs to this turn alone
+        metric = {
+            'intent': self.last_intent,
+            'first_chunk': first_chunk,
+            'total': time.perf_counter() - start,
+        }
+        if len(self.turn_metrics) == self.turn_metrics.maxlen:
+            self.turn_metrics_bytes -= sys.getsizeof(self.turn_metrics[0])
+        self.turn_metrics.append(metric)
+        self.turn_metrics_bytes += sys.getsizeof(metric)
+    
+    def clear_turn_metrics(self):
+        """Drop the recorded turn latencies; returns the bytes they held"""
+        freed, self.turn_metrics_bytes = self.turn_metrics_bytes, 0
+        self.turn_metrics.clear()
+        return freed
+    
+    def _respond_chunks(self, user_input, model_type, intent=None):
+        """Response generator behind respond_stream(); each branch yields its text in order"""
+        self.turn_deadline = time.monotonic() + self.search_budget
+        if intent is None:
+            intent = get_intent_router().route(user_input, model_type, exclude=('image',))
+        
+        # Follow-ups reuse the subject of the previous question
+        query, intent = self.resolve_follow_up(user_input, intent)
+        self.last_intent = intent
+        topic = query if query != user_input else extract_topic(user_input)
+        self.memory.add(user_input, intent, topic if intent in ('search', 'reasoning') else None)
+        
+        # Greetings
+        if intent == 'greeting':
+            responses = [
+                f"Hello! I'm SmartBot {model_type}. How can I help you today?",
+                f"Hi there! SmartBot {model_type} at your service! What would you like to know?",
+                f"Hey! Ready to assist with conversation, reasoning, or image generation!",
+                f"Greetings! I'm here to help. Ask me anything or request an image!",
+            ]
+            yield random.choice(responses)
+            return
+        
+        # Identity
+        if intent == 'identity':
+            yield (f"I'm SmartBot {model_type}, an advanced AI assistant! I can:\n\n"
+                   "- Have natural conversations\n"
+                   "- Generate images from 100+ objects\n"
+                   "- Search the web for current information\n"
+                   "- Perform advanced reasoning (Pro model)\n"
+                   "- Read responses aloud\n\n"
+                   "Try asking me something or say 'generate an image of...'")
+            return
+        
+        # Capabilities
+        if intent == 'capabilities':
+            yield """**SmartBot Capabilities:**
+
+**Conversation**: Natural dialogue with context awareness
+**Image Creation**: 100+ objects including vehicles, animals, buildings, nature, and more
+**Web Search**: Real-time information from the internet
+**Advanced Reasoning**: Step-by-step logical analysis (Pro model only)
+**Text-to-Speech**: Click 'Read Aloud' to hear responses
+
+**Try these examples:**
+- "What is quantum computing?"
+- "Generate a sunset with mountains and a lake"
+- "Compare electric vs gas cars"
+- "Tell me about recent AI developments" """
+            return
+        
+        # Pro Model Reasoning: steps stream out while the lookups are still running
+        if intent == 'reasoning':
+            yield "**Advanced Reasoning Process:**\n\n"
+            yield f"1. {self.analyze_question(user_input)}\n"
+            steps, answer, from_web = self.lookup_answer(user_input, search_query=query)
+            for i, step in enumerate(steps, 2):
+                yield f"{i}. {step}\n"
+            
+            yield "\n**Conclusion:**\n\n"
+            if from_web:
+                yield f"{answer}\n\n*This response combines web search with logical analysis.*"
+            else:
+                yield answer
+            return
+        
+        # Standard web search for factual queries
+        if intent == 'search':
+            local = self.lookup_knowledge(query)
+            if local:
+                if model_type == "Pro":
+                    yield f"**From the Knowledge Base:**\n\n{local}"
+                else:
+                    yield f"Here's what I know: {local}"
+                return
+            
+            result = self.search_web(query)
+            if result:
+                if model_type == "Pro":
+                    yield f"**Web Search Results:**\n\n{result}\n\n*Verified from multiple sources*"
+                else:
+                    yield f"Here's what I found: {result}"
+                return
+            
+            # Nothing from the web: a weaker local match beats a canned reply
+            local = self.lookup_knowledge(query, min_coverage=0)
+            if local:
+                if model_type == "Pro":
+                    yield f"**From the Knowledge Base:**\n\n{local}"
+                else:
+                    yield f"Here's what I know: {local}"
+                return
+        
+        # Conversational responses
+        yield self.generate_conversational_response(user_input)
+    
+    def lookup_knowledge(self, query, min_coverage=KNOWLEDGE_MIN_COVERAGE):
+        """Answer from the local knowledge base, or None"""
+        with trace_span("kb_lookup"):
+            return get_knowledge_base().lookup(query, min_coverage=min_coverage)
+    
+    def generate_knowledge_response(self, query):
+        """Generate knowledge-based response"""
+        answer = self.lookup_knowledge(query, min_coverage=0)
+        if answer:
+            return answer
+        return "That's an interesting question! Based on my knowledge, this topic involves multiple factors to consider. Could you be more specific about what aspect interests you most?"
+    
+    def generate_conversational_response(self, user_input):
+        """Generate engaging conversational responses"""
+        responses = [
+            "That's a fascinating topic! What specifically interests you about it?",
+            "I see what you're getting at. Tell me more about your thoughts on this.",
+            "Interesting perspective! I'd love to hear more details.",
+            "That's worth exploring further. What aspect would you like to discuss?",
+            "Great question! Let me think about that from different angles.",
+            "I appreciate you bringing that up. Can you elaborate a bit more?",
+        ]
+        return random.choice(responses)
+
+# --- DISPLAY LIST RENDERING ---
+# Scene geometry is authored in 800x600 reference pixels and stored normalized,
+# so a display list can be rasterized at any output size.
+REF_WIDTH, REF_HEIGHT = 800, 600
+LAYER_CACHE_BYTES = int(os.environ.get("SMARTBOT_LAYER_CACHE_BYTES", 64 * 1024 * 1024))
+IMAGE_CACHE_BYTES = int(os.environ.get("SMARTBOT_IMAGE_CACHE_BYTES", 32 * 1024 * 1024))
+IMAGE_STORE_BYTES = int(os.environ.get("SMARTBOT_IMAGE_STORE_BYTES", 128 * 1024 * 1024))
+IMAGE_FORMAT = "PNG"
+PREVIEW_MAX_SIDE = int(os.environ.get("SMARTBOT_PREVIEW_MAX_SIDE", 256))
+PREVIEW_FORMAT = os.environ.get("SMARTBOT_PREVIEW_FORMAT", "JPEG")
+PREVIEW_QUALITY = 60
+PREVIEW_PACING = os.environ.get("SMARTBOT_PREVIEW_PACING", "1") != "0"  # "0" drops the artificial delay
+
+# (zenith, horizon, ground near horizon, ground at the bottom edge)
+SKY_GRADIENTS = {
+    'day': ((70, 130, 220), (170, 215, 250), (60, 160, 60), (30, 110, 30)),
+    'night': ((5, 5, 25), (25, 30, 70), (20, 40, 20), (10, 22, 10)),
+    'sunset': ((70, 60, 140), (255, 140, 60), (100, 80, 40), (60, 45, 25)),
+    'sunrise': ((120, 170, 230), (255, 200, 150), (80, 120, 60), (50, 80, 40)),
+}
+HORIZON = 300  # reference-pixel row where the sky meets the ground
+
+# Particles per scene; generation and compositing are vectorized, so these can grow freely
+PARTICLE_COUNTS = {'rain': 600, 'snow': 400, 'stars': 200}
+PARTICLE_STYLES = {
+    # color, streak length and dot radius in reference pixels, vertical band as (top, bottom) fractions
+    'rain': {'color': (200, 200, 255), 'length': 10, 'radius': 0, 'band': (0.0, 1.0)},
+    'snow': {'color': (255, 255, 255), 'length': 1, 'radius': 2, 'band': (0.0, 1.0)},
+    'stars': {'color': (255, 255, 255), 'length': 1, 'radius': 1, 'band': (0.0, 0.5)},
+}
+
+def op(shape, *coords, **style):
+    """Draw op from reference-pixel coordinates; shape is an ImageDraw method name"""
+    points = tuple((coords[i] / REF_WIDTH, coords[i + 1] / REF_HEIGHT) for i in range(0, len(coords), 2))
+    return (shape, points, style)
+
+def draw_ops(draw, ops, width, height, offset=(0, 0)):
+    """Rasterize normalized draw ops onto draw at the given canvas size"""
+    ox, oy = offset
+    scale = height / REF_HEIGHT
+    for shape, points, style in ops:
+        xy = [(x * width - ox, y * height - oy) for x, y in points]
+        if 'width' in style:
+            style = dict(style, width=max(1, round(style['width'] * scale)))
+        getattr(draw, shape)(xy, **style)
+
+def rasterize_layer(ops, width, height):
+    """Rasterize ops into a transparent RGBA tile cropped to their bounding box"""
+    from PIL import Image, ImageDraw
+    xs = [x * width for _, points, _ in ops for x, _ in points]
+    ys = [y * height for _, points, _ in ops for _, y in points]
+    pad = 2 + max((style.get('width', 1) for _, _, style in ops), default=1) * height / REF_HEIGHT
+    x0, y0 = max(0, int(min(xs) - pad)), max(0, int(min(ys) - pad))
+    x1, y1 = min(width, math.ceil(max(xs) + pad)), min(height, math.ceil(max(ys) + pad))
+    
+    tile = Image.new('RGBA', (x1 - x0, y1 - y0), (0, 0, 0, 0))
+    draw_ops(ImageDraw.Draw(tile), ops, width, height, offset=(x0, y0))
+    return tile, (x0, y0)
+
+def gradient_layer(zenith, horizon, ground_top, ground_bottom, width, height):
+    """Full-canvas sky and ground gradients built one row at a time, then broadcast across the width"""
+    import numpy as np
+    from PIL import Image
+    split = round(HORIZON / REF_HEIGHT * height)
+    sky = np.linspace(0.0, 1.0, split)[:, None]
+    ground = np.linspace(0.0, 1.0, height - split)[:, None]
+    column = np.concatenate([
+        np.array(zenith) * (1 - sky) + np.array(horizon) * sky,
+        np.array(ground_top) * (1 - ground) + np.array(ground_bottom) * ground,
+    ]).round().astype(np.uint8)
+    rows = np.broadcast_to(column[:, None, :], (height, width, 3))
+    return Image.fromarray(np.ascontiguousarray(rows), 'RGB'), (0, 0)
+
+def particle_field(kind, count, rng):
+    """Normalized positions and opacities for a particle layer, seeded from the scene RNG"""
+    import numpy as np
+    generator = np.random.default_rng(rng.getrandbits(64))
+    top, bottom = PARTICLE_STYLES[kind]['band']
+    xs = generator.random(count)
+    ys = top + (bottom - top) * generator.random(count)
+    alpha = generator.integers(140, 256, count, dtype=np.uint8)
+    return kind, xs, ys, alpha
+
+def composite_particles(img, field):
+    """Stamp every particle into one alpha mask and composite it onto img with a single paste"""
+    import numpy as np
+    from PIL import Image
+    kind, xs, ys, alpha = field
+    style = PARTICLE_STYLES[kind]
+    width, height = img.size
+    scale = height / REF_HEIGHT
+    radius = round(style['radius'] * scale)
+    length = max(1, round(style['length'] * scale))
+    
+    # The stamp is a disc of `radius` dragged down over `length` rows; one array op per stamp pixel
+    stamp = [(dx, dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + length)
+             if dx * dx + min(0, dy) ** 2 + max(0, dy - length + 1) ** 2 <= radius * radius + radius // 2]
+    
+    # Only the particles' band of rows is masked and blended
+    top = max(0, math.floor(style['band'][0] * height) - radius)
+    bottom = min(height, math.ceil(style['band'][1] * height) + radius + length)
+    margin = radius + length
+    mask = np.zeros((bottom - top + 2 * margin, width + 2 * margin), dtype=np.uint8)
+    px = (xs * width).astype(np.intp) + margin
+    py = (ys * height).astype(np.intp) - top + margin
+    for dx, dy in stamp:
+        mask[py + dy, px + dx] = alpha
+    
+    band = Image.fromarray(np.ascontiguousarray(mask[margin:-margin, margin:-margin]), 'L')
+    img.paste(Image.new('RGB', band.size, style['color']), (0, top), band)
+
+MOUNTAIN_PEAKS = [(0, 300), (200, 100), (400, 300), (600, 150), (800, 300)]
+RAINBOW_COLORS = [(255, 0, 0), (255, 127, 0), (255, 255, 0), (0, 255, 0), (0, 0, 255), (75, 0, 130), (148, 0, 211)]
+WATER = (65, 105, 225)
+SAND = (238, 214, 175)
+ROCK = (120, 105, 90)
+
+def ribbon(y, amplitude, thickness, phase, **style):
+    """Wavy band across the whole canvas as a single polygon op"""
+    top = [(x, y + amplitude * math.sin(x / 120 + phase)) for x in range(0, REF_WIDTH + 1, 40)]
+    bottom = [(x, py + thickness) for x, py in reversed(top)]
+    return op('polygon', *(v for point in top + bottom for v in point), **style)
+
+# Op lists, or callables (width, height) -> (tile, offset) for layers that aren't drawn from ops
+STATIC_LAYERS = {
+    **{('sky', time_of_day): lambda width, height, colors=colors: gradient_layer(*colors, width, height)
+       for time_of_day, colors in SKY_GRADIENTS.items()},
+    'sun': [op('ellipse', 650, 50, 750, 150, fill='yellow')],
+    'moon': [op('ellipse', 650, 50, 730, 130, fill='white')],
+    'mountains': [
+        op('polygon', x0, y0, x1, y1, x1, 300, x0, 300, fill=(100, 100, 100))
+        for (x0, y0), (x1, y1) in zip(MOUNTAIN_PEAKS, MOUNTAIN_PEAKS[1:])
+    ],
+    'aurora': [ribbon(40 + i * 30, 25, 60, i, fill=color)
+               for i, color in enumerate([(80, 255, 160, 90), (120, 200, 255, 70), (200, 120, 255, 60)])],
+    'rainbow': [op('arc', 200 + i * 8, 150 + i * 8, 600 - i * 8, 400 - i * 8, start=180, end=360, fill=color, width=8)
+                for i, color in enumerate(RAINBOW_COLORS)],
+    'hills': [op('chord', -100, 200, 450, 420, start=180, end=360, fill=(90, 160, 70)),
+              op('chord', 300, 230, 900, 390, start=180, end=360, fill=(75, 145, 60))],
+    'valley': [op('polygon', 0, 140, 120, 170, 330, 300, 0, 300, fill=(95, 125, 80)),
+               op('polygon', 800, 160, 680, 190, 470, 300, 800, 300, fill=(85, 115, 70))],
+    'volcano': [op('polygon', 250, 300, 550, 300, 430, 140, 370, 140, fill=(100, 50, 50)),
+                op('polygon', 370, 140, 430, 140, 420, 128, 380, 128, fill=(255, 100, 0)),
+                op('line', 395, 140, 385, 190, 392, 230, fill=(255, 100, 0), width=5),
+                op('line', 410, 140, 420, 180, fill=(255, 120, 0), width=4)],
+    'desert': [op('rectangle', 0, 300, 800, 600, fill=(230, 195, 140)),
+               op('chord', -100, 330, 400, 470, start=180, end=360, fill=(240, 210, 160)),
+               op('chord', 350, 360, 900, 520, start=180, end=360, fill=(220, 185, 130))],
+    'ocean': [op('rectangle', 0, 300, 800, 410, fill=WATER),
+              *(op('arc', x, y, x + 50, y + 12, start=0, end=180, fill=(100, 150, 255), width=2)
+                for y in (318, 348, 378) for x in range(y // 30 % 2 * 50, 800, 100))],
+    'waves': [op('arc', x, y, x + 60, y + 16, start=180, end=360, fill='white', width=3)
+              for y in (330, 365, 392) for x in range(y % 2 * 30, 800, 90)],
+    'reef': [shape for x, color in ((60, (255, 120, 110)), (150, (255, 180, 90)), (420, (230, 90, 160)),
+                                    (610, (255, 120, 110)), (700, (250, 200, 90)))
+             for shape in (op('line', x + 13, 410, x + 6, 384, fill=color, width=4),
+                           op('line', x + 13, 410, x + 22, 388, fill=color, width=4),
+                           op('ellipse', x, 396, x + 26, 410, fill=color))],
+    'island': [op('chord', 470, 360, 720, 420, start=180, end=360, fill=SAND),
+               op('line', 590, 390, 598, 350, 605, 330, fill=(139, 100, 60), width=6),
+               *(op('line', 605, 330, 605 + 34 * math.cos(math.radians(a)), 330 + 20 * math.sin(math.radians(a)),
+                    fill=(0, 150, 0), width=5) for a in (160, 200, 240, 300, 340, 20))],
+    'beach': [op('rectangle', 0, 410, 800, 600, fill=SAND), op('line', 0, 411, 800, 411, fill=(250, 240, 220), width=6)],
+    'lake': [op('ellipse', 180, 400, 620, 500, fill=WATER),
+             op('arc', 260, 430, 360, 450, start=0, end=180, fill=(120, 160, 240), width=2),
+             op('arc', 430, 455, 540, 475, start=0, end=180, fill=(120, 160, 240), width=2)],
+    'river': [ribbon(452, 10, 40, 0, fill=WATER)],
+    'pond': [op('ellipse', 520, 420, 700, 472, fill=WATER),
+             *(op('line', x, 430, x - 3, 405, fill=(60, 120, 40), width=2) for x in (530, 538, 690))],
+    'road': [op('polygon', 360, 300, 440, 300, 640, 600, 160, 600, fill=(90, 90, 95)),
+             *(op('rectangle', 398 - (y0 - 300) / 100, y0, 402 + (y0 - 300) / 100, y1, fill=(240, 230, 120))
+               for y0, y1 in ((310, 330), (350, 380), (410, 450), (480, 530), (560, 600)))],
+    'path': [op('polygon', 385, 300, 415, 300, 520, 600, 280, 600, fill=(190, 160, 115))],
+    'cliff': [op('polygon', 0, 110, 130, 120, 170, 200, 210, 600, 0, 600, fill=ROCK),
+              op('line', 130, 120, 170, 200, 210, 600, fill=(90, 78, 66), width=4)],
+    'waterfall': [op('polygon', 620, 110, 800, 95, 800, 470, 620, 470, fill=ROCK),
+                  op('polygon', 628, 112, 668, 112, 676, 470, 620, 470, fill=(170, 210, 255)),
+                  op('line', 640, 120, 642, 460, fill=(225, 240, 255), width=2),
+                  op('line', 655, 120, 660, 460, fill=(225, 240, 255), width=2),
+                  op('ellipse', 560, 450, 720, 500, fill=WATER), op('ellipse', 600, 455, 690, 475, fill=(220, 235, 255))],
+}
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by the total size of its values in bytes"""
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def peek(self, key):
+        """Value for key without counting a hit or refreshing its recency"""
+        with self.lock:
+            return self.entries.get(key)
+    
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.sizeof(self.entries.pop(key))
+            self.entries[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= self.sizeof(evicted)
+
+def blur_previews(img, levels, max_side=PREVIEW_MAX_SIDE, format=PREVIEW_FORMAT, quality=PREVIEW_QUALITY):
+    """Encode progressively sharper preview frames from a single downscaled copy of img"""
+    from PIL import ImageFilter
+    small = img.convert('RGB')
+    small.thumbnail((max_side, max_side))
+    scale = small.width / img.width
+    
+    frames = []
+    for i in range(levels):
+        noise_level = 1.0 - 0.7 * i / max(1, levels - 1)  # 1.0 down to 0.3
+        frame = small.filter(ImageFilter.GaussianBlur(radius=noise_level * 3 * scale))
+        buffer = io.BytesIO()
+        frame.save(buffer, format=format, quality=quality)
+        frames.append(buffer.getvalue())
+    return frames
+
+def encoded_size(value):
+    """Byte size of encoded image bytes or a list of encoded frames"""
+    return sum(map(len, value)) if isinstance(value, list) else len(value)
+
+def scene_key(scene):
+    """Hashable, order-stable identity of a parsed scene"""
+    return (tuple(scene['objects']), tuple(scene['colors']), scene['time'], scene['weather'])
+
+@st.cache_resource
+def get_image_cache():
+    """Encoded output images keyed by (scene, width, height, seed, format), shared by all sessions"""
+    return LRUCache(IMAGE_CACHE_BYTES, sizeof=encoded_size)
+
+class ImageStore:
+    """Content-addressed store of encoded images; identical images are kept once"""
+    def __init__(self, max_bytes=IMAGE_STORE_BYTES):
+        self.cache = LRUCache(max_bytes)
+    
+    def put(self, data):
+        """Store encoded image bytes and return their hash reference"""
+        ref = hashlib.sha256(data).hexdigest()
+        if self.cache.get(ref) is None:
+            self.cache.put(ref, data)
+        return ref
+    
+    def get(self, ref):
+        """Encoded bytes for ref, or None if evicted under memory pressure"""
+        return self.cache.get(ref)
+
+@st.cache_resource
+def get_image_store():
+    """History images for all sessions, bounded by SMARTBOT_IMAGE_STORE_BYTES"""
+    return ImageStore()
+
+@st.cache_resource
+def get_layer_cache():
+    """Pre-rasterized static layers keyed by (layer, width, height), shared by all sessions"""
+    return LRUCache(LAYER_CACHE_BYTES, sizeof=lambda entry: entry[0].width * entry[0].height * 4)
+
+# --- SPRITE LIBRARY ---
+# Every drawable object is defined once, in its own box of reference pixels anchored at
+# its bottom centre, and rasterized into an RGBA sprite per output scale on first use.
+SPRITE_CACHE_BYTES = int(os.environ.get("SMARTBOT_SPRITE_CACHE_BYTES", 32 * 1024 * 1024))
+SPRITE_SUPERSAMPLE = 2  # sprites are drawn at this multiple and downsampled for smooth edges
+SPRITE_SCALE_STEP = 0.05  # pixel scales are quantized so the cache holds a bounded set of sizes
+TINT = 'tint'  # fill placeholder for the scene's color, or the sprite's default tint
+
+class Sprite:
+    """One object's drawing in a width x height box; role is 'ground', 'sky', 'water' or 'sea'"""
+    __slots__ = ('width', 'height', 'parts', 'role', 'tint')
+    
+    def __init__(self, width, height, *parts, role='ground', tint=None):
+        self.width = width
+        self.height = height
+        self.parts = parts
+        self.role = role
+        self.tint = tint
+
+def part(shape, *coords, **style):
+    """Sprite draw op in the sprite's own reference pixels; shape is an ImageDraw method name"""
+    return (shape, tuple(zip(coords[::2], coords[1::2])), style)
+
+def star_points(cx, cy, outer, inner, points=5):
+    """Flat coordinates of a star polygon, first point straight up"""
+    coords = []
+    for k in range(2 * points):
+        r = outer if k % 2 == 0 else inner
+        angle = math.radians(-90 + 180 * k / points)
+        coords += [cx + r * math.cos(angle), cy + r * math.sin(angle)]
+    return coords
+
+SKIN = (255, 205, 160)
+GLASS = (135, 206, 235)
+
+SPRITES = {
+    # Vehicles
+    'car': Sprite(100, 45, part('rectangle', 20, 0, 80, 17, fill=(200, 200, 200)),
+                  part('rectangle', 26, 4, 48, 15, fill=GLASS), part('rectangle', 52, 4, 74, 15, fill=GLASS),
+                  part('rectangle', 0, 15, 100, 35, fill=TINT),
+                  part('ellipse', 10, 25, 30, 45, fill='black'), part('ellipse', 70, 25, 90, 45, fill='black'),
+                  tint=(255, 0, 0)),
+    'truck': Sprite(130, 62, part('rectangle', 0, 0, 85, 45, fill=TINT), part('rectangle', 87, 15, 127, 45, fill=(200, 50, 50)),
+                    part('rectangle', 100, 19, 122, 30, fill=GLASS), part('rectangle', 0, 42, 130, 48, fill=(60, 60, 60)),
+                    *(part('ellipse', x, 42, x + 20, 62, fill='black') for x in (10, 55, 98)),
+                    tint=(220, 220, 220)),
+    'bus': Sprite(160, 70, part('rectangle', 0, 0, 160, 52, fill=TINT),
+                  *(part('rectangle', x, 8, x + 25, 26, fill=GLASS) for x in (10, 42, 74, 106)),
+                  part('rectangle', 138, 8, 154, 44, fill=GLASS), part('rectangle', 0, 32, 130, 36, fill='white'),
+                  part('ellipse', 18, 46, 42, 70, fill='black'), part('ellipse', 110, 46, 134, 70, fill='black'),
+                  tint=(255, 200, 0)),
+    'train': Sprite(220, 75, part('line', 0, 72, 220, 72, fill=(90, 90, 90), width=3),
+                    part('rectangle', 10, 0, 24, 15, fill=(50, 50, 50)), part('rectangle', 0, 15, 75, 60, fill=(180, 30, 30)),
+                    part('rectangle', 45, 5, 75, 35, fill=(150, 20, 20)), part('rectangle', 52, 12, 68, 26, fill=GLASS),
+                    part('rectangle', 80, 18, 145, 60, fill=TINT), part('rectangle', 150, 18, 215, 60, fill=TINT),
+                    *(part('rectangle', x, 25, x + 20, 40, fill=GLASS) for x in (88, 117, 158, 187)),
+                    *(part('ellipse', x, 54, x + 16, 70, fill='black') for x in (6, 30, 54, 88, 122, 158, 192)),
+                    tint=(60, 90, 160)),
+    'airplane': Sprite(150, 50, part('polygon', 65, 22, 95, 22, 85, 8, fill=(170, 170, 170)),
+                       part('ellipse', 0, 18, 150, 36, fill=(220, 220, 220)),
+                       part('polygon', 5, 27, 12, 2, 32, 22, fill=TINT),
+                       part('polygon', 60, 28, 100, 28, 78, 50, fill=(160, 160, 160)),
+                       *(part('ellipse', 45 + i * 14, 23, 51 + i * 14, 29, fill=(100, 150, 200)) for i in range(6)),
+                       part('ellipse', 128, 21, 142, 29, fill=(60, 90, 140)),
+                       role='sky', tint=(180, 30, 30)),
+    'helicopter': Sprite(120, 60, part('line', 5, 6, 105, 6, fill=(60, 60, 60), width=3),
+                         part('line', 55, 6, 55, 16, fill=(60, 60, 60), width=3),
+                         part('rectangle', 8, 26, 40, 32, fill=TINT), part('ellipse', 0, 18, 10, 38, fill=(60, 60, 60)),
+                         part('ellipse', 30, 14, 85, 46, fill=TINT), part('ellipse', 64, 18, 80, 32, fill=GLASS),
+                         part('line', 42, 44, 40, 56, fill=(60, 60, 60), width=3),
+                         part('line', 72, 44, 74, 56, fill=(60, 60, 60), width=3),
+                         part('line', 32, 56, 82, 56, fill=(60, 60, 60), width=3),
+                         role='sky', tint=(200, 40, 40)),
+    'boat': Sprite(120, 80, part('line', 60, 0, 60, 48, fill=(90, 60, 30), width=3),
+                   part('polygon', 62, 4, 62, 46, 100, 46, fill='white'), part('polygon', 58, 10, 58, 46, 28, 46, fill=(240, 240, 240)),
+                   part('polygon', 0, 48, 120, 48, 102, 80, 18, 80, fill=TINT),
+                   role='water', tint=(120, 60, 10)),
+    'bicycle': Sprite(80, 50, part('ellipse', 0, 22, 28, 50, outline='black', width=3),
+                      part('ellipse', 52, 22, 80, 50, outline='black', width=3),
+                      part('line', 14, 36, 32, 36, 50, 20, 24, 20, 14, 36, fill=TINT, width=3),
+                      part('line', 50, 20, 66, 36, fill=TINT, width=3), part('line', 24, 20, 22, 12, fill='black', width=3),
+                      part('rectangle', 14, 9, 30, 13, fill='black'), part('line', 50, 20, 48, 10, 58, 8, fill='black', width=3),
+                      tint=(30, 144, 255)),
+    'motorcycle': Sprite(90, 50, part('ellipse', 0, 24, 28, 50, fill='black'), part('ellipse', 62, 24, 90, 50, fill='black'),
+                         part('ellipse', 9, 33, 19, 43, fill=(160, 160, 160)), part('ellipse', 71, 33, 81, 43, fill=(160, 160, 160)),
+                         part('line', 14, 40, 44, 40, fill=(160, 160, 160), width=3),
+                         part('polygon', 18, 30, 36, 16, 66, 16, 76, 34, fill=TINT), part('rectangle', 28, 10, 54, 16, fill='black'),
+                         part('line', 66, 16, 70, 4, fill='black', width=3),
+                         tint=(200, 30, 30)),
+    'rocket': Sprite(50, 140, part('polygon', 17, 118, 33, 118, 25, 140, fill=(255, 140, 0)),
+                     part('rectangle', 15, 30, 35, 120, fill=(230, 230, 230)), part('polygon', 15, 30, 35, 30, 25, 0, fill=TINT),
+                     part('polygon', 15, 90, 0, 120, 15, 120, fill=TINT), part('polygon', 35, 90, 50, 120, 35, 120, fill=TINT),
+                     part('ellipse', 19, 50, 31, 62, fill=GLASS),
+                     tint=(220, 20, 60)),
+    
+    # Buildings
+    'house': Sprite(170, 170, part('polygon', 0, 70, 170, 70, 85, 0, fill=(80, 80, 80)),
+                    part('rectangle', 10, 70, 160, 170, fill=TINT, outline='black', width=2),
+                    part('rectangle', 70, 120, 100, 170, fill=(100, 50, 0)), part('rectangle', 30, 90, 60, 120, fill=GLASS),
+                    part('rectangle', 115, 90, 145, 120, fill=GLASS),
+                    tint=(150, 75, 0)),
+    'building': Sprite(90, 220, part('rectangle', 0, 0, 90, 220, fill=TINT, outline=(60, 60, 60), width=2),
+                       *(part('rectangle', 10 + col * 27, 12 + row * 25, 26 + col * 27, 28 + row * 25,
+                              fill=(255, 230, 140) if (row + col) % 3 else GLASS)
+                         for row in range(7) for col in range(3)),
+                       part('rectangle', 35, 192, 55, 220, fill=(60, 60, 60)),
+                       tint=(120, 130, 150)),
+    'castle': Sprite(340, 250, part('rectangle', 30, 100, 310, 250, fill=(150, 150, 150), outline='black', width=2),
+                     *(part('rectangle', 40 + i * 24, 88, 54 + i * 24, 100, fill=(150, 150, 150)) for i in range(11)),
+                     *(shape for x in (0, 145, 290) for shape in (
+                         part('rectangle', x, 50, x + 50, 250, fill=(130, 130, 130), outline='black', width=1),
+                         part('polygon', x - 8, 50, x + 58, 50, x + 25, 0, fill=(100, 100, 100)))),
+                     part('chord', 150, 195, 190, 245, start=180, end=360, fill=(80, 50, 20)),
+                     part('rectangle', 150, 220, 190, 250, fill=(80, 50, 20))),
+    'church': Sprite(120, 210, part('line', 60, 0, 60, 14, fill=(200, 170, 60), width=3),
+                     part('line', 54, 5, 66, 5, fill=(200, 170, 60), width=3),
+                     part('polygon', 42, 40, 78, 40, 60, 12, fill=(140, 60, 50)),
+                     part('rectangle', 45, 40, 75, 90, fill=(230, 225, 210)), part('ellipse', 53, 52, 67, 66, fill=GLASS),
+                     part('polygon', 0, 90, 60, 65, 120, 90, fill=(140, 60, 50)),
+                     part('rectangle', 0, 90, 120, 210, fill=(230, 225, 210), outline=(90, 90, 90), width=1),
+                     part('rectangle', 15, 120, 35, 150, fill=GLASS), part('rectangle', 85, 120, 105, 150, fill=GLASS),
+                     part('chord', 48, 165, 72, 190, start=180, end=360, fill=(100, 60, 30)),
+                     part('rectangle', 48, 177, 72, 210, fill=(100, 60, 30))),
+    'tower': Sprite(70, 230, *(part('rectangle', 5 + i * 16, 14, 15 + i * 16, 30, fill=(160, 155, 145)) for i in range(4)),
+                    part('rectangle', 5, 24, 65, 34, fill=(160, 155, 145)),
+                    part('rectangle', 10, 30, 60, 230, fill=(160, 155, 145), outline=(90, 90, 90), width=1),
+                    part('rectangle', 29, 60, 41, 80, fill=(40, 40, 40)), part('rectangle', 29, 120, 41, 140, fill=(40, 40, 40)),
+                    part('rectangle', 26, 195, 44, 230, fill=(90, 60, 30))),
+    'bridge': Sprite(280, 100, part('arc', 20, 30, 260, 190, start=180, end=360, fill=(120, 90, 60), width=10),
+                     part('rectangle', 10, 34, 30, 100, fill=(120, 90, 60)), part('rectangle', 250, 34, 270, 100, fill=(120, 90, 60)),
+                     *(part('line', x, 10, x, 20, fill=(110, 80, 50), width=3) for x in range(2, 281, 28)),
+                     part('line', 0, 10, 280, 10, fill=(110, 80, 50), width=3),
+                     part('rectangle', 0, 20, 280, 34, fill=(150, 110, 70))),
+    'barn': Sprite(150, 130, part('polygon', 0, 45, 75, 0, 150, 45, fill=(120, 20, 20)),
+                   part('rectangle', 0, 45, 150, 130, fill=TINT), part('rectangle', 50, 70, 100, 130, fill=(90, 20, 20)),
+                   part('line', 50, 70, 100, 130, fill='white', width=3), part('line', 100, 70, 50, 130, fill='white', width=3),
+                   part('rectangle', 50, 70, 100, 130, outline='white', width=3),
+                   tint=(178, 34, 34)),
+    'lighthouse': Sprite(60, 190, part('chord', 12, 2, 48, 26, start=180, end=360, fill=(200, 30, 30)),
+                         part('rectangle', 14, 14, 46, 32, fill=(255, 240, 120)), part('rectangle', 6, 32, 54, 38, fill=(60, 60, 60)),
+                         part('polygon', 12, 38, 48, 38, 54, 190, 6, 190, fill='white'),
+                         part('polygon', 11, 70, 49, 70, 50, 90, 10, 90, fill=(200, 30, 30)),
+                         part('polygon', 9, 120, 51, 120, 52, 140, 8, 140, fill=(200, 30, 30))),
+    'tent': Sprite(110, 75, part('polygon', 0, 75, 55, 0, 110, 75, fill=TINT),
+                   part('polygon', 42, 75, 55, 30, 68, 75, fill=(60, 40, 20)),
+                   tint=(255, 140, 0)),
+    'pyramid': Sprite(240, 140, part('polygon', 0, 140, 120, 0, 240, 140, fill=(222, 184, 135)),
+                      part('polygon', 120, 0, 240, 140, 120, 140, fill=(190, 150, 100))),
+    
+    # Plants
+    'tree': Sprite(90, 150, part('rectangle', 36, 70, 54, 150, fill=(139, 69, 19)),
+                   part('ellipse', 0, 0, 90, 85, fill=(34, 139, 34)), part('ellipse', 15, 10, 55, 45, fill=(50, 160, 50))),
+    'pine': Sprite(70, 150, part('rectangle', 29, 125, 41, 150, fill=(110, 60, 20)),
+                   part('polygon', 0, 130, 70, 130, 35, 60, fill=(0, 100, 40)),
+                   part('polygon', 6, 95, 64, 95, 35, 28, fill=(0, 100, 40)),
+                   part('polygon', 12, 60, 58, 60, 35, 0, fill=(0, 100, 40))),
+    'palm': Sprite(110, 160, part('polygon', 48, 160, 62, 160, 58, 28, 52, 28, fill=(139, 100, 60)),
+                   *(part('line', 55, 28, 55 + 50 * math.cos(math.radians(angle)), 28 + 28 * math.sin(math.radians(angle)),
+                          fill=(0, 150, 0), width=6) for angle in (160, 190, 215, 250, 290, 325, 350, 20)),
+                   part('ellipse', 48, 26, 56, 34, fill=(100, 60, 20)), part('ellipse', 55, 28, 63, 36, fill=(100, 60, 20))),
+    'flower': Sprite(26, 48, part('rectangle', 11, 20, 15, 48, fill=(0, 128, 0)), part('ellipse', 15, 30, 25, 36, fill=(0, 128, 0)),
+                     part('ellipse', 1, 0, 25, 24, fill=TINT), part('ellipse', 9, 8, 17, 16, fill=(255, 215, 0)),
+                     tint=(255, 105, 180)),
+    'rose': Sprite(26, 50, part('line', 13, 20, 13, 50, fill=(0, 110, 0), width=3), part('ellipse', 2, 30, 13, 37, fill=(0, 110, 0)),
+                   part('ellipse', 3, 2, 23, 22, fill=TINT),
+                   part('arc', 7, 6, 19, 18, start=0, end=270, fill=(150, 0, 20), width=2),
+                   tint=(200, 0, 30)),
+    'sunflower': Sprite(50, 110, part('rectangle', 23, 40, 27, 110, fill=(40, 130, 40)),
+                        part('ellipse', 5, 60, 24, 70, fill=(40, 130, 40)), part('ellipse', 26, 75, 45, 85, fill=(40, 130, 40)),
+                        part('ellipse', 0, 0, 50, 50, fill=(255, 215, 0)), part('ellipse', 15, 15, 35, 35, fill=(110, 60, 20))),
+    'grass': Sprite(40, 24, *(part('polygon', x, 24, x + 4, (x * 7) % 10, x + 8, 24, fill=(50, 150, 50)) for x in range(0, 33, 8))),
+    'bush': Sprite(90, 55, part('ellipse', 0, 15, 45, 55, fill=(34, 110, 34)), part('ellipse', 45, 12, 90, 55, fill=(34, 110, 34)),
+                   part('ellipse', 25, 0, 70, 45, fill=(40, 125, 40))),
+    'cactus': Sprite(70, 100, part('rectangle', 20, 0, 50, 100, fill=(0, 128, 0)),
+                     part('rectangle', 0, 30, 20, 70, fill=(0, 128, 0)), part('rectangle', 50, 20, 70, 60, fill=(0, 128, 0))),
+    'mushroom': Sprite(40, 40, part('rectangle', 14, 18, 26, 40, fill=(245, 240, 220)),
+                       part('chord', 0, 0, 40, 36, start=180, end=360, fill=TINT),
+                       part('ellipse', 8, 6, 14, 12, fill='white'), part('ellipse', 22, 4, 28, 10, fill='white'),
+                       part('ellipse', 30, 10, 35, 15, fill='white'),
+                       tint=(220, 30, 30)),
+    'bamboo': Sprite(60, 170, *(shape for x in (5, 25, 45) for shape in (
+                         part('rectangle', x, 0, x + 10, 170, fill=(120, 170, 60)),
+                         *(part('line', x, y, x + 10, y, fill=(80, 130, 40), width=2) for y in (30, 70, 110, 150)))),
+                     part('ellipse', 15, 20, 35, 28, fill=(60, 150, 50)), part('ellipse', 35, 55, 55, 63, fill=(60, 150, 50)),
+                     part('ellipse', 0, 90, 20, 98, fill=(60, 150, 50))),
+    
+    # Landforms small enough to place like objects
+    'rock': Sprite(70, 40, part('polygon', 0, 40, 8, 15, 28, 2, 52, 6, 68, 22, 70, 40, fill=(130, 130, 130)),
+                   part('polygon', 28, 2, 52, 6, 40, 18, 24, 14, fill=(160, 160, 160))),
+    'cave': Sprite(170, 110, part('chord', 0, 0, 170, 220, start=180, end=360, fill=(110, 100, 90)),
+                   part('chord', 50, 40, 120, 180, start=180, end=360, fill=(30, 25, 25))),
+    
+    # Sky and weather
+    'cloud': Sprite(110, 60, part('ellipse', 0, 20, 80, 60, fill='white'), part('ellipse', 30, 0, 110, 40, fill='white'),
+                    role='sky'),
+    'lightning': Sprite(50, 150, part('polygon', 30, 0, 10, 70, 25, 70, 5, 150, 45, 55, 28, 55, 45, 0, fill=(255, 240, 80)),
+                        role='sky'),
+    'tornado': Sprite(100, 180, part('polygon', 0, 0, 100, 0, 60, 120, 52, 180, 46, 180, 40, 120, fill=(120, 120, 130)),
+                      part('arc', 5, 10, 95, 30, start=0, end=180, fill=(90, 90, 100), width=3),
+                      part('arc', 22, 60, 78, 80, start=0, end=180, fill=(90, 90, 100), width=3),
+                      part('arc', 38, 110, 62, 125, start=0, end=180, fill=(90, 90, 100), width=3)),
+    
+    # Mammals
+    'dog': Sprite(75, 50, part('line', 10, 22, 2, 10, fill=(139, 69, 19), width=4),
+                  part('rectangle', 16, 32, 22, 50, fill=(139, 69, 19)), part('rectangle', 46, 32, 52, 50, fill=(139, 69, 19)),
+                  part('ellipse', 8, 15, 62, 38, fill=(139, 69, 19)), part('ellipse', 48, 0, 72, 24, fill=(139, 69, 19)),
+                  part('ellipse', 48, 2, 58, 18, fill=(100, 50, 10)), part('ellipse', 62, 8, 66, 12, fill='black'),
+                  part('ellipse', 69, 12, 74, 16, fill='black')),
+    'cat': Sprite(65, 50, part('line', 10, 28, 2, 10, 6, 2, fill=(255, 140, 0), width=4),
+                  part('rectangle', 16, 34, 21, 50, fill=(255, 140, 0)), part('rectangle', 38, 34, 43, 50, fill=(255, 140, 0)),
+                  part('ellipse', 8, 20, 52, 40, fill=(255, 140, 0)), part('ellipse', 40, 6, 64, 30, fill=(255, 140, 0)),
+                  part('polygon', 42, 12, 45, 0, 51, 9, fill=(255, 140, 0)), part('polygon', 53, 9, 59, 0, 62, 12, fill=(255, 140, 0)),
+                  part('ellipse', 46, 14, 50, 18, fill=(40, 120, 40)), part('ellipse', 54, 14, 58, 18, fill=(40, 120, 40))),
+    'horse': Sprite(130, 110, part('line', 18, 42, 4, 75, fill=(70, 40, 15), width=6),
+                    *(part('rectangle', x, 60, x + 8, 110, fill=(120, 70, 30)) for x in (25, 40, 88, 100)),
+                    part('ellipse', 15, 30, 115, 72, fill=(140, 85, 40)),
+                    part('polygon', 90, 40, 105, 5, 120, 10, 112, 50, fill=(140, 85, 40)),
+                    part('ellipse', 104, 0, 130, 22, fill=(140, 85, 40)),
+                    part('polygon', 96, 30, 104, 4, 110, 6, 102, 36, fill=(70, 40, 15)),
+                    part('ellipse', 116, 6, 120, 10, fill='black')),
+    'cow': Sprite(125, 90, part('line', 10, 35, 2, 60, fill='black', width=3),
+                  *(part('rectangle', x, 55, x + 8, 90, fill=(240, 240, 240)) for x in (22, 36, 74, 88)),
+                  part('ellipse', 8, 22, 104, 68, fill='white'),
+                  part('ellipse', 25, 30, 50, 48, fill='black'), part('ellipse', 60, 40, 80, 60, fill='black'),
+                  part('line', 96, 12, 92, 2, fill=(220, 220, 200), width=3), part('line', 116, 12, 120, 2, fill=(220, 220, 200), width=3),
+                  part('ellipse', 92, 10, 122, 40, fill='white'), part('ellipse', 104, 28, 122, 40, fill=(255, 180, 180)),
+                  part('ellipse', 104, 17, 108, 21, fill='black')),
+    'sheep': Sprite(80, 60, part('rectangle', 20, 40, 26, 60, fill='black'), part('rectangle', 50, 40, 56, 60, fill='black'),
+                    part('ellipse', 5, 12, 45, 46, fill=(245, 245, 240)), part('ellipse', 25, 5, 65, 40, fill=(245, 245, 240)),
+                    part('ellipse', 20, 20, 62, 50, fill=(245, 245, 240)),
+                    part('ellipse', 56, 14, 78, 36, fill=(40, 40, 40)), part('ellipse', 52, 18, 60, 24, fill=(40, 40, 40))),
+    'pig': Sprite(80, 55, part('arc', 0, 14, 10, 24, start=0, end=270, fill=(240, 140, 160), width=2),
+                  part('rectangle', 18, 38, 25, 55, fill=(240, 160, 170)), part('rectangle', 50, 38, 57, 55, fill=(240, 160, 170)),
+                  part('ellipse', 4, 10, 66, 46, fill=(255, 180, 190)), part('ellipse', 54, 10, 78, 34, fill=(255, 180, 190)),
+                  part('polygon', 58, 12, 62, 0, 68, 12, fill=(240, 140, 160)),
+                  part('ellipse', 70, 18, 80, 28, fill=(240, 140, 160)), part('ellipse', 64, 16, 67, 19, fill='black')),
+    'rabbit': Sprite(45, 55, part('ellipse', 26, 0, 32, 24, fill=(220, 220, 220)), part('ellipse', 33, 2, 39, 24, fill=(220, 220, 220)),
+                     part('ellipse', 0, 25, 34, 55, fill=(220, 220, 220)), part('ellipse', 22, 16, 42, 36, fill=(220, 220, 220)),
+                     part('ellipse', 0, 32, 9, 41, fill='white'), part('ellipse', 34, 23, 37, 26, fill='black')),
+    'deer': Sprite(100, 115, part('line', 84, 16, 80, 0, 74, 4, fill=(110, 80, 50), width=3),
+                   part('line', 90, 16, 96, 0, 100, 6, fill=(110, 80, 50), width=3),
+                   *(part('rectangle', x, 70, x + 6, 115, fill=(150, 95, 50)) for x in (18, 30, 64, 74)),
+                   part('ellipse', 10, 45, 85, 80, fill=(170, 110, 60)),
+                   part('polygon', 70, 55, 80, 20, 90, 22, 84, 60, fill=(170, 110, 60)),
+                   part('ellipse', 78, 14, 100, 32, fill=(170, 110, 60)), part('ellipse', 6, 48, 14, 58, fill='white'),
+                   part('ellipse', 90, 19, 93, 22, fill='black')),
+    'bear': Sprite(115, 85, part('rectangle', 18, 55, 34, 85, fill=(90, 55, 30)), part('rectangle', 70, 55, 86, 85, fill=(90, 55, 30)),
+                   part('ellipse', 5, 15, 100, 70, fill=(100, 60, 35)),
+                   part('ellipse', 80, 0, 92, 12, fill=(100, 60, 35)), part('ellipse', 98, 0, 110, 12, fill=(100, 60, 35)),
+                   part('ellipse', 78, 5, 112, 40, fill=(100, 60, 35)), part('ellipse', 98, 20, 115, 34, fill=(150, 110, 80)),
+                   part('ellipse', 96, 14, 100, 18, fill='black')),
+    'wolf': Sprite(105, 70, part('polygon', 0, 20, 14, 30, 20, 40, fill=(110, 110, 115)),
+                   *(part('rectangle', x, 45, x + 6, 70, fill=(110, 110, 115)) for x in (20, 32, 62, 72)),
+                   part('ellipse', 12, 25, 82, 52, fill=(130, 130, 135)),
+                   part('polygon', 74, 22, 96, 18, 105, 32, 84, 40, fill=(130, 130, 135)),
+                   part('polygon', 76, 22, 80, 6, 86, 20, fill=(110, 110, 115)),
+                   part('polygon', 84, 20, 90, 6, 94, 20, fill=(110, 110, 115)), part('ellipse', 88, 24, 91, 27, fill='black')),
+    'fox': Sprite(95, 55, part('polygon', 0, 20, 30, 26, 28, 38, 6, 34, fill=(230, 110, 20)), part('ellipse', 0, 18, 10, 30, fill='white'),
+                  *(part('rectangle', x, 36, x + 5, 55, fill=(60, 40, 25)) for x in (30, 40, 58, 66)),
+                  part('ellipse', 20, 18, 72, 42, fill=(230, 110, 20)),
+                  part('polygon', 64, 16, 88, 22, 95, 30, 70, 36, fill=(230, 110, 20)),
+                  part('polygon', 66, 18, 68, 4, 76, 16, fill=(230, 110, 20)), part('polygon', 74, 16, 80, 4, 84, 20, fill=(230, 110, 20)),
+                  part('ellipse', 68, 26, 82, 38, fill='white'), part('ellipse', 80, 22, 83, 25, fill='black')),
+    'lion': Sprite(115, 90, part('line', 12, 40, 4, 60, fill=(200, 150, 70), width=4), part('ellipse', 0, 56, 8, 66, fill=(140, 80, 30)),
+                   *(part('rectangle', x, 60, x + 8, 90, fill=(200, 150, 70)) for x in (18, 32, 66, 80)),
+                   part('ellipse', 10, 30, 92, 70, fill=(215, 165, 80)), part('ellipse', 70, 0, 115, 48, fill=(150, 85, 30)),
+                   part('ellipse', 80, 10, 108, 40, fill=(215, 165, 80)),
+                   part('ellipse', 88, 18, 92, 22, fill='black'), part('ellipse', 97, 18, 101, 22, fill='black'),
+                   part('polygon', 92, 28, 98, 28, 95, 32, fill='black')),
+    'tiger': Sprite(115, 75, part('line', 10, 30, 2, 52, fill=(240, 130, 20), width=5),
+                    *(part('rectangle', x, 50, x + 8, 75, fill=(240, 130, 20)) for x in (18, 32, 62, 76)),
+                    part('ellipse', 10, 20, 90, 58, fill=(240, 130, 20)),
+                    *(part('line', x, 26, x + 4, 50, fill='black', width=3) for x in range(26, 80, 12)),
+                    part('ellipse', 84, 4, 92, 14, fill=(240, 130, 20)), part('ellipse', 100, 4, 108, 14, fill=(240, 130, 20)),
+                    part('ellipse', 82, 8, 112, 40, fill=(240, 130, 20)), part('ellipse', 90, 26, 104, 38, fill='white'),
+                    part('ellipse', 92, 18, 96, 22, fill='black'), part('ellipse', 101, 18, 105, 22, fill='black')),
+    'elephant': Sprite(180, 145, part('line', 12, 60, 4, 90, fill=(128, 128, 138), width=3),
+                       *(part('rectangle', x0, 95, x1, 145, fill=(128, 128, 138)) for x0, x1 in ((25, 48), (55, 78), (105, 128), (132, 152))),
+                       part('ellipse', 10, 30, 160, 115, fill=(140, 140, 150)), part('ellipse', 130, 25, 175, 80, fill=(140, 140, 150)),
+                       part('line', 168, 60, 172, 100, 164, 130, fill=(140, 140, 150), width=12, joint='curve'),
+                       part('ellipse', 118, 28, 150, 85, fill=(120, 120, 130)),
+                       part('polygon', 158, 68, 146, 80, 150, 84, 162, 72, fill='white'), part('ellipse', 152, 42, 157, 47, fill='black')),
+    'giraffe': Sprite(110, 230, *(part('rectangle', x, 140, x + 8, 230, fill=(230, 180, 80)) for x in (15, 30, 68, 80)),
+                      part('ellipse', 5, 95, 95, 150, fill=(240, 190, 90)),
+                      part('polygon', 70, 110, 88, 20, 100, 24, 92, 115, fill=(240, 190, 90)),
+                      part('line', 92, 6, 90, 0, fill=(130, 80, 30), width=3), part('line', 100, 6, 102, 0, fill=(130, 80, 30), width=3),
+                      part('ellipse', 86, 4, 110, 24, fill=(240, 190, 90)),
+                      *(part('ellipse', x, y, x + 12, y + 10, fill=(160, 100, 40))
+                        for x, y in ((20, 105), (42, 115), (64, 102), (30, 128), (55, 130), (81, 70), (85, 45))),
+                      part('ellipse', 100, 10, 103, 13, fill='black')),
+    'zebra': Sprite(115, 90, part('line', 12, 40, 4, 62, fill='black', width=3),
+                    *(part('rectangle', x, 60, x + 8, 90, fill=(240, 240, 240)) for x in (20, 34, 66, 80)),
+                    part('ellipse', 10, 28, 92, 68, fill='white'),
+                    *(part('line', x, 32, x + 2, 64, fill='black', width=3) for x in range(22, 86, 10)),
+                    part('polygon', 82, 10, 112, 28, 106, 40, 80, 30, fill='white'),
+                    part('line', 80, 14, 90, 4, fill='black', width=4), part('ellipse', 104, 28, 114, 38, fill='black'),
+                    part('ellipse', 97, 18, 100, 21, fill='black')),
+    'monkey': Sprite(60, 75, part('arc', 0, 30, 30, 70, start=90, end=270, fill=(110, 70, 40), width=4),
+                     part('rectangle', 16, 60, 24, 75, fill=(110, 70, 40)), part('rectangle', 32, 60, 40, 75, fill=(110, 70, 40)),
+                     part('ellipse', 12, 28, 44, 66, fill=(120, 75, 40)), part('line', 40, 38, 54, 52, fill=(120, 75, 40), width=5),
+                     part('ellipse', 15, 8, 24, 18, fill=(230, 190, 150)), part('ellipse', 48, 8, 57, 18, fill=(230, 190, 150)),
+                     part('ellipse', 20, 0, 52, 30, fill=(120, 75, 40)), part('ellipse', 27, 8, 49, 28, fill=(230, 190, 150)),
+                     part('ellipse', 31, 13, 35, 17, fill='black'), part('ellipse', 41, 13, 45, 17, fill='black')),
+    'panda': Sprite(85, 80, part('rectangle', 14, 55, 30, 80, fill='black'), part('rectangle', 52, 55, 68, 80, fill='black'),
+                    part('ellipse', 5, 25, 80, 70, fill='white'), part('ellipse', 15, 30, 35, 58, fill='black'),
+                    part('ellipse', 45, 0, 57, 12, fill='black'), part('ellipse', 73, 0, 85, 12, fill='black'),
+                    part('ellipse', 45, 2, 85, 36, fill='white'),
+                    part('ellipse', 53, 12, 62, 22, fill='black'), part('ellipse', 68, 12, 77, 22, fill='black'),
+                    part('ellipse', 63, 24, 67, 28, fill='black')),
+    'kangaroo': Sprite(80, 110, part('line', 20, 90, 0, 108, fill=(170, 110, 60), width=8),
+                       part('polygon', 30, 100, 60, 100, 62, 110, 30, 110, fill=(170, 110, 60)),
+                       part('ellipse', 15, 35, 55, 100, fill=(180, 120, 70)), part('line', 50, 55, 62, 65, fill=(180, 120, 70), width=4),
+                       part('ellipse', 42, 0, 48, 16, fill=(180, 120, 70)), part('ellipse', 50, 0, 56, 16, fill=(180, 120, 70)),
+                       part('ellipse', 40, 12, 66, 34, fill=(180, 120, 70)), part('ellipse', 58, 20, 70, 30, fill=(180, 120, 70)),
+                       part('ellipse', 53, 18, 56, 21, fill='black')),
+    
+    # Birds
+    'bird': Sprite(45, 16, part('arc', 0, 0, 30, 16, start=30, end=150, fill='black', width=2),
+                   part('arc', 15, 0, 45, 16, start=30, end=150, fill='black', width=2),
+                   role='sky'),
+    'eagle': Sprite(120, 50, part('polygon', 0, 10, 50, 24, 70, 24, 120, 10, 75, 34, 45, 34, fill=(100, 60, 30)),
+                    part('polygon', 40, 26, 30, 36, 46, 34, fill='white'), part('ellipse', 45, 20, 80, 38, fill=(90, 55, 25)),
+                    part('ellipse', 74, 16, 90, 30, fill='white'), part('polygon', 88, 22, 96, 26, 88, 28, fill=(255, 200, 0)),
+                    role='sky'),
+    'owl': Sprite(45, 60, part('polygon', 4, 14, 6, 0, 14, 10, fill=(140, 100, 60)),
+                  part('polygon', 31, 10, 39, 0, 41, 14, fill=(140, 100, 60)),
+                  part('ellipse', 2, 6, 43, 60, fill=(140, 100, 60)), part('ellipse', 12, 28, 33, 56, fill=(200, 170, 120)),
+                  part('ellipse', 8, 12, 22, 26, fill='white'), part('ellipse', 23, 12, 37, 26, fill='white'),
+                  part('ellipse', 13, 17, 18, 22, fill='black'), part('ellipse', 28, 17, 33, 22, fill='black'),
+                  part('polygon', 20, 26, 25, 26, 22.5, 32, fill=(240, 180, 0))),
+    'parrot': Sprite(40, 65, part('polygon', 12, 40, 26, 40, 20, 65, fill=(30, 90, 220)),
+                     part('ellipse', 8, 10, 34, 45, fill=(220, 30, 30)), part('ellipse', 16, 0, 38, 20, fill=(220, 30, 30)),
+                     part('ellipse', 6, 18, 24, 44, fill=(30, 90, 220)), part('ellipse', 10, 34, 20, 44, fill=(255, 215, 0)),
+                     part('polygon', 34, 8, 40, 12, 34, 16, fill=(240, 200, 60)), part('ellipse', 27, 6, 31, 10, fill='white'),
+                     role='sky'),
+    'penguin': Sprite(44, 75, part('ellipse', 8, 66, 20, 75, fill=(255, 160, 0)), part('ellipse', 24, 66, 36, 75, fill=(255, 160, 0)),
+                      part('ellipse', 2, 8, 42, 70, fill='black'), part('ellipse', 10, 20, 34, 68, fill='white'),
+                      part('ellipse', 15, 14, 19, 18, fill='white'), part('ellipse', 25, 14, 29, 18, fill='white'),
+                      part('polygon', 19, 20, 25, 20, 22, 27, fill=(255, 160, 0))),
+    'flamingo': Sprite(60, 130, part('line', 28, 60, 28, 130, fill=(240, 120, 150), width=2),
+                       part('line', 34, 60, 38, 95, 30, 95, fill=(240, 120, 150), width=2),
+                       part('ellipse', 10, 40, 50, 68, fill=(250, 130, 170)),
+                       part('line', 44, 48, 52, 30, 46, 10, fill=(250, 130, 170), width=5, joint='curve'),
+                       part('ellipse', 40, 2, 54, 16, fill=(250, 130, 170)), part('polygon', 52, 8, 60, 12, 54, 16, fill='black')),
+    'swan': Sprite(80, 60, part('ellipse', 0, 28, 70, 60, fill='white'),
+                   part('line', 58, 40, 62, 20, 56, 6, fill='white', width=6, joint='curve'),
+                   part('ellipse', 50, 0, 66, 12, fill='white'), part('polygon', 64, 4, 78, 8, 64, 10, fill=(255, 140, 0)),
+                   part('arc', 12, 30, 55, 55, start=200, end=330, fill=(210, 210, 210), width=3),
+                   role='water'),
+    'duck': Sprite(50, 38, part('ellipse', 0, 16, 42, 38, fill=(255, 215, 0)), part('ellipse', 28, 0, 48, 20, fill=(255, 215, 0)),
+                   part('polygon', 44, 9, 50, 12, 44, 15, fill=(255, 140, 0)), part('ellipse', 38, 6, 41, 9, fill='black'),
+                   part('arc', 6, 20, 30, 34, start=0, end=180, fill=(230, 180, 0), width=2),
+                   role='water'),
+    'chicken': Sprite(42, 48, part('line', 16, 36, 16, 48, fill=(240, 160, 0), width=2),
+                      part('line', 24, 36, 24, 48, fill=(240, 160, 0), width=2),
+                      part('polygon', 0, 16, 8, 6, 10, 22, fill='white'), part('ellipse', 2, 14, 36, 40, fill='white'),
+                      part('ellipse', 24, 4, 40, 20, fill='white'),
+                      part('polygon', 28, 6, 30, 0, 33, 4, 36, 0, 37, 6, fill=(220, 20, 20)),
+                      part('polygon', 39, 10, 42, 12, 39, 14, fill=(240, 160, 0)), part('ellipse', 35, 15, 39, 21, fill=(220, 20, 20)),
+                      part('ellipse', 33, 9, 35, 11, fill='black')),
+    'peacock': Sprite(110, 110, part('pieslice', 0, 10, 110, 120, start=180, end=360, fill=(0, 120, 90)),
+                      *(part('ellipse', 55 + 45 * math.cos(math.radians(a)) - 4, 65 + 45 * math.sin(math.radians(a)) - 4,
+                             55 + 45 * math.cos(math.radians(a)) + 4, 65 + 45 * math.sin(math.radians(a)) + 4, fill=(30, 60, 200))
+                        for a in range(195, 346, 25)),
+                      part('line', 58, 85, 58, 110, fill=(150, 120, 90), width=3), part('line', 70, 85, 70, 110, fill=(150, 120, 90), width=3),
+                      part('ellipse', 48, 55, 80, 85, fill=(30, 80, 200)), part('line', 74, 62, 84, 30, fill=(30, 80, 200), width=7),
+                      part('ellipse', 80, 24, 94, 38, fill=(30, 80, 200)), part('line', 88, 24, 90, 16, fill=(30, 80, 200), width=2),
+                      part('polygon', 93, 30, 100, 32, 93, 34, fill=(200, 160, 60))),
+    
+    # Reptiles and fantasy creatures
+    'snake': Sprite(110, 30, part('line', 0, 22, 20, 12, 40, 22, 60, 12, 80, 22, 96, 16, fill=(60, 150, 50), width=8, joint='curve'),
+                    part('ellipse', 92, 8, 110, 24, fill=(60, 150, 50)), part('ellipse', 101, 11, 104, 14, fill='black')),
+    'turtle': Sprite(70, 40, part('ellipse', 10, 26, 22, 40, fill=(110, 160, 80)), part('ellipse', 44, 26, 56, 40, fill=(110, 160, 80)),
+                     part('ellipse', 54, 18, 70, 30, fill=(110, 160, 80)),
+                     part('chord', 4, 4, 62, 60, start=180, end=360, fill=(60, 110, 40)),
+                     part('rectangle', 4, 30, 62, 34, fill=(80, 130, 50)), part('ellipse', 62, 21, 65, 24, fill='black')),
+    'frog': Sprite(45, 32, part('ellipse', 0, 16, 20, 32, fill=(60, 160, 60)), part('ellipse', 25, 16, 45, 32, fill=(60, 160, 60)),
+                   part('ellipse', 6, 8, 40, 30, fill=(80, 180, 80)),
+                   part('ellipse', 8, 0, 18, 10, fill=(80, 180, 80)), part('ellipse', 28, 0, 38, 10, fill=(80, 180, 80)),
+                   part('ellipse', 11, 3, 15, 7, fill='black'), part('ellipse', 31, 3, 35, 7, fill='black'),
+                   part('arc', 14, 14, 32, 24, start=20, end=160, fill=(40, 100, 40), width=2)),
+    'crocodile': Sprite(170, 40, part('rectangle', 50, 28, 60, 40, fill=(60, 105, 50)), part('rectangle', 100, 28, 110, 40, fill=(60, 105, 50)),
+                        part('polygon', 0, 26, 40, 14, 120, 12, 150, 18, 170, 24, 150, 30, 120, 34, 40, 32, fill=(70, 120, 60)),
+                        *(part('polygon', x, 24, x + 3, 28, x + 6, 24, fill='white') for x in range(130, 165, 8)),
+                        part('ellipse', 128, 12, 136, 20, fill=(240, 220, 80))),
+    'dragon': Sprite(190, 120, part('polygon', 85, 62, 60, 10, 50, 40, fill=(170, 30, 30)),
+                     part('line', 0, 90, 30, 70, 60, 80, fill=(200, 40, 40), width=8, joint='curve'),
+                     part('line', 70, 90, 65, 110, fill=(200, 40, 40), width=6), part('line', 110, 90, 115, 110, fill=(200, 40, 40), width=6),
+                     part('ellipse', 50, 55, 130, 95, fill=(200, 40, 40)),
+                     part('polygon', 115, 65, 150, 30, 160, 38, 125, 80, fill=(200, 40, 40)),
+                     part('polygon', 148, 24, 180, 28, 190, 38, 160, 44, fill=(200, 40, 40)),
+                     part('line', 155, 26, 150, 14, fill=(240, 220, 180), width=3), part('ellipse', 166, 30, 170, 34, fill=(255, 220, 0)),
+                     part('polygon', 70, 60, 90, 0, 120, 20, 110, 60, fill=(150, 20, 20)),
+                     role='sky'),
+    'dinosaur': Sprite(190, 160, part('polygon', 0, 100, 60, 80, 70, 110, fill=(80, 150, 80)),
+                       part('rectangle', 60, 110, 78, 160, fill=(80, 150, 80)), part('rectangle', 100, 110, 118, 160, fill=(80, 150, 80)),
+                       part('ellipse', 40, 70, 130, 125, fill=(90, 160, 90)),
+                       part('polygon', 110, 80, 140, 20, 156, 24, 130, 95, fill=(90, 160, 90)),
+                       part('ellipse', 136, 6, 175, 30, fill=(90, 160, 90)), part('ellipse', 160, 12, 165, 17, fill='black')),
+    
+    # Insects
+    'butterfly': Sprite(36, 30, part('ellipse', 0, 0, 17, 16, fill=TINT), part('ellipse', 19, 0, 36, 16, fill=TINT),
+                        part('ellipse', 3, 14, 17, 28, fill=TINT), part('ellipse', 19, 14, 33, 28, fill=TINT),
+                        part('line', 18, 4, 18, 28, fill='black', width=3),
+                        part('line', 18, 4, 14, 0, fill='black', width=1), part('line', 18, 4, 22, 0, fill='black', width=1),
+                        role='sky', tint=(255, 140, 0)),
+    'bee': Sprite(28, 20, part('ellipse', 6, 0, 16, 10, fill=(220, 240, 255)), part('ellipse', 13, 0, 23, 10, fill=(220, 240, 255)),
+                  part('polygon', 0, 12, 3, 11, 3, 14, fill='black'), part('ellipse', 2, 6, 26, 20, fill=(255, 200, 0)),
+                  part('line', 10, 7, 10, 19, fill='black', width=3), part('line', 16, 7, 16, 19, fill='black', width=3),
+                  role='sky'),
+    'ant': Sprite(26, 12, *(part('line', x, 6, x + dx, 12, fill='black', width=1) for x, dx in ((8, -4), (12, 0), (16, 4))),
+                  part('ellipse', 0, 3, 9, 11, fill='black'), part('ellipse', 9, 4, 15, 10, fill='black'),
+                  part('ellipse', 15, 2, 24, 10, fill='black')),
+    'spider': Sprite(40, 30, *(part('line', 20, 16, x, y, fill='black', width=2)
+                               for x, y in ((2, 4), (0, 16), (2, 28), (8, 30), (38, 4), (40, 16), (38, 28), (32, 30))),
+                     part('ellipse', 12, 8, 28, 24, fill='black'), part('ellipse', 16, 4, 24, 12, fill='black')),
+    'dragonfly': Sprite(56, 22, *(part('ellipse', x0, y0, x1, y1, fill=(200, 230, 255))
+                                  for x0, y0, x1, y1 in ((8, 0, 26, 8), (30, 0, 48, 8), (10, 10, 26, 18), (30, 10, 46, 18))),
+                        part('line', 0, 11, 50, 11, fill=(40, 120, 200), width=3), part('ellipse', 48, 7, 56, 15, fill=(40, 120, 200)),
+                        role='sky'),
+    'ladybug': Sprite(26, 20, part('ellipse', 18, 6, 26, 14, fill='black'),
+                      part('chord', 0, 0, 24, 36, start=180, end=360, fill=(220, 20, 20)),
+                      part('line', 12, 0, 12, 18, fill='black', width=1),
+                      part('ellipse', 4, 8, 8, 12, fill='black'), part('ellipse', 15, 6, 19, 10, fill='black')),
+    
+    # Sea life
+    'fish': Sprite(42, 22, part('polygon', 0, 2, 12, 11, 0, 20, fill=TINT), part('polygon', 20, 4, 26, 0, 30, 4, fill=TINT),
+                   part('ellipse', 8, 2, 42, 20, fill=TINT), part('ellipse', 32, 7, 36, 11, fill='black'),
+                   role='water', tint=(255, 140, 0)),
+    'shark': Sprite(160, 60, part('polygon', 60, 24, 78, 0, 88, 24, fill=(110, 120, 130)),
+                    part('polygon', 0, 18, 22, 38, 0, 56, fill=(110, 120, 130)), part('ellipse', 14, 22, 160, 54, fill=(110, 120, 130)),
+                    part('chord', 30, 26, 150, 56, start=0, end=180, fill=(230, 230, 235)),
+                    part('ellipse', 132, 32, 136, 36, fill='black'),
+                    role='sea'),
+    'dolphin': Sprite(120, 50, part('polygon', 50, 18, 58, 0, 68, 18, fill=(90, 120, 160)),
+                      part('polygon', 0, 10, 18, 28, 0, 44, fill=(90, 120, 160)), part('ellipse', 10, 15, 105, 45, fill=(90, 120, 160)),
+                      part('ellipse', 98, 26, 120, 36, fill=(90, 120, 160)), part('ellipse', 94, 24, 97, 27, fill='black'),
+                      role='sea'),
+    'whale': Sprite(220, 100, *(part('line', 170, 30, x, y, fill=(200, 230, 255), width=3) for x, y in ((160, 0), (170, 0), (180, 2))),
+                    part('polygon', 0, 30, 30, 62, 8, 86, fill=(40, 60, 110)), part('ellipse', 20, 30, 210, 95, fill=(40, 60, 110)),
+                    part('chord', 40, 50, 200, 100, start=0, end=180, fill=(180, 190, 210)),
+                    part('ellipse', 180, 60, 185, 65, fill='white'),
+                    role='sea'),
+    'jellyfish': Sprite(44, 64, *(part('line', x, 20, x + 4, 40, x - 2, 64, fill=(255, 170, 220), width=2, joint='curve')
+                                  for x in (10, 18, 26, 34)),
+                        part('chord', 0, 0, 44, 44, start=180, end=360, fill=(255, 150, 210)),
+                        role='sea'),
+    'octopus': Sprite(80, 75, *(part('line', x, 40, x + dx, 58, x, 75, fill=(150, 60, 170), width=6, joint='curve')
+                                for x, dx in ((12, -8), (28, -6), (44, 6), (60, 8))),
+                      part('ellipse', 14, 0, 66, 50, fill=(160, 70, 180)),
+                      part('ellipse', 28, 18, 36, 28, fill='white'), part('ellipse', 44, 18, 52, 28, fill='white'),
+                      part('ellipse', 31, 22, 34, 26, fill='black'), part('ellipse', 47, 22, 50, 26, fill='black'),
+                      role='sea'),
+    'crab': Sprite(56, 34, *(part('line', 28, 22, x, 34, fill=(200, 50, 30), width=2) for x in (6, 12, 44, 50)),
+                   part('line', 14, 10, 20, 18, fill=(220, 60, 30), width=3), part('line', 42, 10, 36, 18, fill=(220, 60, 30), width=3),
+                   part('ellipse', 0, 0, 14, 12, fill=(220, 60, 30)), part('ellipse', 42, 0, 56, 12, fill=(220, 60, 30)),
+                   part('ellipse', 12, 12, 44, 30, fill=(220, 60, 30)),
+                   part('ellipse', 22, 8, 26, 12, fill='black'), part('ellipse', 30, 8, 34, 12, fill='black')),
+    'starfish': Sprite(40, 38, part('polygon', *star_points(20, 20, 20, 8), fill=(255, 140, 60))),
+    
+    # People
+    'person': Sprite(34, 95, part('line', 13, 60, 11, 95, fill=(40, 40, 80), width=5), part('line', 21, 60, 23, 95, fill=(40, 40, 80), width=5),
+                     part('line', 8, 30, 2, 56, fill=TINT, width=4), part('line', 26, 30, 32, 56, fill=TINT, width=4),
+                     part('rectangle', 8, 26, 26, 62, fill=TINT),
+                     part('ellipse', 8, 2, 26, 24, fill=SKIN), part('chord', 8, 0, 26, 20, start=180, end=360, fill=(90, 60, 30)),
+                     tint=(30, 144, 255)),
+    'man': Sprite(36, 100, part('line', 14, 62, 12, 100, fill=(50, 50, 60), width=6), part('line', 22, 62, 24, 100, fill=(50, 50, 60), width=6),
+                  part('line', 8, 30, 2, 60, fill=TINT, width=5), part('line', 28, 30, 34, 60, fill=TINT, width=5),
+                  part('rectangle', 8, 26, 28, 64, fill=TINT),
+                  part('ellipse', 9, 2, 27, 24, fill=SKIN), part('chord', 9, 0, 27, 16, start=180, end=360, fill=(60, 40, 20)),
+                  tint=(70, 110, 180)),
+    'woman': Sprite(38, 100, part('ellipse', 7, 0, 31, 34, fill=(120, 70, 30)),
+                    part('line', 15, 78, 15, 100, fill=SKIN, width=4), part('line', 23, 78, 23, 100, fill=SKIN, width=4),
+                    part('line', 11, 32, 4, 58, fill=SKIN, width=4), part('line', 27, 32, 34, 58, fill=SKIN, width=4),
+                    part('polygon', 10, 28, 28, 28, 36, 80, 2, 80, fill=TINT),
+                    part('ellipse', 10, 4, 28, 26, fill=SKIN),
+                    tint=(220, 60, 120)),
+    'child': Sprite(26, 64, part('line', 10, 40, 9, 64, fill=(40, 40, 80), width=4), part('line', 16, 40, 17, 64, fill=(40, 40, 80), width=4),
+                    part('line', 6, 20, 1, 38, fill=TINT, width=3), part('line', 20, 20, 25, 38, fill=TINT, width=3),
+                    part('rectangle', 6, 17, 20, 42, fill=TINT),
+                    part('ellipse', 5, 0, 21, 16, fill=SKIN), part('chord', 5, 0, 21, 12, start=180, end=360, fill=(160, 100, 40)),
+                    tint=(255, 200, 0)),
+    'superhero': Sprite(46, 100, part('polygon', 12, 26, 34, 26, 46, 92, 0, 92, fill=(200, 20, 40)),
+                        part('line', 19, 62, 17, 100, fill=(30, 60, 180), width=6), part('line', 27, 62, 29, 100, fill=(30, 60, 180), width=6),
+                        part('line', 13, 30, 6, 12, fill=(30, 60, 180), width=5), part('line', 33, 30, 40, 12, fill=(30, 60, 180), width=5),
+                        part('rectangle', 13, 26, 33, 64, fill=(30, 60, 180)),
+                        part('polygon', 18, 34, 28, 34, 23, 44, fill=(255, 215, 0)), part('rectangle', 13, 58, 33, 62, fill=(255, 215, 0)),
+                        part('ellipse', 14, 4, 32, 24, fill=SKIN), part('rectangle', 14, 10, 32, 15, fill='black')),
+    'robot': Sprite(56, 95, part('line', 28, 2, 28, 10, fill=(120, 120, 130), width=2), part('ellipse', 25, 0, 31, 6, fill='red'),
+                    part('rectangle', 14, 10, 42, 34, fill=(170, 175, 185), outline=(90, 90, 100), width=2),
+                    part('ellipse', 19, 16, 25, 22, fill=(0, 200, 255)), part('ellipse', 31, 16, 37, 22, fill=(0, 200, 255)),
+                    part('rectangle', 21, 27, 35, 30, fill=(60, 60, 70)),
+                    part('rectangle', 0, 38, 8, 66, fill=(130, 135, 145)), part('rectangle', 48, 38, 56, 66, fill=(130, 135, 145)),
+                    part('rectangle', 14, 72, 24, 95, fill=(130, 135, 145)), part('rectangle', 32, 72, 42, 95, fill=(130, 135, 145)),
+                    part('rectangle', 8, 36, 48, 72, fill=(150, 155, 165), outline=(90, 90, 100), width=2),
+                    part('rectangle', 18, 44, 38, 60, fill=(90, 200, 120))),
+    'alien': Sprite(44, 85, part('line', 18, 70, 16, 85, fill=(120, 220, 100), width=4), part('line', 26, 70, 28, 85, fill=(120, 220, 100), width=4),
+                    part('line', 14, 46, 4, 62, fill=(120, 220, 100), width=3), part('line', 30, 46, 40, 62, fill=(120, 220, 100), width=3),
+                    part('ellipse', 12, 38, 32, 72, fill=(120, 220, 100)), part('ellipse', 4, 0, 40, 40, fill=(120, 220, 100)),
+                    part('ellipse', 8, 14, 20, 28, fill='black'), part('ellipse', 24, 14, 36, 28, fill='black')),
+    
+    # Furniture and household things
+    'chair': Sprite(44, 66, part('rectangle', 30, 0, 36, 66, fill=(140, 90, 40)), part('rectangle', 4, 34, 36, 40, fill=(140, 90, 40)),
+                    part('rectangle', 4, 40, 9, 66, fill=(140, 90, 40))),
+    'table': Sprite(100, 56, part('rectangle', 6, 8, 14, 56, fill=(130, 85, 40)), part('rectangle', 86, 8, 94, 56, fill=(130, 85, 40)),
+                    part('rectangle', 0, 0, 100, 8, fill=(150, 100, 50))),
+    'bed': Sprite(140, 62, part('rectangle', 0, 0, 14, 62, fill=(120, 80, 40)), part('rectangle', 128, 20, 140, 62, fill=(120, 80, 40)),
+                  part('rectangle', 12, 26, 130, 44, fill='white'), part('rectangle', 44, 22, 130, 44, fill=TINT),
+                  part('ellipse', 14, 16, 44, 32, fill=(240, 240, 250)), part('rectangle', 12, 44, 130, 52, fill=(120, 80, 40)),
+                  tint=(70, 110, 200)),
+    'sofa': Sprite(140, 66, part('rectangle', 10, 54, 16, 66, fill=(60, 40, 20)), part('rectangle', 124, 54, 130, 66, fill=(60, 40, 20)),
+                   part('rectangle', 8, 0, 132, 34, fill=TINT), part('rectangle', 8, 30, 132, 54, fill=TINT),
+                   part('line', 20, 32, 120, 32, fill=(0, 0, 0), width=1), part('line', 70, 4, 70, 30, fill=(0, 0, 0), width=1),
+                   part('rectangle', 0, 16, 20, 54, fill=TINT), part('rectangle', 120, 16, 140, 54, fill=TINT),
+                   tint=(150, 40, 40)),
+    'lamp': Sprite(44, 115, part('line', 22, 30, 22, 108, fill=(80, 80, 80), width=3), part('ellipse', 8, 104, 36, 115, fill=(80, 80, 80)),
+                   part('polygon', 8, 0, 36, 0, 44, 30, 0, 30, fill=TINT),
+                   tint=(255, 220, 120)),
+    'clock': Sprite(60, 60, part('ellipse', 0, 0, 60, 60, fill='white', outline=(60, 60, 60), width=4),
+                    *(part('line', 30 + 22 * math.cos(math.radians(a)), 30 + 22 * math.sin(math.radians(a)),
+                           30 + 26 * math.cos(math.radians(a)), 30 + 26 * math.sin(math.radians(a)), fill='black', width=2)
+                      for a in range(0, 360, 30)),
+                    part('line', 30, 30, 30, 10, fill='black', width=3), part('line', 30, 30, 44, 36, fill='black', width=3),
+                    part('ellipse', 27, 27, 33, 33, fill='black')),
+    'mirror': Sprite(54, 86, part('ellipse', 0, 0, 54, 86, fill=(200, 160, 60)), part('ellipse', 6, 6, 48, 80, fill=(190, 220, 240)),
+                     part('line', 16, 22, 26, 12, fill='white', width=3)),
+    'window': Sprite(80, 80, part('rectangle', 0, 0, 80, 80, fill=(240, 240, 240)),
+                     *(part('rectangle', x, y, x + 31, y + 31, fill=GLASS) for x in (6, 43) for y in (6, 43))),
+    'door': Sprite(60, 110, part('rectangle', 0, 0, 60, 110, fill=(90, 55, 25)), part('rectangle', 6, 6, 54, 110, fill=TINT),
+                   part('rectangle', 12, 14, 48, 48, outline=(90, 55, 25), width=2),
+                   part('rectangle', 12, 60, 48, 100, outline=(90, 55, 25), width=2),
+                   part('ellipse', 42, 52, 48, 58, fill=(220, 190, 60)),
+                   tint=(140, 90, 40)),
+    'stairs': Sprite(100, 80, part('polygon', 0, 80, 0, 60, 25, 60, 25, 40, 50, 40, 50, 20, 75, 20, 75, 0, 100, 0, 100, 80,
+                                   fill=(170, 170, 170)),
+                      *(part('line', x, y, x + 25, y, fill=(120, 120, 120), width=2) for x, y in ((0, 60), (25, 40), (50, 20), (75, 0)))),
+    'fence': Sprite(160, 50, part('rectangle', 0, 14, 160, 20, fill=(200, 170, 120)), part('rectangle', 0, 32, 160, 38, fill=(200, 170, 120)),
+                    *(part('polygon', x, 8, x + 6, 0, x + 12, 8, x + 12, 50, x, 50, fill=(220, 190, 140)) for x in range(2, 150, 20))),
+    
+    # Everyday items
+    'phone': Sprite(26, 46, part('rectangle', 0, 0, 26, 46, fill=(30, 30, 35)), part('rectangle', 3, 5, 23, 38, fill=(100, 170, 230)),
+                    part('ellipse', 10, 40, 16, 45, fill=(80, 80, 80))),
+    'computer': Sprite(90, 76, part('rectangle', 0, 0, 90, 56, fill=(40, 40, 45)), part('rectangle', 5, 5, 85, 50, fill=(90, 160, 230)),
+                       part('rectangle', 40, 56, 50, 66, fill=(80, 80, 80)), part('rectangle', 28, 64, 62, 68, fill=(80, 80, 80)),
+                       part('rectangle', 10, 70, 80, 76, fill=(200, 200, 200))),
+    'tv': Sprite(120, 88, part('line', 20, 74, 12, 88, fill=(60, 60, 60), width=4), part('line', 100, 74, 108, 88, fill=(60, 60, 60), width=4),
+                 part('rectangle', 0, 0, 120, 74, fill=(25, 25, 30)), part('rectangle', 6, 6, 114, 68, fill=(60, 100, 150))),
+    'camera': Sprite(64, 44, part('rectangle', 18, 0, 38, 8, fill=(50, 50, 50)), part('rectangle', 0, 6, 64, 44, fill=(40, 40, 45)),
+                     part('ellipse', 18, 12, 46, 40, fill=(90, 90, 100)), part('ellipse', 24, 18, 40, 34, fill=(60, 100, 160)),
+                     part('rectangle', 50, 10, 60, 16, fill=(240, 240, 200))),
+    'book': Sprite(64, 44, part('rectangle', 0, 0, 64, 44, fill=TINT), part('rectangle', 8, 36, 64, 40, fill='white'),
+                   part('rectangle', 0, 0, 8, 44, fill=(40, 40, 40)), part('rectangle', 20, 10, 54, 16, fill=(240, 240, 240)),
+                   tint=(30, 90, 160)),
+    'umbrella': Sprite(90, 100, part('line', 45, 35, 45, 92, fill=(60, 60, 60), width=3),
+                       part('arc', 37, 84, 53, 100, start=0, end=180, fill=(60, 60, 60), width=3),
+                       part('pieslice', 0, 0, 90, 70, start=180, end=360, fill=TINT),
+                       part('line', 45, 2, 15, 35, fill=(0, 0, 0), width=1), part('line', 45, 2, 75, 35, fill=(0, 0, 0), width=1),
+                       tint=(220, 20, 60)),
+    'backpack': Sprite(50, 60, part('chord', 4, 0, 46, 14, start=180, end=360, fill=TINT),
+                       part('rectangle', 4, 6, 46, 60, fill=TINT), part('rectangle', 12, 34, 38, 54, outline=(40, 40, 40), width=2),
+                       tint=(30, 144, 255)),
+    'ball': Sprite(32, 32, part('ellipse', 0, 0, 32, 32, fill=TINT), part('line', 0, 16, 32, 16, fill='white', width=2),
+                   part('arc', 6, 0, 26, 32, start=270, end=90, fill='white', width=2),
+                   tint=(220, 20, 60)),
+    'balloon': Sprite(36, 95, part('line', 18, 46, 16, 70, 20, 95, fill=(80, 80, 80), width=1, joint='curve'),
+                      part('polygon', 15, 48, 21, 48, 18, 44, fill=TINT), part('ellipse', 0, 0, 36, 46, fill=TINT),
+                      part('ellipse', 8, 8, 14, 16, fill='white'),
+                      role='sky', tint=(220, 20, 60)),
+    'kite': Sprite(60, 110, part('line', 30, 70, 22, 85, 36, 95, 28, 110, fill=(80, 80, 80), width=2, joint='curve'),
+                   part('polygon', 30, 0, 60, 28, 30, 70, 0, 28, fill=TINT),
+                   part('line', 30, 0, 30, 70, fill=(60, 60, 60), width=1), part('line', 0, 28, 60, 28, fill=(60, 60, 60), width=1),
+                   role='sky', tint=(255, 215, 0)),
+    'flag': Sprite(64, 115, part('line', 4, 0, 4, 115, fill=(120, 120, 120), width=3), part('rectangle', 6, 4, 64, 40, fill=TINT),
+                   tint=(220, 20, 60)),
+    
+    # Food
+    'apple': Sprite(32, 36, part('ellipse', 0, 6, 32, 36, fill=TINT), part('line', 16, 8, 18, 0, fill=(100, 60, 20), width=2),
+                    part('ellipse', 18, 0, 28, 6, fill=(40, 140, 40)),
+                    tint=(220, 20, 30)),
+    'banana': Sprite(50, 26, part('line', 2, 6, 12, 18, 28, 22, 44, 16, 48, 6, fill=(255, 220, 60), width=8, joint='curve'),
+                     part('ellipse', 0, 3, 5, 8, fill=(90, 70, 20))),
+    'orange': Sprite(32, 34, part('ellipse', 0, 2, 32, 34, fill=(255, 150, 0)), part('ellipse', 14, 0, 24, 6, fill=(40, 140, 40))),
+    'pizza': Sprite(60, 52, part('polygon', 0, 0, 60, 0, 30, 52, fill=(250, 210, 90)),
+                    part('line', 0, 2, 60, 2, fill=(200, 140, 60), width=6),
+                    *(part('ellipse', x, y, x + 9, y + 9, fill=(200, 40, 40)) for x, y in ((16, 8), (33, 12), (25, 26)))),
+    'cake': Sprite(60, 62, part('rectangle', 28, 8, 32, 22, fill='white'), part('ellipse', 26, 0, 34, 9, fill=(255, 180, 0)),
+                   part('rectangle', 0, 40, 60, 62, fill=TINT), part('rectangle', 6, 22, 54, 42, fill=TINT),
+                   part('line', 6, 22, 54, 22, fill='white', width=4), part('line', 0, 40, 60, 40, fill='white', width=4),
+                   tint=(255, 180, 200)),
+    'ice cream': Sprite(34, 64, part('polygon', 4, 26, 30, 26, 17, 64, fill=(220, 170, 100)),
+                        part('ellipse', 2, 10, 32, 34, fill=TINT), part('ellipse', 6, 0, 28, 20, fill=(250, 250, 240)),
+                        tint=(255, 190, 210)),
+    'bread': Sprite(62, 34, part('chord', 0, 0, 62, 64, start=180, end=360, fill=(210, 150, 80)),
+                    part('rectangle', 0, 30, 62, 34, fill=(190, 130, 60)),
+                    *(part('line', x, 10, x + 8, 20, fill=(240, 200, 140), width=2) for x in (16, 30, 44))),
+    'burger': Sprite(56, 44, part('rectangle', 2, 32, 54, 44, fill=(220, 160, 80)), part('rectangle', 2, 22, 54, 32, fill=(110, 60, 30)),
+                     part('polygon', 4, 20, 52, 20, 46, 26, 10, 26, fill=(255, 200, 0)),
+                     part('polygon', 2, 17, 54, 17, 50, 22, 6, 22, fill=(90, 180, 60)),
+                     part('chord', 0, 0, 56, 36, start=180, end=360, fill=(220, 160, 80)),
+                     *(part('ellipse', x, y, x + 3, y + 2, fill='white') for x, y in ((16, 6), (27, 4), (38, 7)))),
+    
+    # Instruments
+    'guitar': Sprite(44, 115, part('rectangle', 19, 0, 25, 60, fill=(90, 55, 25)), part('rectangle', 16, 0, 28, 10, fill=(60, 35, 15)),
+                     part('ellipse', 8, 50, 36, 78, fill=(200, 120, 50)), part('ellipse', 0, 68, 44, 115, fill=(200, 120, 50)),
+                     part('ellipse', 16, 74, 28, 86, fill=(40, 25, 10)), part('rectangle', 14, 98, 30, 102, fill=(60, 35, 15)),
+                     part('line', 22, 8, 22, 100, fill=(230, 230, 230), width=1)),
+    'piano': Sprite(130, 85, part('rectangle', 6, 64, 14, 85, fill=(25, 25, 30)), part('rectangle', 116, 64, 124, 85, fill=(25, 25, 30)),
+                    part('rectangle', 0, 0, 130, 50, fill=(25, 25, 30)), part('rectangle', 4, 50, 126, 64, fill='white'),
+                    *(part('rectangle', x, 50, x + 4, 58, fill='black') for x in range(12, 122, 10))),
+    'drum': Sprite(64, 56, part('ellipse', 0, 40, 64, 56, fill=(170, 30, 30)), part('rectangle', 0, 16, 64, 48, fill=(200, 40, 40)),
+                   part('line', 0, 20, 16, 44, 32, 20, 48, 44, 64, 20, fill=(240, 220, 150), width=2),
+                   part('ellipse', 0, 8, 64, 24, fill=(240, 240, 230)),
+                   part('line', 10, 0, 28, 14, fill=(170, 120, 60), width=3), part('line', 54, 0, 36, 14, fill=(170, 120, 60), width=3)),
+    'violin': Sprite(34, 100, part('rectangle', 15, 0, 19, 46, fill=(60, 35, 15)), part('ellipse', 13, 0, 21, 8, fill=(60, 35, 15)),
+                     part('ellipse', 4, 38, 30, 64, fill=(170, 80, 30)), part('ellipse', 0, 58, 34, 98, fill=(170, 80, 30)),
+                     part('line', 10, 62, 10, 74, fill='black', width=1), part('line', 24, 62, 24, 74, fill='black', width=1),
+                     part('line', 17, 4, 17, 90, fill=(230, 230, 230), width=1)),
+    
+    # Fantasy and miscellaneous
+    'fire': Sprite(50, 60, part('line', 4, 58, 46, 54, fill=(110, 60, 20), width=5), part('line', 6, 54, 46, 60, fill=(110, 60, 20), width=5),
+                   part('polygon', 0, 58, 6, 30, 14, 40, 20, 8, 28, 30, 36, 0, 42, 34, 50, 58, fill=(255, 69, 0)),
+                   part('polygon', 12, 58, 18, 38, 25, 50, 30, 24, 38, 58, fill=(255, 215, 0))),
+    'smoke': Sprite(60, 110, *(part('ellipse', x0, y0, x1, y1, fill=(150, 150, 150, 170))
+                               for x0, y0, x1, y1 in ((10, 80, 40, 110), (16, 54, 50, 86), (8, 28, 44, 62), (18, 0, 56, 36)))),
+    'crystal': Sprite(40, 70, part('polygon', 20, 0, 36, 20, 30, 70, 10, 70, 4, 20, fill=(150, 220, 255)),
+                      part('line', 20, 0, 20, 70, fill=(220, 245, 255), width=1),
+                      part('polygon', 0, 40, 8, 30, 14, 70, 2, 70, fill=(120, 200, 240))),
+    'diamond': Sprite(44, 38, part('polygon', 8, 0, 36, 0, 44, 12, 22, 38, 0, 12, fill=(185, 242, 255)),
+                      part('line', 0, 12, 44, 12, fill='white', width=1),
+                      part('line', 8, 0, 14, 12, 22, 38, fill=(130, 210, 240), width=1),
+                      part('line', 36, 0, 30, 12, 22, 38, fill=(130, 210, 240), width=1)),
+    'crown': Sprite(56, 40, part('polygon', 0, 40, 0, 10, 14, 24, 28, 0, 42, 24, 56, 10, 56, 40, fill=(255, 200, 0)),
+                    part('rectangle', 0, 32, 56, 40, fill=(230, 170, 0)),
+                    part('ellipse', 24, 24, 32, 32, fill=(220, 20, 60)), part('ellipse', 8, 30, 14, 36, fill=(30, 144, 255)),
+                    part('ellipse', 42, 30, 48, 36, fill=(30, 144, 255))),
+    'sword': Sprite(24, 110, part('polygon', 12, 0, 16, 8, 16, 78, 8, 78, 8, 8, fill=(210, 215, 225)),
+                    part('rectangle', 0, 78, 24, 84, fill=(200, 160, 40)), part('rectangle', 9, 84, 15, 104, fill=(90, 55, 25)),
+                    part('ellipse', 7, 102, 17, 110, fill=(200, 160, 40))),
+    'shield': Sprite(54, 64, part('polygon', 0, 0, 54, 0, 54, 30, 27, 64, 0, 30, fill=TINT, outline=(200, 160, 40), width=3),
+                     part('polygon', 27, 12, 38, 26, 27, 44, 16, 26, fill=(255, 215, 0)),
+                     tint=(30, 90, 200)),
+}
+
+# Words that stand for a group of sprites (terrain layers are allowed too)
+SCENE_GROUPS = {
+    'forest': ['pine', 'tree', 'pine', 'tree', 'pine', 'tree', 'bush'],
+    'city': ['building', 'building', 'building', 'tower', 'road', 'car'],
+    'village': ['house', 'house', 'church', 'tree', 'path'],
+    'farm': ['barn', 'fence', 'cow', 'sheep', 'chicken'],
+    'garden': ['flower', 'rose', 'sunflower', 'bush', 'fence'],
+    'park': ['tree', 'tree', 'path', 'bush', 'flower'],
+    'family': ['man', 'woman', 'child'],
+    'crowd': ['person', 'man', 'woman', 'person', 'child', 'person'],
+}
+
+# How many copies a single mention gets, for things that look sparse on their own
+SPRITE_COUNTS = {
+    'tree': 3, 'cloud': 3, 'bird': 3, 'flower': 3, 'fish': 3, 'grass': 4, 'rock': 2, 'mushroom': 3,
+    'sheep': 2, 'chicken': 2, 'duck': 2, 'balloon': 3, 'butterfly': 2, 'bee': 2, 'ant': 3,
+}
+MAX_SPRITES = 40
+
+# --- SCENE LAYOUT ---
+# Terrain is drawn as cached full-canvas layers in this order; sprites are then placed around it.
+TERRAIN_LAYERS = {
+    'aurora': 'aurora', 'rainbow': 'rainbow', 'mountain': 'mountains', 'hill': 'hills', 'valley': 'valley',
+    'volcano': 'volcano', 'desert': 'desert', 'ocean': 'ocean', 'waves': 'waves', 'reef': 'reef', 'island': 'island',
+    'beach': 'beach', 'lake': 'lake', 'river': 'river', 'pond': 'pond', 'road': 'road', 'path': 'path',
+    'cliff': 'cliff', 'waterfall': 'waterfall',
+}
+TERRAIN_REQUIRES = {'waves': 'ocean', 'reef': 'ocean', 'island': 'ocean', 'beach': 'ocean'}
+
+# Reference-pixel boxes (x0, y0, x1, y1): where water sprites swim, and where ground sprites can't stand
+WATER_REGIONS = {
+    'ocean': (0, 300, 800, 410),
+    'lake': (190, 405, 610, 495),
+    'river': (0, 444, 800, 500),
+    'pond': (530, 425, 690, 468),
+    'waterfall': (575, 458, 705, 496),
+}
+BLOCKED_REGIONS = {'cliff': (0, 110, 190, 600), 'waterfall': (620, 95, 800, 470)}
+SKY_BAND = (20, 240)  # top and bottom rows sky sprites are kept within
+SUN_BOX = (640, 40, 760, 160)
+LAYOUT_ATTEMPTS = 24
+
+def scene_elements(scene):
+    """Expand a parsed scene into (sprite names, terrain object names)"""
+    objects = list(scene['objects'])
+    if scene['weather'] in ('rainy', 'stormy') and 'cloud' not in objects:
+        objects.append('cloud')
+    if scene['weather'] == 'stormy' and 'lightning' not in objects:
+        objects.append('lightning')
+    
+    names, terrain = [], set()
+    for obj in objects:
+        group = SCENE_GROUPS.get(obj)
+        for name in group or [obj]:
+            if group and name in objects:
+                continue  # 'a farm with a barn' has one barn
+            if name in TERRAIN_LAYERS:
+                terrain.add(name)
+            elif name in SPRITES:
+                names.extend([name] * (1 if group else SPRITE_COUNTS.get(name, 1)))
+    names = names[:MAX_SPRITES]
+    
+    # Sea creatures need an ocean and other swimmers some water; beaches and islands sit on the ocean
+    terrain |= {TERRAIN_REQUIRES[name] for name in terrain if name in TERRAIN_REQUIRES}
+    roles = {SPRITES[name].role for name in names}
+    if 'sea' in roles:
+        terrain.add('ocean')
+    if 'water' in roles and not terrain & WATER_REGIONS.keys():
+        terrain.add('lake')
+    return names, terrain
+
+def perspective_scale(bottom):
+    """Sprite scale for a ground-plane row: objects near the horizon are further away and smaller"""
+    depth = min(1.0, max(0.0, (bottom - HORIZON) / (REF_HEIGHT - HORIZON)))
+    return 0.6 + 0.8 * depth
+
+def layout_sprites(names, terrain, rng, reserved=()):
+    """Assign sprites bottom-centre positions and scales in reference pixels, avoiding overlaps.
+    
+    Larger sprites are placed first; each tries LAYOUT_ATTEMPTS random spots and keeps the
+    first free one, or the least-overlapping if the scene is too crowded. Returns
+    (name, x, bottom, scale) tuples in painter's order: sky first, then far to near.
+    """
+    water = [WATER_REGIONS[key] for key in WATER_REGIONS if key in terrain]
+    blocked = [BLOCKED_REGIONS[key] for key in BLOCKED_REGIONS if key in terrain]
+    ground = (0, WATER_REGIONS['ocean'][3] if 'ocean' in terrain else HORIZON + 6, REF_WIDTH, REF_HEIGHT - 4)
+    sky_boxes, land_boxes = [(*box, 1, False) for box in reserved], []
+    placed = []
+    
+    order = sorted(range(len(names)), key=lambda i: -SPRITES[names[i]].width * SPRITES[names[i]].height)
+    for i in order:
+        sprite = SPRITES[names[i]]
+        # (x0, y0, x1, y1, weight, footprint only): ground sprites may stand behind water but not in it
+        if sprite.role == 'sky':
+            obstacles = sky_boxes
+        elif sprite.role == 'ground':
+            obstacles = land_boxes + [(*box, 1, False) for box in blocked] + [(*box, 10, True) for box in water]
+        else:
+            obstacles = land_boxes
+        
+        best = None
+        for _ in range(LAYOUT_ATTEMPTS):
+            if sprite.role == 'sky':
+                scale = rng.uniform(0.8, 1.1)
+                top = SKY_BAND[0] + sprite.height * scale
+                bottom = rng.uniform(top, max(top, SKY_BAND[1]))
+                region = (0, 0, REF_WIDTH, 0)
+            else:
+                if sprite.role == 'sea':
+                    region = WATER_REGIONS['ocean']
+                elif sprite.role == 'water':
+                    region = water[rng.randrange(len(water))]
+                else:
+                    region = ground
+                bottom = rng.uniform(region[1], region[3])
+                scale = perspective_scale(bottom)
+            half = sprite.width * scale / 2
+            x = rng.uniform(region[0] + half, max(region[0] + half, region[2] - half))
+            x0, y0, x1 = x - half, bottom - sprite.height * scale, x + half
+            
+            # Summed overlap area, abandoned once this spot is no better than the best so far
+            limit = best[0] if best is not None else math.inf
+            cost = 0
+            for ox0, oy0, ox1, oy1, weight, feet in obstacles:
+                w = (x1 if x1 < ox1 else ox1) - (x0 if x0 > ox0 else ox0)
+                if w <= 0:
+                    continue
+                top = bottom - 4 if feet else y0
+                h = (bottom if bottom < oy1 else oy1) - (top if top > oy0 else oy0)
+                if h > 0:
+                    cost += w * h * weight
+                    if cost >= limit:
+                        break
+            if cost < limit:
+                best = (cost, x, bottom, scale, (x0, y0, x1, bottom, 1, False))
+            if cost == 0:
+                break
+        
+        _, x, bottom, scale, box = best
+        (sky_boxes if sprite.role == 'sky' else land_boxes).append(box)
+        placed.append((sprite.role != 'sky', bottom, i, names[i], x, scale))
+    
+    placed.sort()
+    return [(name, x, bottom, scale) for _, bottom, _, name, x, scale in placed]
+
+def rasterize_sprite(sprite, scale, tint=None):
+    """RGBA tile of a sprite at a pixel scale, drawn supersampled and downsampled for smooth edges"""
+    from PIL import Image, ImageDraw
+    k = scale * SPRITE_SUPERSAMPLE
+    size = (max(1, math.ceil(sprite.width * k)), max(1, math.ceil(sprite.height * k)))
+    tile = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(tile)
+    fill = tint or sprite.tint
+    for shape, points, style in sprite.parts:
+        style = {key: fill if value == TINT else value for key, value in style.items()}
+        for key in ('width', 'radius'):
+            if key in style:
+                style[key] = max(1, round(style[key] * k))
+        getattr(draw, shape)([(x * k, y * k) for x, y in points], **style)
+    return tile.resize((max(1, round(size[0] / SPRITE_SUPERSAMPLE)), max(1, round(size[1] / SPRITE_SUPERSAMPLE))),
+                       Image.LANCZOS)
+
+@st.cache_resource
+def get_sprite_cache():
+    """Pre-rasterized sprites keyed by (name, pixel scale, tint), shared by all sessions"""
+    return LRUCache(SPRITE_CACHE_BYTES, sizeof=lambda tile: tile.width * tile.height * 4)
+
+# --- IMAGE RENDERER ---
+class ImageRenderer:
+    def __init__(self, width, height, image_cache=None, layer_cache=None, sprite_cache=None):
+        self.width = width
+        self.height = height
+        # Shared caches are looked up on first use unless passed in, e.g. by renders off the script thread
+        self.image_cache = image_cache
+        self.layer_cache = layer_cache
+        self.sprite_cache = sprite_cache
+    
+    def parse_prompt(self, prompt):
+        """Extract objects and attributes from prompt"""
+        scene = {
+            'objects': [],
+            'colors': [],
+            'time': 'day',
+            'weather': 'clear'
+        }
+        
+        found = get_scene_matcher().labels(prompt)
+        
+        # Keep vocabulary order so output is stable regardless of wording
+        scene['objects'] = [obj for obj in OBJECTS if obj in found.get('objects', ())]
+        scene['colors'] = [color for color in COLORS if color in found.get('colors', ())]
+        
+        # Time of day and weather, in priority order
+        for time_of_day in TIME_KEYWORDS:
+            if time_of_day in found.get('time', ()):
+                scene['time'] = time_of_day
+                break
+        
+        for weather in WEATHER_KEYWORDS:
+            if weather in found.get('weather', ()):
+                scene['weather'] = weather
+                break
+        
+        # Default objects
+        if not scene['objects']:
+            scene['objects'] = ['tree', 'mountain', 'cloud']
+        
+        return scene
+    
+    def compile(self, scene, rng=None):
+        """Compile a parsed scene into an ordered display list of cached layers, particle fields and sprites"""
+        rng = rng or random.Random()
+        display_list = []
+        
+        def layer(key):
+            display_list.append(('layer', key))
+        
+        # Background based on time
+        time = scene['time']
+        layer(('sky', time))
+        
+        objects = scene['objects']
+        colors = scene['colors']
+        names, terrain = scene_elements(scene)
+        
+        # Sky objects
+        reserved = []
+        if 'sun' in objects or (time == 'day' and 'moon' not in objects):
+            layer('sun')
+            reserved.append(SUN_BOX)
+        
+        if 'moon' in objects or time == 'night':
+            layer('moon')
+            reserved.append(SUN_BOX)
+        
+        if 'star' in objects or time == 'night':
+            display_list.append(('particles', particle_field('stars', PARTICLE_COUNTS['stars'], rng)))
+        
+        # Terrain, far to near
+        for name, key in TERRAIN_LAYERS.items():
+            if name in terrain:
+                layer(key)
+        
+        # Objects: the scene's colors go to tintable kinds of sprite in scene order
+        tints = {}
+        for name in names:
+            if colors and SPRITES[name].tint is not None and name not in tints:
+                tints[name] = COLORS[colors[len(tints) % len(colors)]]
+        for name, x, bottom, scale in layout_sprites(names, terrain, rng, reserved):
+            display_list.append(('sprite', (name, tints.get(name), x, bottom, scale)))
+        
+        # Weather falls in front of everything
+        if scene['weather'] == 'rainy' or 'rain' in objects:
+            display_list.append(('particles', particle_field('rain', PARTICLE_COUNTS['rain'], rng)))
+        elif scene['weather'] == 'snowy' or 'snow' in objects:
+            display_list.append(('particles', particle_field('snow', PARTICLE_COUNTS['snow'], rng)))
+        
+        return display_list
+    
+    def static_layer(self, key):
+        """Pre-rasterized static layer for this resolution, from the shared layer cache"""
+        cache = self.layer_cache or get_layer_cache()
+        cache_key = (key, self.width, self.height)
+        entry = cache.get(cache_key)
+        trace_count("layer_cache.hit" if entry is not None else "layer_cache.miss")
+        if entry is None:
+            spec = STATIC_LAYERS[key]
+            if callable(spec):
+                entry = spec(self.width, self.height)
+            else:
+                entry = rasterize_layer(spec, self.width, self.height)
+            cache.put(cache_key, entry)
+        return entry
+    
+    def sprite(self, name, scale, tint=None):
+        """Pre-rasterized sprite at a reference scale for this resolution, from the shared sprite cache"""
+        pixel_scale = max(1, round(scale * self.height / REF_HEIGHT / SPRITE_SCALE_STEP)) * SPRITE_SCALE_STEP
+        cache = self.sprite_cache or get_sprite_cache()
+        cache_key = (name, round(pixel_scale, 4), tint)
+        tile = cache.get(cache_key)
+        trace_count("sprite_cache.hit" if tile is not None else "sprite_cache.miss")
+        if tile is None:
+            tile = rasterize_sprite(SPRITES[name], pixel_scale, tint)
+            cache.put(cache_key, tile)
+        return tile
+    
+    def background(self, keys):
+        """Opaque composite of a run of static layers, cached so it costs one copy per render"""
+        from PIL import Image
+        cache = self.layer_cache or get_layer_cache()
+        cache_key = (('background', keys), self.width, self.height)
+        entry = cache.get(cache_key)
+        trace_count("layer_cache.hit" if entry is not None else "layer_cache.miss")
+        if entry is None:
+            img = Image.new('RGB', (self.width, self.height), 'black')
+            for key in keys:
+                tile, offset = self.static_layer(key)
+                img.paste(tile, offset, tile if tile.mode == 'RGBA' else None)
+            entry = (img, (0, 0))
+            cache.put(cache_key, entry)
+        return entry[0]
+    
+    def rasterize(self, display_list):
+        """Composite cached layers, particle fields and sprites in display-list order"""
+        # The leading static layers (sky, sun or moon, and terrain on starless scenes) flatten into one tile
+        leading = 0
+        while leading < len(display_list) and display_list[leading][0] == 'layer':
+            leading += 1
+        img = self.background(tuple(key for _, key in display_list[:leading])).copy()
+        for kind, payload in display_list[leading:]:
+            if kind == 'layer':
+                tile, offset = self.static_layer(payload)
+                img.paste(tile, offset, tile if tile.mode == 'RGBA' else None)
+            elif kind == 'particles':
+                composite_particles(img, payload)
+            else:
+                name, tint, x, bottom, scale = payload
+                tile = self.sprite(name, scale, tint)
+                position = (round(x * self.width / REF_WIDTH - tile.width / 2),
+                            round(bottom * self.height / REF_HEIGHT) - tile.height)
+                img.paste(tile, position, tile)
+        return img
+    
+    def scene_rng(self, scene, seed=None):
+        """RNG derived from the normalized scene, the resolution and an optional user seed"""
+        payload = repr((scene_key(scene), self.width, self.height, seed))
+        return random.Random(int.from_bytes(hashlib.sha256(payload.encode()).digest()[:8], 'big'))
+    
+    def render(self, scene, seed=None):
+        """Render the scene; the same scene, size and seed always give the same image"""
+        with trace_span("render.compile"):
+            display_list = self.compile(scene, self.scene_rng(scene, seed))
+        with trace_span("render.rasterize"):
+            return self.rasterize(display_list)
+    
+    def render_encoded(self, scene, seed=None, format=IMAGE_FORMAT):
+        """Render to encoded bytes, served from the shared output cache when possible"""
+        cache = self.image_cache or get_image_cache()
+        key = (scene_key(scene), self.width, self.height, seed, format)
+        data = cache.get(key)
+        trace_count("image_cache.hit" if data is not None else "image_cache.miss")
+        if data is None:
+            img = self.render(scene, seed)
+            with trace_span("render.encode"):
+                buffer = io.BytesIO()
+                img.save(buffer, format=format)
+                data = buffer.getvalue()
+            cache.put(key, data)
+        return data
+    
+    def render_previews(self, scene, seed=None, levels=5):
+        """Encoded progressive-preview frames for the rendered scene, cached like the output"""
+        cache = self.image_cache or get_image_cache()
+        key = ('previews', scene_key(scene), self.width, self.height, seed, levels)
+        frames = cache.get(key)
+        trace_count("preview_cache.hit" if frames is not None else "preview_cache.miss")
+        if frames is None:
+            from PIL import Image
+            final_img = Image.open(io.BytesIO(self.render_encoded(scene, seed)))
+            with trace_span("render.previews"):
+                frames = blur_previews(final_img, levels)
+            cache.put(key, frames)
+        return frames
+
+# --- RENDER QUEUE ---
+# Image turns are rendered by a process-wide worker pool rather than on the script thread;
+# the UI polls for the result, so a burst of image requests queues instead of stalling reruns.
+RENDER_WORKERS = int(os.environ.get("SMARTBOT_RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+RENDER_QUEUE_LIMIT = int(os.environ.get("SMARTBOT_RENDER_QUEUE_LIMIT", 32))  # reject beyond this many pending jobs
+RENDER_DEGRADE_DEPTH = int(os.environ.get("SMARTBOT_RENDER_DEGRADE_DEPTH", 8))  # render at Flash size beyond this
+RENDER_SESSION_LIMIT = int(os.environ.get("SMARTBOT_RENDER_SESSION_LIMIT", 2))  # pending jobs per session
+RENDER_POLL_INTERVAL = float(os.environ.get("SMARTBOT_RENDER_POLL_INTERVAL", 0.25))
+RENDER_METRICS_SIZE = 500  # recent wait and run times kept for the percentiles
+FLASH_RESOLUTION = (512, 384)
+PRO_RESOLUTION = (800, 600)
+FLASH_STEPS = 3
+PRO_STEPS = 5
+
+class RenderRejected(Exception):
+    """Raised when a render job is refused because the session or the queue is at its limit"""
+
+class RenderJob:
+    """One image render: its request, lifecycle timestamps and, once done, the encoded result"""
+    def __init__(self, session_id, scene, width, height, seed=None, levels=PRO_STEPS):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.scene = scene
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.levels = levels
+        self.degraded = False
+        self.state = 'queued'
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.image_bytes = None
+        self.frames = []
+        self.error = None
+        self.parent_trace = None  # trace of the turn that submitted the job, when tracing
+        self.trace = None  # the worker's own trace, merged into parent_trace once collected
+
+def percentile_ms(values, fraction):
+    """Nearest-rank percentile of a list of seconds, in milliseconds"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 1)
+
+class RenderQueue:
+    """Bounded render worker pool with per-session limits and depth-based admission"""
+    # Callers catch render_queue.Rejected rather than RenderRejected: the queue outlives reruns, and
+    # `streamlit run app.py` re-executes this module each time, defining a new RenderRejected
+    Rejected = RenderRejected
+    
+    def __init__(self, image_cache, layer_cache, sprite_cache, workers=RENDER_WORKERS,
+                 queue_limit=RENDER_QUEUE_LIMIT, degrade_depth=RENDER_DEGRADE_DEPTH,
+                 session_limit=RENDER_SESSION_LIMIT, previews=PREVIEW_PACING):
+        self.caches = {'image_cache': image_cache, 'layer_cache': layer_cache, 'sprite_cache': sprite_cache}
+        self.previews = previews  # preview frames are only shown when pacing is on
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self.queue_limit = queue_limit
+        self.degrade_depth = degrade_depth
+        self.session_limit = session_limit
+        self.queued = OrderedDict()  # job id -> job, in submission (and so execution) order
+        self.running = 0
+        self.per_session = {}
+        self.counts = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'degraded': 0}
+        self.peak_depth = 0
+        self.wait_times = deque(maxlen=RENDER_METRICS_SIZE)
+        self.run_times = deque(maxlen=RENDER_METRICS_SIZE)
+        self.lock = threading.Lock()
+    
+    @property
+    def depth(self):
+        """Jobs waiting for or holding a worker"""
+        return len(self.queued) + self.running
+    
+    def submit(self, session_id, scene, width, height, seed=None, levels=PRO_STEPS, trace=None):
+        """Queue a render and return its job; raises self.Rejected when over a limit.
+        
+        Past degrade_depth pending jobs, larger requests are rendered at Flash resolution
+        so the backlog drains faster. When the submitting turn's trace is given, the worker
+        traces the render for it. It is passed in rather than looked up, as the queue may
+        belong to an earlier execution of this module with its own thread-local tracer."""
+        job = RenderJob(session_id, scene, width, height, seed, levels)
+        job.parent_trace = trace
+        with self.lock:
+            if self.per_session.get(session_id, 0) >= self.session_limit:
+                self.counts['rejected'] += 1
+                raise self.Rejected(f"you already have {self.session_limit} images in progress")
+            if self.depth >= self.queue_limit:
+                self.counts['rejected'] += 1
+                raise self.Rejected(f"the image queue is full ({self.depth} pending)")
+            if self.depth >= self.degrade_depth and width * height > FLASH_RESOLUTION[0] * FLASH_RESOLUTION[1]:
+                job.width, job.height = FLASH_RESOLUTION
+                job.levels = min(levels, FLASH_STEPS)
+                job.degraded = True
+                self.counts['degraded'] += 1
+            self.queued[job.id] = job
+            self.per_session[session_id] = self.per_session.get(session_id, 0) + 1
+            self.counts['submitted'] += 1
+            self.peak_depth = max(self.peak_depth, self.depth)
+        self.executor.submit(self._run, job)
+        return job
+    
+    def position(self, job):
+        """Jobs ahead of a queued job, or 0 once it has started"""
+        with self.lock:
+            for ahead, job_id in enumerate(self.queued):
+                if job_id == job.id:
+                    return ahead
+        return 0
+    
+    def _run(self, job):
+        with self.lock:
+            self.queued.pop(job.id, None)
+            self.running += 1
+            job.started = time.perf_counter()
+            job.state = 'running'
+        if job.parent_trace is not None:
+            # Trace this thread too, so the turn keeps its render spans and cache counters
+            trace = start_trace("render.job", start=job.submitted, parent_id=job.parent_trace.trace_id)
+            trace.add_span("render.wait", job.submitted, job.started)
+        try:
+            renderer = ImageRenderer(job.width, job.height, **self.caches)
+            job.image_bytes = renderer.render_encoded(job.scene, seed=job.seed)
+            if self.previews:
+                job.frames = renderer.render_previews(job.scene, seed=job.seed, levels=job.levels)
+            state = 'done'
+        except Exception as e:
+            logger.exception("render job %s failed", job.id)
+            job.error = str(e) or type(e).__name__
+            state = 'failed'
+        finally:
+            job.trace = finish_trace(record=False)
+        with self.lock:
+            job.finished = time.perf_counter()
+            job.state = state
+            self.running -= 1
+            remaining = self.per_session.pop(job.session_id, 1) - 1
+            if remaining:
+                self.per_session[job.session_id] = remaining
+            self.counts['completed' if state == 'done' else 'failed'] += 1
+            self.wait_times.append(job.started - job.submitted)
+            self.run_times.append(job.finished - job.started)
+    
+    def stats(self):
+        """Current depth, admission counters and recent wait/run percentiles in milliseconds"""
+        with self.lock:
+            waits, runs = list(self.wait_times), list(self.run_times)
+            stats = {'workers': self.workers, 'queued': len(self.queued), 'running': self.running,
+                     'peak depth': self.peak_depth, **self.counts}
+        stats.update({'wait p50 ms': percentile_ms(waits, 0.5), 'wait p95 ms': percentile_ms(waits, 0.95),
+                      'run p50 ms': percentile_ms(runs, 0.5), 'run p95 ms': percentile_ms(runs, 0.95)})
+        return stats
+
+def collect_render_trace(job):
+    """Record a finished job's worker trace and merge it into the turn that submitted it"""
+    if job.trace is None:
+        return
+    get_trace_stats().record(job.trace)
+    job.parent_trace.merge(job.trace)
+    job.trace = job.parent_trace = None
+
+def finished_image_message(job, image_store=None):
+    """History entry for a finished render job"""
+    if job.state != 'done':
+        return {"role": "assistant", "content": f"Sorry, I couldn't create that image ({job.error})."}
+    response = f"Here's your image! It includes: {', '.join(job.scene['objects'][:10])}"
+    if job.degraded:
+        response += f" (rendered at {job.width}x{job.height} to keep up with demand)"
+    image_ref = (image_store or get_image_store()).put(job.image_bytes)
+    return {"role": "assistant", "content": response, "image_ref": image_ref}
+
+@st.cache_resource
+def get_render_queue():
+    """Process-wide render queue; caches are resolved here, on a script thread, for the workers"""
+    return RenderQueue(get_image_cache(), get_layer_cache(), get_sprite_cache())
+
+# --- SESSION ACCOUNTING ---
+# Every session registers its history, engine and pending renders here on each run, so the
+# process can see what each session holds and reclaim memory from sessions left idle.
+SESSION_IDLE_TTL = float(os.environ.get("SMARTBOT_SESSION_IDLE_TTL", 30 * 60))  # compact after this idle time
+SESSION_EVICT_TTL = float(os.environ.get("SMARTBOT_SESSION_EVICT_TTL", 6 * 3600))  # clear after this idle time
+# Estimated bytes held by all sessions together (not RSS, which the estimates can't be weighed against); 0 = off
+SESSION_MEMORY_CEILING = int(os.environ.get("SMARTBOT_SESSION_MEMORY_CEILING", 256 * 1024 * 1024))
+SESSION_SWEEP_INTERVAL = float(os.environ.get("SMARTBOT_SESSION_SWEEP_INTERVAL", 60))
+SESSION_SWEEP_MAX_RECLAIM = int(os.environ.get("SMARTBOT_SESSION_SWEEP_MAX_RECLAIM", 8))  # reclaims per pressure sweep
+SESSION_PRESSURE_MIN_IDLE = 60  # seconds; sessions used more recently are never reclaimed for memory pressure
+COMPACT_KEEP_TURNS = 5  # engine turns kept by compaction, enough to resolve follow-up questions
+EVICTED_NOTICE = "I cleared this conversation after it sat idle for a while, to free memory. Let's start fresh!"
+
+def process_rss():
+    """Resident set size of this process in bytes (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+class SessionRecord:
+    """What one session holds: its history and render list directly, its engine weakly.
+    
+    The engine lives exactly as long as the session's state, so a dead reference means
+    Streamlit has dropped the session and the record can go."""
+    def __init__(self, session_id, messages, render_jobs, audio_requested, engine):
+        self.session_id = session_id
+        self.messages = messages
+        self.render_jobs = render_jobs
+        self.audio_requested = audio_requested
+        self.engine = weakref.ref(engine)
+        self.last_seen = time.monotonic()
+        self.status = 'active'
+    
+    def held(self):
+        """Estimated bytes by kind that only this session keeps alive.
+        
+        Safe from any thread: it sizes the engine from running totals, never by iterating it."""
+        messages = sys.getsizeof(self.messages) + sum(sys.getsizeof(m) + sys.getsizeof(m["content"])
+                                                      for m in self.messages)
+        renders = sum(len(p['job'].image_bytes or b'') + encoded_size(p['job'].frames) for p in self.render_jobs)
+        engine = self.engine()
+        history = 0
+        if engine is not None:
+            history = engine.memory.size + engine.turn_metrics_bytes
+        return {'messages': messages, 'renders': renders, 'engine': history}
+    
+    def usage(self, image_store):
+        """held() plus the stored images the history shows, which may be shared with other sessions"""
+        images = sum(len(image_store.cache.peek(ref) or b'')
+                     for ref in {m["image_ref"] for m in self.messages if "image_ref" in m})
+        return {**self.held(), 'images': images}
+    
+    def compact(self, image_store):
+        """Keep the text, drop what can be rebuilt or lives elsewhere; returns estimated bytes freed.
+        
+        Finished renders move into the history, their image into the shared bounded store and
+        their preview frames away; the engine keeps only its last few turns."""
+        freed = 0
+        for pending in [p for p in self.render_jobs if p['job'].state in ('done', 'failed')]:
+            job = pending['job']
+            freed += encoded_size(job.frames)
+            self.render_jobs.remove(pending)
+            self.messages.append(finished_image_message(job, image_store))
+        engine = self.engine()
+        if engine is not None:
+            freed += engine.memory.compact(keep=COMPACT_KEEP_TURNS)
+            freed += engine.clear_turn_metrics()
+        self.audio_requested.clear()
+        self.status = 'compacted'
+        return freed
+    
+    def evict(self, image_store):
+        """Clear the conversation, leaving a note for when the user comes back; returns estimated bytes freed"""
+        freed = sum(self.held().values())
+        self.render_jobs.clear()
+        self.audio_requested.clear()
+        self.messages.clear()
+        self.messages.append({"role": "assistant", "content": EVICTED_NOTICE})
+        engine = self.engine()
+        if engine is not None:
+            engine.memory.compact(keep=0)
+            engine.clear_turn_metrics()
+        self.status = 'evicted'
+        return freed
+
+class SessionRegistry:
+    """Process-wide index of live sessions for memory accounting and idle-session reaping.
+    
+    Sweeps piggyback on script runs, at most once per sweep_interval. They only touch
+    sessions idle for at least SESSION_PRESSURE_MIN_IDLE, which have no script running."""
+    def __init__(self, image_store, idle_ttl=SESSION_IDLE_TTL, evict_ttl=SESSION_EVICT_TTL,
+                 ceiling=SESSION_MEMORY_CEILING, sweep_interval=SESSION_SWEEP_INTERVAL,
+                 max_reclaim=SESSION_SWEEP_MAX_RECLAIM):
+        self.image_store = image_store
+        self.idle_ttl = idle_ttl
+        self.evict_ttl = evict_ttl
+        self.ceiling = ceiling
+        self.sweep_interval = sweep_interval
+        self.max_reclaim = max_reclaim
+        self.sessions = {}
+        self.counts = {'compacted': 0, 'evicted': 0, 'pressure sweeps': 0}
+        self.last_sweep = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def touch(self, state):
+        """Register or refresh the running session, sweeping the others when one is due"""
+        session_id = state['session_id']
+        now = time.monotonic()
+        with self.lock:
+            record = self.sessions.get(session_id)
+            if record is None or record.engine() is not state['engine'] or record.messages is not state['messages']:
+                record = self.sessions[session_id] = SessionRecord(
+                    session_id, state['messages'], state['render_jobs'], state['audio_requested'], state['engine'])
+            record.last_seen = now
+            record.status = 'active'
+            due = now - self.last_sweep >= self.sweep_interval
+            if due:
+                self.last_sweep = now
+        if due:
+            with trace_span("sessions.sweep"):
+                self.sweep(now)
+    
+    def live_records(self):
+        """Records of sessions Streamlit still holds, dropping the rest"""
+        with self.lock:
+            for session_id in [sid for sid, record in self.sessions.items() if record.engine() is None]:
+                del self.sessions[session_id]
+            return list(self.sessions.values())
+    
+    def sweep(self, now=None):
+        """Compact or evict idle sessions, then reclaim more while sessions hold more than the ceiling.
+        
+        Pressure is judged on the same estimates reclaiming frees, so a sweep stops once enough
+        is freed; it also stops after max_reclaim sessions, leaving the rest to later sweeps."""
+        now = time.monotonic() if now is None else now
+        records = sorted(self.live_records(), key=lambda record: record.last_seen)
+        for record in records:
+            idle = now - record.last_seen
+            if idle >= self.evict_ttl and record.status != 'evicted':
+                self._reclaim(record, 'evict', idle)
+            elif idle >= self.idle_ttl and record.status == 'active':
+                self._reclaim(record, 'compact', idle)
+        
+        if not self.ceiling:
+            return
+        held = sum(sum(record.held().values()) for record in records)
+        if held <= self.ceiling:
+            return
+        # Longest idle first: compact everything eligible before evicting anyone
+        self.counts['pressure sweeps'] += 1
+        excess = held - self.ceiling
+        reclaimed = 0
+        candidates = [record for record in records if now - record.last_seen >= SESSION_PRESSURE_MIN_IDLE]
+        for action, status in (('compact', 'active'), ('evict', 'compacted')):
+            for record in candidates:
+                if excess <= 0:
+                    return
+                if reclaimed >= self.max_reclaim:
+                    logger.info("sessions still ~%.1f MiB over the ceiling after %d reclaims; continuing next sweep",
+                                excess / 2 ** 20, reclaimed)
+                    return
+                if record.status == status:
+                    excess -= self._reclaim(record, action, now - record.last_seen)
+                    reclaimed += 1
+        if excess > 0:
+            logger.warning("sessions hold ~%.0f MiB, over the %.0f MiB ceiling, with no idle session left to reclaim",
+                           (self.ceiling + excess) / 2 ** 20, self.ceiling / 2 ** 20)
+    
+    def _reclaim(self, record, action, idle):
+        freed = record.compact(self.image_store) if action == 'compact' else record.evict(self.image_store)
+        self.counts['compacted' if action == 'compact' else 'evicted'] += 1
+        logger.info("%s session %s after %.0fs idle, ~%.1f KiB freed",
+                    "compacted" if action == 'compact' else "evicted", record.session_id[:8], idle, freed / 1024)
+        return freed
+    
+    def summary(self, current=None):
+        """Per-session usage rows, largest first, in KiB"""
+        now = time.monotonic()
+        rows = []
+        for record in self.live_records():
+            usage = record.usage(self.image_store)
+            rows.append({
+                'session': record.session_id[:8] + (" (you)" if record.session_id == current else ""),
+                'status': record.status,
+                'idle s': round(now - record.last_seen),
+                'messages': len(record.messages),
+                **{f'{kind} KiB': round(size / 1024, 1) for kind, size in usage.items()},
+                'total KiB': round(sum(usage.values()) / 1024, 1),
+            })
+        return sorted(rows, key=lambda row: row['total KiB'], reverse=True)
+
+@st.cache_resource
+def get_session_registry():
+    """Sessions of this process, for accounting and reaping"""
+    return SessionRegistry(get_image_store())
+
+# --- STREAMLIT APP ---
+HISTORY_WINDOW = int(os.environ.get("SMARTBOT_HISTORY_WINDOW", 20))  # messages rendered in full
+HISTORY_PAGE_SIZE = int(os.environ.get("SMARTBOT_HISTORY_PAGE_SIZE", 20))
+
+def render_message(idx, msg, with_audio):
+    """Render one history message; audio players are only built on request outside the window"""
+    with st.chat_message(msg["role"]):
+        st.write(msg["content"])
+        if "image_ref" in msg:
+            image_bytes = get_image_store().get(msg["image_ref"])
+            if image_bytes is not None:
+                st.image(image_bytes, caption="Generated Image", use_container_width=True)
+            else:
+                st.caption("🖼️ Image expired from cache - ask again to regenerate it")
+        # Add text-to-speech for assistant messages
+        if msg["role"] == "assistant" and "image_ref" not in msg:
+            if with_audio or idx in st.session_state.audio_requested:
+                text_to_speech_button(msg["content"])
+            elif st.button("🔊 Read aloud", key=f"tts_{idx}"):
+                st.session_state.audio_requested.add(idx)
+                text_to_speech_button(msg["content"])
+
+def render_history(messages):
+    """Render the last HISTORY_WINDOW messages; older ones load a page at a time on demand"""
+    window_start = max(0, len(messages) - HISTORY_WINDOW)
+    first = max(0, window_start - st.session_state.history_pages * HISTORY_PAGE_SIZE)
+    
+    if first > 0:
+        if st.button(f"⬆️ Show earlier messages ({first} hidden)", key="load_history"):
+            st.session_state.history_pages += 1
+            st.rerun()
+    
+    for idx in range(first, len(messages)):
+        render_message(idx, messages[idx], with_audio=idx >= window_start)
+
+@st.fragment(run_every=RENDER_POLL_INTERVAL)
+def render_pending_images():
+    """This session's pending renders; finished ones play their previews one per tick, then join the history"""
+    render_queue = get_render_queue()
+    finished = False
+    for pending in list(st.session_state.render_jobs):
+        job = pending['job']
+        state, scene = job.state, job.scene  # one read per tick, as the worker may finish mid-render
+        with st.chat_message("assistant"):
+            st.write(f"Generating: {', '.join(scene['objects'][:5])}... ({scene['time']}, {scene['weather']})")
+            if job.degraded:
+                st.caption("⚡ Busy right now, so this image renders at Flash resolution")
+            if state == 'queued':
+                st.caption(f"⏳ Waiting for a free renderer ({render_queue.position(job)} ahead)")
+                st.progress(0)
+            elif state == 'running':
+                st.caption("🎨 Creating your image...")
+                st.progress(0)
+            elif state == 'done' and PREVIEW_PACING and pending['frame'] < len(job.frames):
+                # Simulate diffusion with the precomputed low-res preview frames
+                step, steps = pending['frame'] + 1, len(job.frames)
+                st.progress(step / steps)
+                st.image(job.frames[step - 1], caption=f"Step {step}/{steps}", use_container_width=True)
+                pending['frame'] = step
+            else:
+                st.session_state.render_jobs.remove(pending)
+                st.session_state.messages.append(finished_image_message(job))
+                collect_render_trace(job)
+                finished = True
+    if finished:
+        st.rerun()
+
+WATERFALL_ROW = (
+    '<div style="display:flex;align-items:center;font-size:0.75rem;line-height:1.1rem">'
+    '<span style="width:42%;padding-left:{indent}px;white-space:nowrap;overflow:hidden">{name}</span>'
+    '<span style="flex:1;position:relative;height:0.7rem">'
+    '<span style="position:absolute;left:{left:.1f}%;width:{width:.1f}%;height:100%;background:#4a90d9"></span></span>'
+    '<span style="width:4.5rem;text-align:right">{ms:.1f} ms</span></div>'
+)
+
+def render_debug_panel():
+    """Waterfall of the last traced turn plus process-wide span and cache aggregates"""
+    trace = st.session_state.get('last_turn_trace')
+    st.markdown("#### Last turn")
+    if trace is None:
+        st.caption("Send a message to see where its time goes")
+    else:
+        st.caption(f"{trace.kind} · {trace.duration * 1000:.1f} ms total")
+        total = max(trace.duration, 1e-9)
+        rows = [WATERFALL_ROW.format(indent=depth * 10, name=name, left=start / total * 100,
+                                     width=max(duration / total * 100, 0.5), ms=duration * 1000)
+                for name, start, duration, depth in trace.waterfall()]
+        st.markdown("".join(rows), unsafe_allow_html=True)
+        if trace.counters:
+            st.caption(" · ".join(f"{name} {n}" for name, n in sorted(trace.counters.items())))
+    
+    metrics = list(st.session_state.engine.turn_metrics)[-10:]
+    if metrics:
+        st.markdown("#### Recent replies")
+        st.dataframe([{'intent': m['intent'],
+                       'first chunk ms': None if m['first_chunk'] is None else round(m['first_chunk'] * 1000, 1),
+                       'total ms': round(m['total'] * 1000, 1)} for m in reversed(metrics)], hide_index=True)
+    
+    stats = get_trace_stats()
+    st.markdown(f"#### Process ({stats.runs} traced runs)")
+    if STARTUP['first_run'] is not None:
+        st.caption(f"Cold start: module loaded in {STARTUP['module_load'] * 1000:.0f} ms, "
+                   f"first run done after {STARTUP['first_run'] * 1000:.0f} ms")
+    st.dataframe(stats.summary(), hide_index=True)
+    caches = [
+        ('audio', get_audio_cache()),
+        ('search', get_search_service().cache),
+        ('layers', get_layer_cache()),
+        ('sprites', get_sprite_cache()),
+        ('images', get_image_cache()),
+        ('history images', get_image_store().cache),
+    ]
+    st.dataframe([{'cache': name, 'hits': cache.hits, 'misses': cache.misses} for name, cache in caches],
+                 hide_index=True)
+    st.markdown("#### Render queue")
+    st.dataframe([{'metric': name, 'value': value} for name, value in get_render_queue().stats().items()],
+                 hide_index=True)
+    
+    registry = get_session_registry()
+    rows = registry.summary(current=st.session_state.session_id)
+    st.markdown(f"#### Sessions ({len(rows)})")
+    own = sum(row['messages KiB'] + row['renders KiB'] + row['engine KiB'] for row in rows)  # images: once, below
+    st.caption(f"~{own / 1024:.1f} MiB held by sessions"
+               + (f" (ceiling {registry.ceiling / 2 ** 20:.0f} MiB)" if registry.ceiling else "") + " · "
+               f"image store {get_image_store().cache.size / 2 ** 20:.1f} MiB shared · "
+               f"process RSS {process_rss() / 2 ** 20:.0f} MiB · "
+               + " · ".join(f"{name} {n}" for name, n in registry.counts.items()))
+    st.dataframe(rows, hide_index=True)
+
+def main(script_start=None):
+    """Run the app once; script_start is when the entry script began executing, for startup timing"""
+    main_start = time.perf_counter()
+    
+    # Trace this run when tracing is on for the process or the session's debug panel is open
+    show_debug = DEBUG_PANEL and st.session_state.get('debug_panel', False)
+    trace = start_trace(start=script_start) if TRACE_ENABLED or show_debug else None
+    if trace is not None and script_start is not None:
+        trace.add_span("startup", script_start, main_start)
+    
+    configure_page()
+    
+    # Sidebar
+    with st.sidebar:
+        st.header("⚙️ Model Configuration")
+        model = st.radio(
+            "Select Model:",
+            ("SmartBot 1.1 Flash", "SmartBot 1.2 Pro"),
+            index=1
+        )
+        
+        st.markdown("---")
+        st.markdown("### Model Features")
+        if "Flash" in model:
+            st.info("**Speed**: Ultra-fast\n\n**Reasoning**: Basic\n\n**Images**: Quick render")
+        else:
+            st.success("**Speed**: Optimized\n\n**Reasoning**: Advanced with web search\n\n**Images**: High quality")
+        
+        st.markdown("---")
+        st.markdown("### Image Seed")
+        seed = st.number_input("Seed", min_value=0, value=0, step=1,
+                               help="0 derives the seed from the prompt, so the same prompt gives the same image")
+        seed = seed or None
+        
+        st.markdown("---")
+        st.markdown("### Voice Input")
+        st.caption("Use 'Read Aloud' button on responses to hear them spoken")
+        
+        if DEBUG_PANEL:
+            st.markdown("---")
+            st.toggle("🛠️ Debug panel", key="debug_panel", help="Time each stage of a turn and show cache hits")
+            debug_slot = st.container()
+    
+    # Header
+    st.title("🤖 SmartBot AI")
+    st.caption(f"Powered by {model} | Advanced Reasoning & Image Generation")
+    
+    # Initialize session
+    if 'messages' not in st.session_state:
+        st.session_state.messages = []
+    if 'engine' not in st.session_state:
+        st.session_state.engine = SmartChatEngine()
+    if 'history_pages' not in st.session_state:
+        st.session_state.history_pages = 0
+    if 'audio_requested' not in st.session_state:
+        st.session_state.audio_requested = set()
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    if 'render_jobs' not in st.session_state:
+        st.session_state.render_jobs = []
+    get_session_registry().touch(st.session_state)
+    
+    # Display chat history
+    with trace_span("history"):
+        render_history(st.session_state.messages)
+    
+    # Chat input at bottom
+    user_input = st.chat_input("Ask anything or request an image...")
+    
+    # Process input
+    if user_input:
+        # Add user message
+        st.session_state.messages.append({"role": "user", "content": user_input})
+        
+        with st.chat_message("user"):
+            st.write(user_input)
+        
+        # Route the message once: image generation or chat
+        model_type = "Pro" if "Pro" in model else "Flash"
+        with trace_span("route"):
+            intent = get_intent_router().route(user_input, model_type)
+        is_image = intent == 'image'
+        if trace is not None:
+            trace.kind = intent
+        
+        if is_image:
+            # Image generation: parse here, render on the shared worker pool and poll for the result
+            width, height = PRO_RESOLUTION if model_type == "Pro" else FLASH_RESOLUTION
+            steps = PRO_STEPS if model_type == "Pro" else FLASH_STEPS
+            with trace_span("parse_prompt"):
+                scene = ImageRenderer(width, height).parse_prompt(user_input)
+            
+            render_queue = get_render_queue()
+            try:
+                with trace_span("render.submit"):
+                    job = render_queue.submit(st.session_state.session_id, scene, width, height, seed=seed,
+                                              levels=steps, trace=trace)
+                st.session_state.render_jobs.append({'job': job, 'frame': 0})
+            except render_queue.Rejected as e:
+                response = f"I can't start another image right now: {e}. Please try again in a moment."
+                with st.chat_message("assistant"):
+                    st.write(response)
+                st.session_state.messages.append({"role": "assistant", "content": response})
+        else:
+            # Chat response
+            with st.chat_message("assistant"):
+                with st.spinner(f"{model} thinking..."):
+                    # Speech for each finished chunk starts while the rest of the reply streams in
+                    stream = st.session_state.engine.respond_stream(user_input, model_type, intent=intent)
+                    with trace_span("respond"):
+                        response = st.write_stream(get_speech_synthesizer().submit_stream(stream))
+                    st.session_state.messages.append({"role": "assistant", "content": response})
+                    
+                    # Add read aloud button; the first chunk is playable before the rest is ready
+                    with trace_span("tts"):
+                        text_to_speech_button(response)
+    
+    # Images still rendering poll from a fragment, so waiting never blocks the rest of the page
+    if st.session_state.render_jobs:
+        render_pending_images()
+    
+    if STARTUP['first_run'] is None:
+        STARTUP['first_run'] = time.perf_counter() - MODULE_LOAD_START
+        logger.info("cold start: module loaded in %.1f ms, first run finished %.1f ms after load start",
+                    STARTUP['module_load'] * 1000, STARTUP['first_run'] * 1000)
+    
+    trace = finish_trace()
+    if trace is not None and trace.kind != "rerun":
+        st.session_state.last_turn_trace = trace
+    if show_debug:
+        with debug_slot:
+            render_debug_panel()
+
+# Seconds spent executing this module, and from then to the end of the first run in this process
+STARTUP = {'module_load': time.perf_counter() - MODULE_LOAD_START, 'first_run': None}
+
+if __name__ == "__main__":
+    # Running app.py directly re-executes the whole module on every rerun; streamlit_app.py avoids that
+    main(script_start=MODULE_LOAD_START)
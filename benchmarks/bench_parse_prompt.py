@@ -0,0 +1,67 @@
+"""Micro-benchmark: compiled KeywordMatcher vs the old per-keyword substring scan.
+
+Usage: python benchmarks/bench_parse_prompt.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import OBJECTS, COLORS, ImageRenderer, get_scene_matcher
+
+SHORT_PROMPT = "a red car near a house at sunset"
+LONG_PROMPT = " ".join([
+    "Generate a giant sweeping landscape with snowy mountains, a frozen lake,",
+    "a lighthouse on a cliff, boats and ships in the ocean, dolphins and whales,",
+    "a castle with towers, a village with houses and a church, a farm with cows,",
+    "sheep, horses and chickens, a forest of pine trees, palm trees on the beach,",
+    "a rainbow, northern lights, stars and the moon at night, plus a dragon.",
+] * 8)
+
+def legacy_parse(prompt):
+    """The pre-matcher implementation: one substring scan per keyword"""
+    prompt_lower = prompt.lower()
+    scene = {'objects': [], 'colors': [], 'time': 'day', 'weather': 'clear'}
+    for obj, keywords in OBJECTS.items():
+        if any(kw in prompt_lower for kw in keywords):
+            scene['objects'].append(obj)
+    for color in COLORS:
+        if color in prompt_lower:
+            scene['colors'].append(color)
+    if 'night' in prompt_lower:
+        scene['time'] = 'night'
+    elif 'sunset' in prompt_lower or 'dusk' in prompt_lower:
+        scene['time'] = 'sunset'
+    elif 'sunrise' in prompt_lower or 'dawn' in prompt_lower:
+        scene['time'] = 'sunrise'
+    if 'rain' in prompt_lower:
+        scene['weather'] = 'rainy'
+    elif 'snow' in prompt_lower:
+        scene['weather'] = 'snowy'
+    elif 'storm' in prompt_lower:
+        scene['weather'] = 'stormy'
+    if not scene['objects']:
+        scene['objects'] = ['tree', 'mountain', 'cloud']
+    return scene
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    
+    renderer = ImageRenderer(800, 600)
+    get_scene_matcher()  # build outside the timed region
+    
+    print(f"{'prompt':<8}{'chars':>7}{'legacy us':>12}{'matcher us':>12}{'speedup':>9}")
+    for name, prompt in (("short", SHORT_PROMPT), ("long", LONG_PROMPT)):
+        legacy = min(timeit.repeat(lambda: legacy_parse(prompt), number=args.repeat, repeat=5)) / args.repeat
+        compiled = min(timeit.repeat(lambda: renderer.parse_prompt(prompt), number=args.repeat, repeat=5)) / args.repeat
+        print(f"{name:<8}{len(prompt):>7}{legacy * 1e6:>12.1f}{compiled * 1e6:>12.1f}{legacy / compiled:>8.1f}x")
+    
+    old, new = legacy_parse(LONG_PROMPT)['objects'], renderer.parse_prompt(LONG_PROMPT)['objects']
+    print(f"false hits removed on long prompt: {sorted(set(old) - set(new))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Startup benchmark: cold import cost and per-rerun overhead of each Streamlit entry point.
+
+Every measurement runs in a fresh interpreter so nothing is already imported or cached.
+Per-rerun overhead is timed with Streamlit's AppTest harness on an idle page (no chat
+input), which is what every widget interaction costs before any real work happens.
+
+Usage: python benchmarks/bench_startup.py [-n REPEATS] [--reruns N] [-o OUT.json] [--compare BASE.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from reporting import ROOT, compare, summarize, write_results
+
+COLD_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import streamlit
+streamlit_done = time.perf_counter()
+import app
+done = time.perf_counter()
+print(json.dumps({
+    'streamlit': streamlit_done - start,
+    'app': done - streamlit_done,
+    'module_body': app.STARTUP['module_load'],
+    'lazy_loaded': sorted(name for name in ('gtts', 'numpy', 'PIL.Image') if name in sys.modules),
+}))
+"""
+
+RERUNS = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+reruns = []
+for _ in range(int(sys.argv[2])):
+    start = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - start)
+print(json.dumps({'first': first, 'reruns': reruns}))
+"""
+
+ENTRY_POINTS = ("streamlit_app.py", "app.py")
+
+def run_snippet(code, *args):
+    """Run code in a fresh interpreter from the repo root and parse the JSON it prints last"""
+    completed = subprocess.run([sys.executable, "-c", code, *args], cwd=ROOT, capture_output=True, text=True,
+                               check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--repeats", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--reruns", type=int, default=20, help="idle reruns timed per interpreter")
+    parser.add_argument("-o", "--output", help="JSON results path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="print p50 changes against an earlier results file")
+    args = parser.parse_args()
+    
+    samples = {}
+    lazy_loaded = set()
+    for _ in range(args.repeats):
+        cold = run_snippet(COLD_IMPORT)
+        samples.setdefault("startup/import-streamlit", []).append(cold['streamlit'])
+        samples.setdefault("startup/import-app", []).append(cold['app'])
+        samples.setdefault("startup/module-body", []).append(cold['module_body'])
+        lazy_loaded.update(cold['lazy_loaded'])
+        for entry in ENTRY_POINTS:
+            runs = run_snippet(RERUNS, entry, str(args.reruns))
+            samples.setdefault(f"startup/first-run/{entry}", []).append(runs['first'])
+            samples.setdefault(f"startup/rerun/{entry}", []).extend(runs['reruns'])
+    
+    results = {}
+    print(f"{'benchmark':<34}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, durations in samples.items():
+        results[name] = summarize(durations)
+        print(f"{name:<34}{results[name]['p50_ms']:>10.3f}{results[name]['p95_ms']:>10.3f}")
+    print(f"\nheavy modules loaded by 'import app': {', '.join(sorted(lazy_loaded)) or 'none'}")
+    
+    write_results(args.output, results, repeats=args.repeats, reruns=args.reruns)
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Local stand-ins for external services, used by the benchmarks and the load test."""
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app import OfflineTTSBackend
+
+class FakeSearchServer:
+    """DuckDuckGo Instant Answer stand-in on 127.0.0.1 with configurable latency and failures"""
+    def __init__(self, latency=0.0, failure_rate=0.0, empty_rate=0.0, seed=0, port=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.empty_rate = empty_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+    
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/"
+    
+    def _handler(self):
+        fake = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+            disable_nagle_algorithm = True  # headers and body go out in separate writes
+            
+            def do_GET(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get('q', [''])[0]
+                with fake.lock:
+                    fake.requests += 1
+                    roll = fake.rng.random()
+                if fake.latency:
+                    time.sleep(fake.latency)
+                
+                if roll < fake.failure_rate:
+                    status, payload = 500, {}
+                elif roll < fake.failure_rate + fake.empty_rate:
+                    status, payload = 200, {'Abstract': '', 'RelatedTopics': []}
+                else:
+                    status, payload = 200, {'Abstract': f"Stand-in answer about {query}."}
+                
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        return Handler
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+
+class FakeTTSBackend(OfflineTTSBackend):
+    """Offline synthesizer with configurable latency and a failure rate"""
+    name = "fake"
+    
+    def __init__(self, delay=0.0, failure_rate=0.0, seed=0):
+        super().__init__(delay=delay)
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+    
+    def synthesize(self, text, lang='en', slow=False):
+        with self.lock:
+            fail = self.rng.random() < self.failure_rate
+        if fail:
+            if self.delay:
+                time.sleep(self.delay)
+            raise RuntimeError("fake TTS failure")
+        return super().synthesize(text, lang=lang, slow=slow)
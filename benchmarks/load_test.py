@@ -0,0 +1,229 @@
+"""Load test: many concurrent headless sessions mixing chat, search, Pro reasoning and image turns.
+
+Each simulated session is a Streamlit AppTest driving streamlit_app.py on its own thread,
+so sessions share the process-wide caches, pools and executors just as browser sessions
+do. Web search and speech go to local fakes with configurable latency and failure rates.
+Image turns render on the app's background queue, so a turn is timed until its image has
+landed in the history, polling the way the browser's fragment timer does.
+Reports throughput, per-turn-type latency percentiles, render queue metrics and process RSS over time.
+
+Usage: python benchmarks/load_test.py [-s SESSIONS] [-t TURNS] [--mix chat=4,search=2,reasoning=2,image=2]
+"""
+import argparse
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+from reporting import ROOT, compare, percentile, summarize, write_results
+
+sys.path.insert(0, ROOT)
+
+TOPICS = ["volcanoes", "the moon landing", "jazz", "honeybees", "the roman empire", "black holes", "coral reefs",
+          "chess openings", "the printing press", "glaciers", "origami", "tides", "penguins", "the silk road"]
+PEOPLE = ["ada lovelace", "alan turing", "marie curie", "nikola tesla", "grace hopper", "rosalind franklin",
+          "isaac newton", "katherine johnson", "charles darwin", "hedy lamarr"]
+SCENE_OBJECTS = ["house", "castle", "car", "boat", "tree", "mountain", "lake", "dog", "cat", "bird", "flower",
+                 "lighthouse", "rainbow", "cloud", "bridge", "airplane"]
+SMALL_TALK = ["hello", "hey there", "tell me something nice", "that sounds great", "I had a long day",
+              "what can you do", "thanks a lot"]
+
+def make_prompt(turn_type, rng):
+    """A prompt for one turn type; pools are small enough that caches see both hits and misses"""
+    if turn_type == 'chat':
+        return rng.choice(SMALL_TALK)
+    if turn_type == 'search':
+        return f"who is {rng.choice(PEOPLE)}" if rng.random() < 0.5 else f"where is {rng.choice(TOPICS)} {rng.randint(1, 20)}"
+    if turn_type == 'reasoning':
+        return f"why does {rng.choice(TOPICS)} matter {rng.randint(1, 20)}"
+    objects = " and ".join(rng.sample(SCENE_OBJECTS, rng.randint(2, 5)))
+    time_of_day = rng.choice(["", "at night ", "at sunset ", "at sunrise "])
+    weather = rng.choice(["", "in the rain", "in the snow"])
+    return f"draw a {objects} {time_of_day}{weather}".strip()
+
+def parse_mix(value):
+    """'chat=4,search=2' -> {'chat': 4.0, 'search': 2.0}"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ('chat', 'search', 'reasoning', 'image'):
+            raise argparse.ArgumentTypeError(f"unknown turn type {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_mb():
+    """Current resident set size in MiB, as the app's session accounting measures it"""
+    import app  # imported by main() once the environment is configured
+    return app.process_rss() / 2 ** 20
+
+class RSSSampler(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+        self.start_time = time.perf_counter()
+    
+    def run(self):
+        while True:
+            self.samples.append((time.perf_counter() - self.start_time, rss_mb()))
+            if self.stopped.wait(self.interval):
+                break
+    
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.samples.append((time.perf_counter() - self.start_time, rss_mb()))
+
+def share_test_runtime():
+    """Make concurrent AppTest runs safe: each run installs a mock Runtime and clears it when done,
+    which pulls the runtime out from under runs still executing on other threads. Runs also toggle the
+    global.appTest option, so one finishing can stop another recording widget metadata; pin it on."""
+    from unittest.mock import MagicMock
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.dataframe_source_mgr = DataframeSourceManager()
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared)
+    Runtime.exists = classmethod(lambda cls: True)
+    config.set_option("global.appTest", True)
+
+def run_session(index, args, mix, records, errors, lock):
+    """One simulated user: open the app, then send args.turns messages"""
+    from streamlit.testing.v1 import AppTest
+    
+    rng = random.Random(args.seed * 100003 + index)
+    time.sleep(rng.uniform(0, args.ramp_up))
+    at = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=args.timeout)
+    at.run()
+    types, weights = zip(*mix.items())
+    for _ in range(args.turns):
+        turn_type = rng.choices(types, weights)[0]
+        prompt = make_prompt(turn_type, rng)
+        start = time.perf_counter()
+        error = None
+        try:
+            at.chat_input[0].set_value(prompt).run()
+            while not at.exception and at.session_state.render_jobs:
+                time.sleep(args.poll_interval)
+                at.run()
+            if at.exception:
+                error = at.exception[0].message
+        except Exception as e:
+            error = repr(e)
+        elapsed = time.perf_counter() - start
+        with lock:
+            records.append((turn_type, elapsed, error is None))
+            if error is not None:
+                errors.append(f"{turn_type} {prompt!r}: {error}")
+        if args.think_time:
+            time.sleep(rng.uniform(0, 2 * args.think_time))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-s", "--sessions", type=int, default=50)
+    parser.add_argument("-t", "--turns", type=int, default=5, help="messages per session")
+    parser.add_argument("--mix", type=parse_mix, default="chat=4,search=2,reasoning=2,image=2",
+                        help="relative weights of chat, search, reasoning and image turns")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="spread session starts over this many seconds")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a session's turns")
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--search-failure-rate", type=float, default=0.05)
+    parser.add_argument("--tts-delay", type=float, default=0.2, help="fake synthesis time per chunk")
+    parser.add_argument("--tts-failure-rate", type=float, default=0.05)
+    parser.add_argument("--pacing", action="store_true", help="keep the artificial image preview delays")
+    parser.add_argument("--poll-interval", type=float,
+                        help="seconds between polls for a pending image (default: the app's fragment interval)")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds before a single turn counts as hung")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="RSS sampling period in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="JSON results path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="print p50 changes against an earlier results file")
+    args = parser.parse_args()
+    
+    # Configuration read at import time has to be in place before app is first imported
+    port = free_port()
+    os.environ["SMARTBOT_SEARCH_URL"] = f"http://127.0.0.1:{port}/"
+    if not args.pacing:
+        os.environ["SMARTBOT_PREVIEW_PACING"] = "0"
+    from streamlit import logger as streamlit_logger
+    import app
+    from fakes import FakeSearchServer, FakeTTSBackend
+    
+    streamlit_logger.set_log_level("error")
+    app.logger.setLevel("ERROR")
+    app.TTS_BACKENDS['fake'] = lambda: FakeTTSBackend(delay=args.tts_delay, failure_rate=args.tts_failure_rate,
+                                                      seed=args.seed)
+    app.TTS_BACKEND = 'fake'
+    share_test_runtime()
+    args.poll_interval = args.poll_interval or app.RENDER_POLL_INTERVAL
+    
+    records = []
+    error_messages = []
+    lock = threading.Lock()
+    search = FakeSearchServer(latency=args.search_latency, failure_rate=args.search_failure_rate,
+                              seed=args.seed, port=port)
+    with search:
+        sampler = RSSSampler(args.sample_interval)
+        sampler.start()
+        start = time.perf_counter()
+        sessions = [threading.Thread(target=run_session, args=(i, args, args.mix, records, error_messages, lock), daemon=True)
+                    for i in range(args.sessions)]
+        for session in sessions:
+            session.start()
+        for session in sessions:
+            session.join()
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+    
+    errors = sum(not ok for _, _, ok in records)
+    print(f"{args.sessions} sessions, {len(records)} turns in {elapsed:.1f}s: "
+          f"{len(records) / elapsed:.1f} turns/sec, {errors} errors, {search.requests} upstream searches")
+    print(f"\n{'turn type':<12}{'turns':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    results = {}
+    for turn_type in args.mix:
+        durations = [d for t, d, _ in records if t == turn_type]
+        if not durations:
+            continue
+        failed = sum(not ok for t, _, ok in records if t == turn_type)
+        results[f"load/{turn_type}"] = dict(summarize(durations), p99_ms=percentile(durations, 99) * 1000,
+                                            max_ms=max(durations) * 1000, errors=failed)
+        r = results[f"load/{turn_type}"]
+        print(f"{turn_type:<12}{len(durations):>7}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}{failed:>8}")
+    
+    for message in sorted(set(error_messages))[:5]:
+        print(f"  error: {message[:200]}")
+    
+    queue_stats = app.get_render_queue().stats()
+    print("\nrender queue: " + ", ".join(f"{name} {value}" for name, value in queue_stats.items()))
+    
+    samples = sampler.samples
+    step = max(1, len(samples) // 12)
+    print("\nRSS MiB over time: " + ", ".join(f"{t:.0f}s {mb:.0f}" for t, mb in samples[::step] + samples[-1:]))
+    print(f"peak RSS {max(mb for _, mb in samples):.0f} MiB")
+    
+    write_results(args.output, results, sessions=args.sessions, turns=args.turns, mix=args.mix,
+                  wall_seconds=elapsed, turns_per_second=len(records) / elapsed, errors=errors,
+                  search_latency=args.search_latency, search_failure_rate=args.search_failure_rate,
+                  tts_delay=args.tts_delay, tts_failure_rate=args.tts_failure_rate,
+                  render_queue=queue_stats, rss_mb=[(round(t, 2), round(mb, 1)) for t, mb in samples])
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
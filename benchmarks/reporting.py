@@ -0,0 +1,56 @@
+"""Shared helpers for benchmark scripts: percentiles and JSON results that can be compared across runs."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(samples):
+    """p50/p95/mean in milliseconds for a list of durations in seconds"""
+    return {
+        'iterations': len(samples),
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'mean_ms': statistics.fmean(samples) * 1000,
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_results(output, results, **meta):
+    """Save results with run metadata; output defaults to benchmarks/results/<timestamp>.json"""
+    output = output or os.path.join(ROOT, "benchmarks", "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                **meta,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"\nresults written to {output}")
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)['results']
+    print(f"\n{'benchmark':<34}{'base p50':>10}{'p50':>10}{'change':>9}")
+    for name, result in results.items():
+        if name in baseline:
+            before, after = baseline[name]['p50_ms'], result['p50_ms']
+            print(f"{name:<34}{before:>10.3f}{after:>10.3f}{(after - before) / before * 100:>+8.1f}%")
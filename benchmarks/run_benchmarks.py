@@ -0,0 +1,145 @@
+"""Benchmark suite for SmartBot's hot paths: prompt parsing, rendering, chat responses and speech.
+
+External services are replaced by local fakes (benchmarks/fakes.py), so results
+only reflect SmartBot's own code. Each benchmark reports p50/p95 latency and the
+tracemalloc peak of a single call; results are written as JSON so runs can be
+compared across commits.
+
+Usage: python benchmarks/run_benchmarks.py [-n ITERATIONS] [-k FILTER] [-o OUT.json] [--compare BASE.json]
+"""
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+
+from reporting import ROOT, compare, summarize, write_results
+
+sys.path.insert(0, ROOT)
+
+from streamlit import logger as streamlit_logger
+
+from app import (
+    AudioCache, ConversationMemory, ImageRenderer, SearchService, SmartChatEngine, SpeechSynthesizer,
+    get_intent_router, get_knowledge_base, get_scene_matcher,
+)
+from bench_parse_prompt import LONG_PROMPT, SHORT_PROMPT
+from fakes import FakeSearchServer, FakeTTSBackend
+
+RESOLUTIONS = {'flash': (512, 384), 'pro': (800, 600)}
+
+SCENE_PROMPTS = {
+    'busy-day': "a city with a house, a castle, a bridge, a car, a bus, a boat, trees, flowers, "
+                "a dog, a cat, birds, a river, mountains and clouds",
+    'night-rain': "a rainy night over a village with houses, a lighthouse, a ship, a forest of trees, "
+                  "a road, cars and the moon",
+    'snowy-sunset': "a snowy sunset with mountains, a lake, a cabin, pine trees, deer, a bear and a rainbow",
+}
+
+# (name, model, input); '{i}' makes every iteration a distinct, uncached turn
+CHAT_TURNS = [
+    ('greeting', 'Flash', "hello there"),
+    ('identity', 'Flash', "who are you"),
+    ('capabilities', 'Flash', "what can you do"),
+    ('search-kb', 'Flash', "what is quantum computing"),
+    ('search-web-cold', 'Flash', "who is benchmark person {i}"),
+    ('search-web-warm', 'Flash', "who is the benchmark person"),
+    ('reasoning-kb', 'Pro', "why is renewable energy important"),
+    ('reasoning-web', 'Pro', "why do benchmarks vary {i}"),
+    ('chat', 'Flash', "tell me something nice"),
+]
+
+SPEECH_TEXT = ("**Here's what I know:** renewable energy comes from sources that are naturally replenished, "
+               "such as sunlight, wind, rain, tides and geothermal heat. ") * 3
+
+def measure(fn, iterations, warmup):
+    """Wall-clock seconds for each call of fn(i), after warmup calls"""
+    for i in range(warmup):
+        fn(-1 - i)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def peak_memory(fn, i):
+    """tracemalloc peak of a single call, measured separately so tracing doesn't skew the timings"""
+    tracemalloc.start()
+    try:
+        fn(i)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def parse_benchmarks():
+    renderer = ImageRenderer(*RESOLUTIONS['pro'])
+    get_scene_matcher()
+    for name, prompt in (('short', SHORT_PROMPT), ('long', LONG_PROMPT)):
+        yield f"parse_prompt/{name}", lambda i, prompt=prompt: renderer.parse_prompt(prompt)
+
+def render_benchmarks():
+    for resolution, (width, height) in RESOLUTIONS.items():
+        renderer = ImageRenderer(width, height)
+        for name, prompt in SCENE_PROMPTS.items():
+            scene = renderer.parse_prompt(prompt)
+            # a new seed per call re-randomizes object placement; static layers stay cached as in production
+            yield f"render/{resolution}/{name}", lambda i, r=renderer, s=scene: r.render(s, seed=i)
+        scene = renderer.parse_prompt(SCENE_PROMPTS['busy-day'])
+        yield (f"render+png/{resolution}/busy-day",
+               lambda i, r=renderer, s=scene: r.render(s, seed=i).save(io.BytesIO(), format="PNG"))
+
+def respond_benchmarks(search_url):
+    router = get_intent_router()
+    get_knowledge_base()
+    service = SearchService(base_url=search_url)
+    for name, model, template in CHAT_TURNS:
+        def turn(i, model=model, template=template):
+            engine = SmartChatEngine(search_service=service, memory=ConversationMemory(log_dir=None))
+            user_input = template.format(i=i)
+            return engine.respond(user_input, model, intent=router.route(user_input, model))
+        yield f"respond/{name}", turn
+
+def speech_benchmarks(tts_delay):
+    synthesizer = SpeechSynthesizer(FakeTTSBackend(delay=tts_delay), AudioCache(disk_dir=None))
+    def speak(text):
+        clips = [future.result() for future in synthesizer.submit_text(text)]
+        return synthesizer.backend.join(clips)
+    yield "speech/cold", lambda i: speak(f"Reply number {i}. {SPEECH_TEXT}")
+    yield "speech/cached", lambda i: speak(SPEECH_TEXT)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("-o", "--output", help="JSON results path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="print p50 changes against an earlier results file")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="fake search server delay in seconds")
+    parser.add_argument("--tts-delay", type=float, default=0.0, help="fake synthesizer delay per chunk in seconds")
+    args = parser.parse_args()
+    
+    streamlit_logger.set_log_level("error")
+    results = {}
+    with FakeSearchServer(latency=args.search_latency) as search_server:
+        suites = (parse_benchmarks(), render_benchmarks(), respond_benchmarks(search_server.url),
+                  speech_benchmarks(args.tts_delay))
+        print(f"{'benchmark':<34}{'p50 ms':>10}{'p95 ms':>10}{'peak KiB':>10}")
+        for suite in suites:
+            for name, fn in suite:
+                if args.filter not in name:
+                    continue
+                samples = measure(fn, args.iterations, args.warmup)
+                peak = peak_memory(fn, args.iterations)
+                results[name] = dict(summarize(samples), peak_kib=peak / 1024)
+                r = results[name]
+                print(f"{name:<34}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['peak_kib']:>10.1f}")
+    
+    write_results(args.output, results, iterations=args.iterations, search_latency=args.search_latency,
+                  tts_delay=args.tts_delay)
+    
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Headless batch renderer for SmartBot image prompts.
+
+Renders prompts from a file (or stdin) across a process pool without starting
+the Streamlit UI, e.g. to pre-warm popular prompts or to produce reference
+images for visual regression tests.
+
+    python render_batch.py prompts.txt --resolution flash --resolution pro -o out/
+    cat prompts.txt | python render_batch.py - --tar renders.tar --seed 7
+"""
+import argparse
+import io
+import os
+import re
+import sys
+import tarfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from streamlit import logger as streamlit_logger
+
+from app import ImageRenderer
+
+RESOLUTIONS = {
+    'flash': (512, 384),
+    'pro': (800, 600),
+}
+
+def parse_resolution(value):
+    """'flash', 'pro' or WIDTHxHEIGHT"""
+    if value.lower() in RESOLUTIONS:
+        return RESOLUTIONS[value.lower()]
+    match = re.fullmatch(r"(\d+)x(\d+)", value.lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected flash, pro or WIDTHxHEIGHT, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+def read_prompts(source):
+    """Non-empty, non-comment lines from a path or '-' for stdin"""
+    f = sys.stdin if source == '-' else open(source, encoding="utf-8")
+    with f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def quiet_streamlit():
+    """Silence Streamlit's 'missing ScriptRunContext' warnings, which are expected when running headless"""
+    streamlit_logger.set_log_level("error")
+
+def render_job(job):
+    """Worker entry point: render one prompt and return its encoded bytes"""
+    index, prompt, width, height, seed, image_format = job
+    renderer = ImageRenderer(width, height)
+    scene = renderer.parse_prompt(prompt)
+    buffer = io.BytesIO()
+    renderer.render(scene, seed).save(buffer, format=image_format)
+    return index, prompt, buffer.getvalue()
+
+def output_name(index, prompt, width, height, image_format):
+    slug = re.sub(r'[^a-z0-9]+', '-', prompt.lower()).strip('-')[:48] or "prompt"
+    return f"{index:04d}-{slug}-{width}x{height}.{image_format.lower()}"
+
+class DirectoryWriter:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+    
+    def write(self, name, data):
+        with open(os.path.join(self.path, name), "wb") as f:
+            f.write(data)
+    
+    def close(self):
+        pass
+
+class TarWriter:
+    def __init__(self, path):
+        self.tar = tarfile.open(path, "w")
+    
+    def write(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.tar.addfile(info, io.BytesIO(data))
+    
+    def close(self):
+        self.tar.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render SmartBot image prompts headlessly in parallel.")
+    parser.add_argument("prompts", help="file with one prompt per line, or - for stdin")
+    parser.add_argument("-r", "--resolution", type=parse_resolution, action="append",
+                        help="flash, pro or WIDTHxHEIGHT; repeat for several (default: pro)")
+    parser.add_argument("-o", "--output", default="renders", help="output directory (default: renders)")
+    parser.add_argument("--tar", help="write images into this tar file instead of a directory")
+    parser.add_argument("--seed", type=int, help="render seed (default: derived from each prompt)")
+    parser.add_argument("--format", default="PNG", choices=["PNG", "WEBP", "JPEG"], type=str.upper)
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args(argv)
+    
+    prompts = read_prompts(args.prompts)
+    if not prompts:
+        parser.error("no prompts to render")
+    resolutions = args.resolution or [RESOLUTIONS['pro']]
+    writer = TarWriter(args.tar) if args.tar else DirectoryWriter(args.output)
+    
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=quiet_streamlit) as pool:
+            for width, height in resolutions:
+                jobs = [(i, prompt, width, height, args.seed, args.format) for i, prompt in enumerate(prompts)]
+                total_bytes = 0
+                start = time.perf_counter()
+                # map() yields results in order as they finish, so images stream straight to the writer
+                for index, prompt, data in pool.map(render_job, jobs, chunksize=max(1, len(jobs) // (4 * args.workers))):
+                    writer.write(output_name(index, prompt, width, height, args.format), data)
+                    total_bytes += len(data)
+                elapsed = time.perf_counter() - start
+                print(f"{width}x{height}: {len(jobs)} images in {elapsed:.2f}s "
+                      f"({len(jobs) / elapsed:.1f} images/sec, {total_bytes / len(jobs) / 1024:.1f} KiB avg)")
+    finally:
+        writer.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""Streamlit entry point: streamlit run streamlit_app.py
+
+Streamlit re-executes its entry script on every rerun. Keeping that script this
+small means app.py (object tables, keyword indices, class and cached-function
+definitions) is executed once per process, on first import, rather than on
+every interaction.
+"""
+import time
+
+script_start = time.perf_counter()
+
+from app import main
+
+main(script_start=script_start)
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class SearchBackend:
+    """Keep-alive JSON server on 127.0.0.1; set .status and .payload per test, read .requests.
+    
+    .delay slows every answer down. With .drop_idle set, it closes each connection after
+    answering without saying so, as servers do when an idle keep-alive connection times out."""
+    def __init__(self):
+        self.status = 200
+        self.payload = {'Abstract': "An answer."}
+        self.requests = 0
+        self.drop_idle = False
+        self.delay = 0.0
+        self.release = threading.Event()
+        self.release.set()
+        backend = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_GET(self):
+                backend.requests += 1
+                backend.release.wait(5)
+                time.sleep(backend.delay)
+                body = json.dumps(backend.payload).encode()
+                self.send_response(backend.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                if backend.drop_idle:
+                    self.close_connection = True
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def backend():
+    server = SearchBackend()
+    yield server
+    server.close()
@@ -0,0 +1,24 @@
+import os
+
+from app import AudioCache
+
+def test_disk_tier_prunes_least_recently_used_files(tmp_path):
+    cache = AudioCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=1000)
+    keys = [AudioCache.make_key(f"chunk {i}", 'en', False) for i in range(8)]
+    for age, key in enumerate(keys[:5]):
+        cache.put(key, b"x" * 200)
+        os.utime(tmp_path / f"{key}.audio", (age, age))  # oldest first
+    assert cache.get(keys[0]) == b"x" * 200  # a disk hit makes it the most recent
+    
+    for key in keys[5:]:
+        cache.put(key, b"x" * 200)
+    
+    on_disk = {path.stem for path in tmp_path.glob("*.audio")}
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.audio")) <= 1000
+    assert cache.disk_size == 200 * len(on_disk)
+    assert keys[0] in on_disk and set(keys[5:]) <= on_disk
+    assert keys[1] not in on_disk
+
+def test_existing_files_count_against_the_budget(tmp_path):
+    AudioCache(disk_dir=str(tmp_path)).put(AudioCache.make_key("hello", 'en', False), b"x" * 300)
+    assert AudioCache(disk_dir=str(tmp_path)).disk_size == 300
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from app import CircuitBreaker, SearchService, TTLCache
+
+def make_breaker(**kwargs):
+    return CircuitBreaker(**{'failure_rate': 0.5, 'min_calls': 4, 'window': 60, 'cooldown': 0.05, **kwargs})
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        assert breaker.allow()
+        breaker.record_failure()
+
+def test_opens_once_failure_rate_is_reached():
+    breaker = make_breaker()
+    for ok in (True, False, True):
+        assert breaker.allow()
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_half_open_allows_a_single_probe():
+    breaker = make_breaker()
+    trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+def test_successful_probe_closes():
+    breaker = make_breaker()
+    trip(breaker)
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+def test_failed_probe_reopens():
+    breaker = make_breaker()
+    trip(breaker)
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_unexpected_error_releases_half_open_probe(backend):
+    breaker = make_breaker()
+    service = SearchService(base_url=backend.url, cache=TTLCache(), breaker=breaker)
+    trip(breaker)
+    time.sleep(0.06)
+    
+    def broken_fetch(query):
+        raise AttributeError("parser bug")
+    service.fetch = broken_fetch
+    assert service.search("probe") is None
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.probing
+    
+    del service.fetch
+    time.sleep(0.06)
+    assert service.search("probe again") == "An answer."
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_concurrent_identical_queries_share_one_request(backend):
+    service = SearchService(base_url=backend.url, cache=TTLCache())
+    backend.release.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.search("Same  question?", budget=5)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["An answer."] * 5
+    assert backend.requests == 1
+
+def test_budget_expiry_returns_none_and_caches_late_answer(backend):
+    service = SearchService(base_url=backend.url, cache=TTLCache())
+    backend.release.clear()
+    start = time.perf_counter()
+    assert service.search("slow question", budget=0.05) is None
+    assert time.perf_counter() - start < 1
+    
+    backend.release.set()
+    deadline = time.monotonic() + 5
+    while service.inflight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert service.search("slow question", budget=0) == "An answer."
+    assert backend.requests == 1
+
+def test_slow_answers_open_the_breaker_but_are_cached(backend):
+    breaker = make_breaker(min_calls=2, cooldown=60)
+    service = SearchService(base_url=backend.url, cache=TTLCache(), breaker=breaker, slow_call=0.05)
+    backend.delay = 0.1
+    assert service.search("slow one") == "An answer."
+    assert service.search("slow two") == "An answer."
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    assert service.search("slow one", budget=0) == "An answer."  # from the cache
+    assert service.search("slow three") is None
+    assert backend.requests == 2
@@ -0,0 +1,41 @@
+import pytest
+
+from app import ConversationMemory, SmartChatEngine
+
+@pytest.fixture
+def engine():
+    engine = SmartChatEngine(memory=ConversationMemory(log_dir=None))
+    engine.memory.add("what is quantum computing", 'search', "quantum computing")
+    return engine
+
+@pytest.mark.parametrize("text, intent", [
+    ("tell me more", 'chat'),
+    ("Tell me more about it", 'chat'),
+    ("what about it", 'search'),
+    ("why is it used?", 'reasoning'),
+    ("who invented it", 'search'),
+])
+def test_follow_ups_resolve_to_last_topic(engine, text, intent):
+    query, resolved = engine.resolve_follow_up(text, intent)
+    assert query == "quantum computing"
+    assert resolved in ('search', 'reasoning')
+
+@pytest.mark.parametrize("text, intent", [
+    ("that is so cool", 'chat'),
+    ("I love this", 'chat'),
+    ("thanks, that helps", 'chat'),
+    ("can you draw it?", 'image'),
+    ("tell me more", 'image'),
+    ("what is the capital of france", 'search'),
+])
+def test_other_messages_are_left_alone(engine, text, intent):
+    assert engine.resolve_follow_up(text, intent) == (text, intent)
+
+def test_nothing_to_follow_up_without_a_topic():
+    engine = SmartChatEngine(memory=ConversationMemory(log_dir=None))
+    assert engine.resolve_follow_up("tell me more", 'chat') == ("tell me more", 'chat')
+
+def test_turn_budget_ends_with_the_turn(engine):
+    assert engine.remaining_budget() is None
+    engine.respond("hello there", "Flash", intent='chat')
+    assert engine.remaining_budget() is None
@@ -0,0 +1,29 @@
+import pytest
+
+from app import OBJECTS, IntentRouter, KeywordMatcher
+
+@pytest.fixture(scope="module")
+def matcher():
+    return KeywordMatcher({'objects': OBJECTS})
+
+@pytest.mark.parametrize("text, expected", [
+    ("a dog in the snow", {'dog', 'snow'}),
+    ("puppies on a beach", {'dog', 'beach'}),
+    ("butterflies and dragonflies", {'butterfly', 'dragonfly'}),
+    ("wolves howling at the moon", {'wolf', 'moon'}),
+    ("men and women", {'man', 'woman'}),
+    ("children playing in a park", {'child', 'park'}),
+    ("a crowd of people", {'crowd', 'person'}),
+    ("two cities by the sea", {'city', 'ocean'}),
+    ("foxes and boxes", {'fox'}),
+    ("monkeys eating ice creams", {'monkey', 'ice cream'}),
+])
+def test_singular_and_plural_keywords_match(matcher, text, expected):
+    assert matcher.labels(text).get('objects', set()) == expected
+
+@pytest.mark.parametrize("text", ["a cathedral", "an antenna", "a scary scarf", "mankind"])
+def test_matches_respect_word_boundaries(matcher, text):
+    assert matcher.labels(text) == {}
+
+def test_router_keywords_are_not_inflected():
+    assert IntentRouter().route("whys and hows", "Pro") == 'chat'
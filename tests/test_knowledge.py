@@ -0,0 +1,66 @@
+import pytest
+
+from app import ConversationMemory, KnowledgeBase, SearchService, SmartChatEngine, TTLCache
+
+CONFIDENT = [
+    ("what is quantum computing", "Quantum computing"),
+    ("explain climate change", "Climate change"),
+    ("tell me about hydrogen fuel cells", "Hydrogen fuel cell"),
+    ("why do some countries drive on the left", "The side of the road"),
+    ("what is machine learning", "Artificial Intelligence"),
+]
+
+WEAK = [
+    "what is the weather in paris",
+    "where is the vehicle registration office",
+    "why are car batteries so heavy",
+    "how does wind affect airplanes",
+]
+
+@pytest.fixture(scope="module")
+def knowledge_base():
+    return KnowledgeBase()
+
+@pytest.mark.parametrize("query, start", CONFIDENT)
+def test_confident_matches_answer(knowledge_base, query, start):
+    assert knowledge_base.lookup(query).startswith(start)
+
+@pytest.mark.parametrize("query", WEAK)
+def test_one_shared_word_is_not_a_match(knowledge_base, query):
+    assert knowledge_base.lookup(query) is None
+    assert knowledge_base.lookup(query, min_coverage=0) is not None  # still usable as a fallback
+
+def test_unknown_terms_match_nothing(knowledge_base):
+    assert knowledge_base.lookup("zebra xylophone", min_coverage=0) is None
+
+def make_engine(backend):
+    service = SearchService(base_url=backend.url, cache=TTLCache())
+    return SmartChatEngine(search_service=service, memory=ConversationMemory(log_dir=None))
+
+def test_weak_match_searches_the_web(backend):
+    backend.payload = {'Abstract': "Mild and rainy."}
+    reply = make_engine(backend).respond("what is the weather in paris", "Flash", intent='search')
+    assert reply == "Here's what I found: Mild and rainy."
+    assert backend.requests == 1
+
+def test_confident_match_skips_the_web(backend):
+    reply = make_engine(backend).respond("what is quantum computing", "Flash", intent='search')
+    assert reply.startswith("Here's what I know: Quantum computing")
+    assert backend.requests == 0
+
+def test_weak_match_is_the_fallback_when_the_web_has_nothing(backend):
+    backend.payload = {}
+    reply = make_engine(backend).respond("how does wind affect airplanes", "Flash", intent='search')
+    assert reply.startswith("Here's what I know: Renewable energy")
+
+@pytest.mark.parametrize("query", ["why are car batteries so heavy", "how does wind affect airplanes"])
+def test_reasoning_waits_for_the_web_on_a_weak_match(backend, query):
+    backend.payload = {'Abstract': "From the web."}
+    reply = make_engine(backend).respond(query, "Pro", intent='reasoning')
+    assert "From the web." in reply
+    assert "local knowledge base" not in reply
+
+def test_reasoning_takes_a_confident_local_match(backend):
+    reply = make_engine(backend).respond("explain climate change", "Pro", intent='reasoning')
+    assert "Found a confident match in the local knowledge base" in reply
+    assert "Climate change refers to" in reply
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from app import LRUCache, RenderQueue, Trace, encoded_size
+
+SCENE = {'objects': ['house', 'tree'], 'time': 'day', 'weather': 'clear', 'colors': [], 'style': 'realistic'}
+
+def make_queue(**options):
+    pixels = lambda img: img.width * img.height * 4
+    return RenderQueue(LRUCache(1 << 24, sizeof=encoded_size), LRUCache(1 << 24, sizeof=lambda entry: pixels(entry[0])),
+                       LRUCache(1 << 24, sizeof=pixels), workers=1, **options)
+
+def wait_for(job):
+    deadline = time.monotonic() + 30
+    while job.state in ('queued', 'running') and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.state == 'done', job.error
+
+def test_rejection_is_raised_as_the_queue_attribute():
+    queue = make_queue(session_limit=0)
+    with pytest.raises(queue.Rejected):
+        queue.submit("s1", SCENE, 64, 48)
+    assert queue.stats()['rejected'] == 1
+
+def test_worker_spans_and_counters_reach_the_submitting_turn():
+    queue = make_queue()
+    turn = Trace("image")
+    job = queue.submit("s1", SCENE, 64, 48, levels=2, trace=turn)
+    wait_for(job)
+
+    assert job.trace.parent_id == turn.trace_id
+    names = {name for name, _, _, _ in job.trace.spans}
+    assert {'render.wait', 'render.compile', 'render.rasterize', 'render.encode'} <= names
+    assert job.trace.counters['image_cache.miss'] == 1
+
+    turn.duration = 0.0
+    turn.merge(job.trace)
+    assert ('render.job', 0) in {(name, depth) for name, _, _, depth in turn.spans}
+    assert all(depth >= 1 for name, _, _, depth in turn.spans if name.startswith('render.') and name != 'render.job')
+    assert turn.counters['image_cache.miss'] == 1
+    assert turn.duration >= job.trace.duration
+
+def test_untraced_jobs_leave_no_trace():
+    queue = make_queue()
+    job = queue.submit("s1", SCENE, 64, 48, levels=2)
+    wait_for(job)
+    assert job.trace is None
+
+def test_previews_are_skipped_without_pacing():
+    queue = make_queue(previews=False)
+    turn = Trace("image")
+    job = queue.submit("s1", SCENE, 64, 48, levels=2, trace=turn)
+    wait_for(job)
+    assert job.image_bytes and job.frames == []
+    assert 'preview_cache.miss' not in job.trace.counters
+    
+    queue = make_queue(previews=True)
+    job = queue.submit("s1", SCENE, 64, 48, levels=2)
+    wait_for(job)
+    assert len(job.frames) == 2
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from app import HTTPConnectionPool, SearchError, SearchService, extract_answer
+
+def test_extract_answer_rejects_non_object_json():
+    for data in ([], None, "text", 3):
+        with pytest.raises(SearchError):
+            extract_answer(data)
+
+def test_extract_answer_falls_back_to_related_topics():
+    assert extract_answer({'Abstract': '', 'RelatedTopics': [{'Text': "A topic."}]}) == "A topic."
+    assert extract_answer({'Abstract': '', 'RelatedTopics': []}) is None
+
+def test_non_object_body_is_a_search_error(backend):
+    backend.payload = []
+    service = SearchService(base_url=backend.url)
+    with pytest.raises(SearchError):
+        service.fetch("anything")
+
+def test_http_error_on_pooled_connection_is_not_retried(backend):
+    pool = HTTPConnectionPool(backend.url)
+    pool.get({'q': 'warm'})
+    assert pool.pool.qsize() == 1
+    
+    backend.status = 500
+    with pytest.raises(SearchError, match="HTTP 500"):
+        pool.get({'q': 'fails'})
+    assert backend.requests == 2
+
+def test_dropped_keep_alive_connection_is_retried_once(backend):
+    backend.drop_idle = True
+    pool = HTTPConnectionPool(backend.url)
+    pool.get({'q': 'warm'})
+    assert pool.pool.qsize() == 1
+    
+    assert pool.get({'q': 'again'}) is not None
+    assert backend.requests == 2
+
+def test_timeout_on_pooled_connection_is_not_retried(backend):
+    pool = HTTPConnectionPool(backend.url, timeout=0.5)
+    pool.get({'q': 'warm'})
+    
+    backend.release.clear()  # the upstream stops answering
+    start = time.monotonic()
+    with pytest.raises(SearchError, match="timed out"):
+        pool.get({'q': 'slow'})
+    assert time.monotonic() - start < 0.9
+    assert backend.requests == 2
@@ -0,0 +1,63 @@
+import sys
+import uuid
+
+from app import EVICTED_NOTICE, TURN_METRICS_SIZE, ImageStore, SessionRegistry, SmartChatEngine
+
+def make_session(turns=20, size=4096):
+    engine = SmartChatEngine()
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"question {i} " + "x" * size})
+        messages.append({"role": "assistant", "content": f"answer {i} " + "y" * size})
+    return {'session_id': uuid.uuid4().hex, 'messages': messages, 'render_jobs': [],
+            'audio_requested': set(), 'engine': engine}
+
+def make_registry(sessions, ceiling, max_reclaim=8):
+    registry = SessionRegistry(ImageStore(), idle_ttl=3600, evict_ttl=7200, ceiling=ceiling,
+                               sweep_interval=3600, max_reclaim=max_reclaim)
+    for state in sessions:
+        registry.touch(state)
+    return registry
+
+def held(registry):
+    return sum(sum(record.held().values()) for record in registry.live_records())
+
+def test_sessions_under_the_ceiling_are_left_alone():
+    sessions = [make_session() for _ in range(5)]
+    registry = make_registry(sessions, ceiling=64 * 1024 * 1024)  # well above what these sessions hold
+    assert held(registry) < registry.ceiling
+
+    registry.sweep(now=registry.last_sweep + 600)
+
+    assert registry.counts == {'compacted': 0, 'evicted': 0, 'pressure sweeps': 0}
+    assert all(len(state['messages']) == 40 for state in sessions)
+
+def test_pressure_reclaims_only_the_excess():
+    sessions = [make_session() for _ in range(5)]
+    registry = make_registry(sessions, ceiling=1)
+    per_session = held(registry) / 5
+    registry.ceiling = int(per_session * 3.5)
+
+    registry.sweep(now=registry.last_sweep + 600)
+
+    assert held(registry) <= registry.ceiling
+    evicted = [state for state in sessions if state['messages'][0]['content'] == EVICTED_NOTICE]
+    assert 1 <= len(evicted) < 5
+
+def test_one_sweep_reclaims_at_most_max_reclaim_sessions():
+    sessions = [make_session() for _ in range(5)]
+    registry = make_registry(sessions, ceiling=1, max_reclaim=2)
+
+    for sweeps in range(1, 6):
+        registry.sweep(now=registry.last_sweep + 600 * sweeps)
+        assert registry.counts['compacted'] + registry.counts['evicted'] == min(2 * sweeps, 10)
+    assert registry.counts['evicted'] == 5
+
+def test_turn_metric_bytes_track_the_deque():
+    engine = SmartChatEngine()
+    for i in range(TURN_METRICS_SIZE + 10):
+        list(engine.respond_stream("hello", "Flash", intent='chat'))
+    assert len(engine.turn_metrics) == TURN_METRICS_SIZE
+    assert engine.turn_metrics_bytes == sum(sys.getsizeof(metric) for metric in engine.turn_metrics)
+    assert engine.clear_turn_metrics() > 0
+    assert engine.turn_metrics_bytes == 0 and not engine.turn_metrics
@@ -0,0 +1,18 @@
+from app import AudioCache, OfflineTTSBackend, SpeechSynthesizer, clean_text_for_speech, split_into_chunks
+
+SENTENCES = [f"This is sentence number {i} of a streamed reply, long enough to fill chunks. " for i in range(12)]
+
+def test_stream_submits_finished_chunks_before_it_ends():
+    synthesizer = SpeechSynthesizer(OfflineTTSBackend(), AudioCache(disk_dir=None))
+    submitted = []
+    synthesizer.submit = lambda chunk, lang='en', slow=False: submitted.append(chunk)
+    
+    halfway = None
+    for i, piece in enumerate(synthesizer.submit_stream(iter(SENTENCES))):
+        if i == len(SENTENCES) // 2:
+            halfway = len(submitted)
+    
+    final = split_into_chunks(clean_text_for_speech("".join(SENTENCES)))
+    assert halfway
+    assert submitted == final[:len(submitted)]
+    assert len(submitted) == len(final) - 1  # the last chunk is left to the player